@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+
+from physics.CurrentLoop import CurrentLoop
+from physics.EnsembleTracer import EnsembleTracer
+from physics.FieldTable import FieldTable
+from physics.ProbeGrid import ProbeGrid
+from util.ParallelRunner import ParallelRunner
+
+# Scaling benchmark for util.ParallelRunner. Traces an ensemble of electrons through the magnetic bottle's B table,
+# which lives in shared memory, once on a single process and once across every core, and reports the speedup and
+# parallel efficiency. Also checks the merged results do not depend on the number of workers, which holds because each
+# chunk draws its electrons from the seed the runner derives for it, not from the worker that happens to run it.
+# Run from src/: python -m benchmark.EnsembleScaling
+
+# Config
+particles = 4000  # electrons in the ensemble
+chunk_size = 250  # electrons per task
+duration = 1e-3  # traced time, seconds
+dt = 12e-7  # Boris step, seconds
+workers = os.cpu_count()
+
+# magnetic bottle of chapter 28: two rings 4 m apart, -500 A each
+ring_radius = 0.105  # meters
+current = -500  # amps
+charge = -1.602e-19  # coulombs
+mass = 9.10938356e-31  # kilograms
+speeds = (1000, 4000)  # meters / second
+
+
+def inside_bottle(positions):
+    """Whether each position is still between the rings and within their radius"""
+    return (np.abs(positions[:, 0]) < 2) & (np.hypot(positions[:, 1], positions[:, 2]) < ring_radius)
+
+
+def trace_chunk(chunk, shared, seed):
+    """Traces the electrons of one chunk through the shared B table, sampled at random from the chunk's own seed"""
+    table = FieldTable(ProbeGrid(shared['xs'], shared['ys'], shared['zs']), shared['values'])
+    tracer = EnsembleTracer(charge, mass, table.field_at, inside_bottle)
+    positions, velocities = tracer.sample(len(chunk), center=(0, 0, 0), spread=(0, ring_radius / 8, ring_radius / 8),
+                                          speeds=speeds, sampling="random", seed=seed)
+
+    return tracer.run(positions, velocities, dt, duration, check_every=10)
+
+
+if __name__ == "__main__":
+    loops = [CurrentLoop((-2, 0, 0), (-1, 0, 0), ring_radius, current),
+             CurrentLoop((2, 0, 0), (-1, 0, 0), ring_radius, current)]
+    b_table = FieldTable.from_sources(loops, lower=(-2, -ring_radius, -ring_radius), upper=(2, ring_radius, ring_radius),
+                                      spacing=ring_radius / 16)
+
+    with ParallelRunner(workers=workers, seed=0) as runner:
+        for (name, array) in (("xs", b_table.grid.xs), ("ys", b_table.grid.ys), ("zs", b_table.grid.zs),
+                              ("values", b_table.values)):
+            runner.share(name, array)
+
+        print(f"B table {b_table.grid.shape}, {b_table.values.nbytes / 2 ** 20:.1f} MiB shared")
+
+        report = runner.scaling(trace_chunk, particles, chunk_size)
+        print(f"{particles} electrons on {report['workers']} workers: serial {report['serial_seconds']:.2f} s, "
+              f"parallel {report['parallel_seconds']:.2f} s, speedup {report['speedup']:.2f}x, "
+              f"efficiency {report['efficiency'] * 100:.0f}%")
+
+        merged = runner.run(trace_chunk, particles, chunk_size)
+        single = runner.run(trace_chunk, particles, chunk_size, workers=1)
+        identical = all(np.array_equal(merged[field], single[field], equal_nan=merged[field].dtype.kind == 'f')
+                        for field in merged.dtype.names)
+        print(f"Merged results identical to a single process: {identical}")
+        print(f"Ensemble: {EnsembleTracer.summary(merged)}")
@@ -0,0 +1,73 @@
+from sys import getsizeof
+from timeit import repeat
+
+from util.math.Vector import Vector
+
+# Microbenchmark for util.math.Vector. Compares the per-operation cost of the __slots__ Vector against the previous
+# dict-backed Vector, whose + - * mutated self and therefore needed a clone() in every correct expression.
+# Run from src/: python -m benchmark.VectorBenchmark
+
+# Config
+number = 200000  # operations per timing run
+repeats = 5  # timing runs per operation, best one is reported
+
+
+class LegacyVector:
+    """The previous Vector implementation, trimmed down to the operations being measured"""
+
+    def __init__(self, x: float = 0, y: float = 0, z: float = 0):
+        self.x = x
+        self.y = y
+        self.z = z
+
+    def __add__(self, other):
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return self
+
+    def __sub__(self, other):
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        return self
+
+    def __mul__(self, factor):
+        self.x *= factor
+        self.y *= factor
+        self.z *= factor
+        return self
+
+    def clone(self):
+        return LegacyVector(self.x, self.y, self.z)
+
+
+def best_ns(stmt, setup_globals):
+    """Gets the best per-operation time in nanoseconds of the given statement"""
+    timings = repeat(stmt, setup="acc = start.clone()", globals=setup_globals, number=number, repeat=repeats)
+    return min(timings) / number * 1e9
+
+
+# Each case is (name, legacy statement, new statement). Legacy expressions clone first so they are correct.
+cases = [
+    ("a + b", "a.clone() + b", "a + b"),
+    ("a - b", "a.clone() - b", "a - b"),
+    ("a * s", "a.clone() * s", "a * s"),
+    ("acc += b", "acc + b", "acc += b"),
+    ("acc *= s", "acc * s", "acc *= s"),
+    ("construct", "LegacyVector(1.0, 2.0, 3.0)", "Vector(1.0, 2.0, 3.0)"),
+]
+
+legacy_globals = dict(LegacyVector=LegacyVector, a=LegacyVector(1.0, 2.0, 3.0), b=LegacyVector(4.0, 5.0, 6.0),
+                      start=LegacyVector(), s=1.0000001)
+new_globals = dict(Vector=Vector, a=Vector(1.0, 2.0, 3.0), b=Vector(4.0, 5.0, 6.0), start=Vector(), s=1.0000001)
+
+print(f"{'operation':<12}{'legacy (ns)':>14}{'slots (ns)':>14}{'speedup':>10}")
+
+for (name, legacy_stmt, new_stmt) in cases:
+    legacy_ns = best_ns(legacy_stmt, legacy_globals)
+    new_ns = best_ns(new_stmt, new_globals)
+    print(f"{name:<12}{legacy_ns:>14.1f}{new_ns:>14.1f}{legacy_ns / new_ns:>9.2f}x")
+
+legacy_bytes = getsizeof(legacy_globals['a']) + getsizeof(legacy_globals['a'].__dict__)
+print(f"Instance size: legacy {legacy_bytes} bytes, slots {getsizeof(new_globals['a'])} bytes")
@@ -1,100 +1,147 @@
-from vpython import *
+import sys
 
-from physics.ElectricCharge import ElectricCharge
-from physics.ElectricForce import ElectricForce
+import numpy as np
 
-# Configure the scene
-scene.width = 800
-scene.height = 600
+from physics.ElectricForceKernel import ElectricForceKernel
+from physics.NeighborList import NeighborList
+from util.LogLevel import LogLevel
+from util.Simulation import Simulation
+from util.integrator.Yoshida4 import Yoshida4
+
+# Run with --headless for a batch run without VPython: no scene, no graph, no rate limit
+headless = "--headless" in sys.argv
+tick_rate = 400  # ticks per second when drawn, 8e-4 simulated seconds per second
+cutoff = None  # meters; if set, the forces on q4 come from a neighbor list, shifted to fall to zero at the cutoff
 global_arrow_scale_factor = 2
 
 
-class CoolTriangleProblem:
+class CoolTriangleProblem(Simulation):
     def __init__(self):
-        self.trace_log = True  # whether or not to log a bunch of crap
-        self.dt = 0.01  # how much to step the loop per iteration
-        self.t = 0  # how much time has elapsed
-        self.q = 1e-6  # e; magnitude of electron charge
-
-        self.x_axis = cylinder(pos=vec(-6e-3, 0, 0), axis=vec(12e-9, 0, 0), radius=3e-5)
-        #self.y_axis = cylinder(pos=vec(0, -1e-3, 0), axis=vec(0, 10e-3, 0), radius=3e-5)
-
-        # Create q1-q3, statically positioned charges positioned in a triangle shape
-        self.charge1 = ElectricCharge(value=-1 * self.q, position=vec(0, 8e-3, 0), name="q1", value_alias="-q", draw=True,
-                                      extra=dict(mass=1e-4), object_props=dict(radius=5e-4, color=color.red))
-
-        self.charge2 = ElectricCharge(value=-1 * self.q, position=vec(-5e-3, 0, 0), name="q2", value_alias="-q", draw=True,
-                                      extra=dict(mass=1e-4), object_props=dict(radius=5e-4, color=color.red))
-
-        self.charge3 = ElectricCharge(value=-1 * self.q, position=vec(5e-3, 0, 0), name="q3", value_alias="-q", draw=True,
-                                      extra=dict(mass=1e-4), object_props=dict(radius=5e-4, color=color.red))
-
-        # Create q4, a dynamically positioned charge
-        self.charge4 = ElectricCharge(value=self.q, position=vec(0, 1.8e-3, 0), name="q4", value_alias="q", draw=True,
-                                      extra=dict(mass=1e-5), object_props=dict(radius=3e-4, color=color.blue))
+        # q4 is the only moving charge; it is stepped by the simulation's integrator from the net force of q1-q3.
+        # Ticks only step the physics, in a background thread, and frames are drawn every 16 ms
+        super().__init__(auto_run=False, paused=False, log_level=LogLevel.ESSENTIAL, integrator=Yoshida4(),
+                         headless=headless, frame_time=0.016, background=True)
+        self.neighbors = NeighborList(cutoff, long_range="shifted_force") if cutoff else None
+
+    def create_sim_data(self):
+        q = 1e-6  # e; magnitude of electron charge
+
+        return {
+            'trace_log': True,  # whether or not to log a bunch of crap
+            'dt': 1e-7,  # integrator step; q4 crosses a charge in about 5e-7 s
+            'steps_per_tick': 20,  # integrator steps per tick
+            't_max': 2e-2,  # when to stop
+            'q': q,
+            'softening': 8e-4,  # keeps the force on q4 finite when it runs into q1-q3 (radius of q1 + radius of q4)
+            # q1-q3, statically positioned charges positioned in a triangle shape, as arrays for the force kernel
+            'static_charges': (np.array([(0, 8e-3, 0), (-5e-3, 0, 0), (5e-3, 0, 0)]), np.full(3, -1 * q)),
+        }
+
+    def create_state(self):
+        # q4 starts at rest; the static charges are kept out of the state so they never move
+        return [(0, 1.8e-3, 0)], [(0, 0, 0)], [1e-5]
+
+    def forces(self, t, positions, velocities, targets=None):
+        static_positions, static_values = self.get_sim_data('static_charges')
+
+        if self.neighbors is not None:
+            # q1-q3 and q4 together, keeping the rows of q4; the static pairs are found once and never move
+            self.neighbors.softening = self.get_sim_data('softening')
+            moving_values = np.full(len(positions), self.get_sim_data('q'))
+            forces = self.neighbors.net_forces(np.vstack((static_positions, positions)),
+                                               np.concatenate((static_values, moving_values)))[len(static_positions):]
+
+            return forces if targets is None else forces[targets]
+
+        positions = positions if targets is None else positions[targets]
+        field = ElectricForceKernel.fields_at(positions, static_positions, static_values,
+                                              softening=self.get_sim_data('softening'))[0]
+
+        return self.get_sim_data('q') * field
+
+    def create_objects(self):
+        from vpython import scene, cylinder, color, vec, button, slider
+        from physics.ElectricCharge import ElectricCharge
+        from physics.ElectricForce import ElectricForce
+
+        # Configure the scene
+        scene.width = 800
+        scene.height = 600
+
+        q = self.get_sim_data('q')
+        trace_log = self.get_sim_data('trace_log')
+
+        cylinder(pos=vec(-6e-3, 0, 0), axis=vec(12e-9, 0, 0), radius=3e-5)
+
+        # Draw q1-q3
+        charges = {}
+
+        for (index, position) in enumerate(self.get_sim_data('static_charges')[0]):
+            charges['charge{0}'.format(index + 1)] = ElectricCharge(value=-1 * q, position=vec(*position),
+                                                                    name="q{0}".format(index + 1), value_alias="-q",
+                                                                    draw=True, extra=dict(mass=1e-4),
+                                                                    object_props=dict(radius=5e-4, color=color.red))
+
+        # Draw q4, the dynamically positioned charge
+        charge4 = ElectricCharge(value=q, position=vec(*self.get_state('positions')[0]), name="q4", value_alias="q",
+                                 draw=True, extra=dict(mass=self.get_state('masses')[0]),
+                                 object_props=dict(radius=3e-4, color=color.blue))
 
         # The camera should follow q4
-        scene.camera.follow(self.charge4.object)
-
-        # Create and draw force14, force24, force34
-        self.force14 = ElectricForce(q1=self.charge1, q2=self.charge4, draw=True,
-                                     base_scale_factor=global_arrow_scale_factor, trace_log=self.trace_log,
-                                     indicator_props=dict(color=self.charge1.object_props['color'], opacity=0.5))
+        scene.camera.follow(charge4.object)
 
-        self.force24 = ElectricForce(q1=self.charge2, q2=self.charge4, draw=True,
-                                     base_scale_factor=global_arrow_scale_factor, trace_log=self.trace_log,
-                                     indicator_props=dict(color=self.charge2.object_props['color'], opacity=0.5))
+        # Controls; they only queue commands, the physics applies them between two ticks
+        button(bind=lambda _: self.send("pause"), text="Pause")
+        button(bind=lambda _: self.send("resume"), text="Resume")
+        button(bind=lambda _: self.send("reset"), text="Reset")
+        slider(bind=lambda control: self.send("set", "softening", control.value), min=1e-4, max=2e-3,
+               value=self.get_sim_data('softening'))
 
-        self.force34 = ElectricForce(q1=self.charge3, q2=self.charge4, draw=True,
-                                     base_scale_factor=global_arrow_scale_factor, trace_log=self.trace_log,
-                                     indicator_props=dict(color=self.charge3.object_props['color'], opacity=0.5))
-
-        # Calculate the initial net force magnitude
-        self.net_force = self.force14.value + self.force24.value + self.force34.value
-        self.net_force_mag = mag(self.net_force)
+        # Create and draw force14, force24, force34
+        forces = {}
 
-        # Create and draw a graph plotting x in nanometers vs net force magnitude in piconewtons
-        self.t_net_force_graph = graph(width=800, height=225, xmin=-4, xmax=6, ymin=-6000, ymax=6000,
-                                       title="<b><i>x</i> (nm) vs <i>F<sub>net mag</sub></i> (pN)</b>",
-                                       xtitle="<i>x</i> (nm)", ytitle="<i>F<sub>net mag</sub></i> (pN)",
-                                       foreground=vec(0, 0, 0), background=vec(1, 1, 1))
+        for (name, charge) in (("14", charges['charge1']), ("24", charges['charge2']), ("34", charges['charge3'])):
+            forces['force' + name] = ElectricForce(q1=charge, q2=charge4, name=name, draw=True,
+                                                   base_scale_factor=global_arrow_scale_factor, trace_log=trace_log,
+                                                   indicator_props=dict(color=charge.object_props['color'],
+                                                                        opacity=0.5))
 
-        # Create a curve for plotting on the graph
-        self.t_net_force_curve = gcurve(color=vec(0, 0.4, 1))
+        return dict(charge4=charge4, **charges, **forces)
 
-    def start_sim(self):
-        while self.t <= 100:
-            # This loop will run at a maximum of 90 its/sec
-            rate(1)
+    def create_graphs(self):
+        from vpython import vec
 
-            # Tick the forces
-            for force in (self.force14, self.force24, self.force34):
-                force.tick()
+        # Plot t vs the y component of the net force on q4
+        return [dict(name='t_net_force', title="<b><i>t</i> (s) vs <i>F<sub>net y</sub></i> (N)</b>",
+                     x_title="<i>t</i> (s)", y_title="<i>F<sub>net y</sub></i> (N)", width=800, height=225,
+                     x_min=0, x_max=self.get_sim_data('t_max'), y_min=-15, y_max=15, cfg=vec(0, 0.4, 1))]
 
-            # Get net force
-            self.net_force = self.force14.value + self.force24.value + self.force34.value
+    def simulation_sentinel(self):
+        return self.get_state('t') <= self.get_sim_data('t_max')
 
-            # Tick q4 accel
-            q4_mass = self.charge4.extra['mass']
-            q4_accel = self.net_force / q4_mass
+    def tick_simulation(self):
+        # Step q4
+        self.step_state(self.get_sim_data('dt'), self.get_sim_data('steps_per_tick'))
 
-            # Tick q4 vel
-            q4_vel = q4_accel * self.dt
+    def render(self, snapshot):
+        # Move q4 and its force arrows to the (interpolated) position
+        from vpython import vec
 
-            # Tick q4 pos
-            q4_pos = q4_vel * self.dt
+        objects = self.get_sim_data('physical_objects')
+        q4_pos = vec(*snapshot['positions'][0])
+        objects['charge4'].tick_obj_pos(q4_pos)
 
-            print(q4_pos)
-            self.charge4.tick_obj_pos(q4_pos)
-            for force in (self.force14, self.force24, self.force34):
-                force.set_q2_pos(q4_pos)
+        net_force = vec(0, 0, 0)
 
-            # Add datapoint to the plot
-            self.t_net_force_curve.plot(self.t, self.net_force.y)
+        for name in ('force14', 'force24', 'force34'):
+            objects[name].set_q2_pos(q4_pos)
+            objects[name].tick()
+            net_force += objects[name].value
 
-            self.t += self.dt
+        # Add datapoint to the plot
+        self.plot('t_net_force', snapshot['t'], net_force.y)
 
 
 # Start the simulation
 sim = CoolTriangleProblem()
-#sim.start_sim()
+sim.run_simulation(itr_rate_lim=tick_rate)
@@ -1,5 +1,7 @@
 from vpython import *
 
+from physics.InteractionGraph import InteractionGraph
+
 # Configure the scene
 scene.width = 800
 scene.height = 600
@@ -10,12 +12,6 @@ charge_radius = 3e-4
 q = 1.602e-19
 
 
-def calc_force12(first, second):
-    k = 8.99e9
-    r12 = second.pos - first.pos
-    return (k * first.chg * second.chg * r12) / pow(mag(r12), 3)
-
-
 def scale_factor(force):
     factor = charge_radius / mag(force)
     # print("Scale factor will be ", factor)
@@ -46,6 +42,13 @@ q4.a = vec(0, 0, 0)  # accel
 q4.v = vec(0, 0, 0)  # velocity
 q4.lab = label(pos=q4.pos, text="q4=q", height=11)
 
+# register the charges; q1, q2 and q3 never move so their mutual forces are computed once
+interactions = InteractionGraph(position_of=lambda charge: charge.pos, value_of=lambda charge: charge.chg)
+interactions.add(q1, static=True)
+interactions.add(q2, static=True)
+interactions.add(q3, static=True)
+interactions.add(q4)
+
 # Now that everything is drawn, no more autoscaling
 scene.autoscale = False
 scene.userzoom = False
@@ -54,25 +57,25 @@ scene.range = 8e-4
 
 # create forces & arrows
 # noinspection PyTypeChecker
-f14 = calc_force12(q1, q4)
+f14 = interactions.force(q1, q4)
 f14arrow = arrow(pos=q4.pos, axis=f14 * scale_factor(f14), color=q1.color + q4.color, opacity=0.3)
 f14arrow.lab = label(pos=f14arrow.pos + f14arrow.axis, text="f14", height=11)
 # print("f14 = ", f14)
 
 # noinspection PyTypeChecker
-f24 = calc_force12(q2, q4)
+f24 = interactions.force(q2, q4)
 f24arrow = arrow(pos=q4.pos, axis=f24 * scale_factor(f24), color=q2.color + q4.color, opacity=0.3)
 f24arrow.lab = label(pos=f24arrow.pos + f24arrow.axis, text="f24", height=11)
 # print("f24 = ", f24)
 
 # noinspection PyTypeChecker
-f34 = calc_force12(q3, q4)
+f34 = interactions.force(q3, q4)
 f34arrow = arrow(pos=q4.pos, axis=f34 * scale_factor(f34), color=q3.color + q4.color, opacity=0.3)
 f34arrow.lab = label(pos=f34arrow.pos + f34arrow.axis, text="f34", height=11)
 # print("f34 = ", f34)
 
 # get net force
-fnet = f14 + f24 + f34
+fnet = interactions.net_force(q4)
 fnetarrow = arrow(pos=q4.pos, axis=fnet * scale_factor(fnet), color=color.yellow, opacity=0.3)
 fnetarrow.lab = label(pos=fnetarrow.pos + fnetarrow.axis, text="f_net", height=11)
 
@@ -100,30 +103,32 @@ while True:
 
     # print("Starting iteration for t = ", t)
 
-    # update forces & arrows
+    # update forces & arrows, only the pairs with q4 are recomputed since it is the only charge that moves
+    interactions.tick()
+
     # noinspection PyTypeChecker
-    f14 = calc_force12(q1, q4)
+    f14 = interactions.force(q1, q4)
     # print("f14 = ", f14)
     f14arrow.pos = q4.pos
     f14arrow.axis = f14 * scale_factor(f14)
     f14arrow.lab.pos = f14arrow.pos + f14arrow.axis
 
     # noinspection PyTypeChecker
-    f24 = calc_force12(q2, q4)
+    f24 = interactions.force(q2, q4)
     # print("f24 = ", f24)
     f24arrow.pos = q4.pos
     f24arrow.axis = f24 * scale_factor(f24)
     f24arrow.lab.pos = f24arrow.pos + f24arrow.axis
 
     # noinspection PyTypeChecker
-    f34 = calc_force12(q3, q4)
+    f34 = interactions.force(q3, q4)
     # print("f34 = ", f34)
     f34arrow.pos = q4.pos
     f34arrow.axis = f34 * scale_factor(f34)
     f34arrow.lab.pos = f34arrow.pos + f34arrow.axis
 
     # update net force
-    fnet = f14 + f24 + f34
+    fnet = interactions.net_force(q4)
 
     # checks if q4 is colliding with q1, q2, or q3
     # if it is, we remove that object from affecting net force
@@ -133,7 +138,7 @@ while True:
     for objects in ([q1, f14], [q2, f24], [q3, f34]):
         dist_squared = pow(objects[0].pos.x - q4.pos.x, 2) + pow(objects[0].pos.y - q4.pos.y, 2)
         if dist_squared <= pow(q1.radius + q2.radius, 2):
-            fnet -= objects[1]
+            fnet = fnet - objects[1]  # fnet is owned by the interaction graph, do not modify it in place
 
     # print("fnet = ", fnet)
     fnetarrow.pos = q4.pos
@@ -1,4 +1,11 @@
 from vpython import *
+import numpy as np
+
+from physics.ElectricForceKernel import ElectricForceKernel
+from physics.InteractionGraph import InteractionGraph
+from util.integrator.DormandPrince import DormandPrince
+from util.integrator.Event import Event
+from util.integrator.MultiRate import MultiRate
 
 # Configure the scene
 scene.width = 800
@@ -12,12 +19,6 @@ d = 6e-4
 x = 7e-4
 
 
-def calc_force12(first, second):
-    k = 8.99e9
-    r12 = second.pos - first.pos
-    return (k * first.chg * second.chg * r12) / pow(mag(r12), 3)
-
-
 def scale_factor(force):
     factor = charge_radius / mag(force)
     # print("Scale factor will be ", factor)
@@ -50,49 +51,55 @@ q3.a = vec(0, 0, 0)  # accel
 q3.v = vec(0, 0, 0)  # velocity
 q3.lab = label(pos=q3.pos, text="q3=-e", height=11)
 
+# register the charges; each pair is computed once and f21 = -f12 etc. (Newton's third law)
+interactions = InteractionGraph(position_of=lambda charge: charge.pos, value_of=lambda charge: charge.chg)
+interactions.add(q1)
+interactions.add(q2)
+interactions.add(q3)
+
 # create forces & arrows
-f12 = calc_force12(q1, q2)
+f12 = interactions.force(q1, q2)
 f12arrow = arrow(pos=q2.pos, axis=f12 * scale_factor(f12), color=q1.color + q2.color, opacity=0.3)
 f12arrow.lab = label(pos=f12arrow.pos + f12arrow.axis, text="f12", height=11)
 # print("f12 = ", f12)
 
-f13 = calc_force12(q1, q3)
+f13 = interactions.force(q1, q3)
 f13arrow = arrow(pos=q3.pos, axis=f13 * scale_factor(f13), color=q1.color + q3.color, opacity=0.3)
 f13arrow.lab = label(pos=f13arrow.pos + f13arrow.axis, text="f13", height=11)
 # print("f13 = ", f13)
 
-f21 = calc_force12(q2, q1)
+f21 = interactions.force(q2, q1)
 f21arrow = arrow(pos=q1.pos, axis=f21 * scale_factor(f21), color=q2.color + q1.color, opacity=0.3)
 f21arrow.lab = label(pos=f21arrow.pos + f21arrow.axis, text="f21", height=11)
 # print("f21 = ", f21)
 
-f23 = calc_force12(q2, q3)
+f23 = interactions.force(q2, q3)
 f23arrow = arrow(pos=q3.pos, axis=f23 * scale_factor(f23), color=q2.color + q3.color, opacity=0.3)
 f23arrow.lab = label(pos=f23arrow.pos + f23arrow.axis, text="f23", height=11)
 # print("f23 = ", f23)
 
-f31 = calc_force12(q3, q1)
+f31 = interactions.force(q3, q1)
 f31arrow = arrow(pos=q1.pos, axis=f31 * scale_factor(f31), color=q3.color + q1.color, opacity=0.3)
 f31arrow.lab = label(pos=f31arrow.pos + f31arrow.axis, text="f31", height=11)
 # print("f21 = ", f21)
 
-f32 = calc_force12(q3, q2)
+f32 = interactions.force(q3, q2)
 f32arrow = arrow(pos=q2.pos, axis=f32 * scale_factor(f32), color=q3.color + q2.color, opacity=0.3)
 f32arrow.lab = label(pos=f32arrow.pos + f32arrow.axis, text="f32", height=11)
 # print("f23 = ", f23)
 
 # get net forces
-fnet1 = f21 + f31
+fnet1 = interactions.net_force(q1)
 fnet1arrow = arrow(pos=q1.pos, axis=fnet1 * scale_factor(fnet1), color=color.yellow, opacity=0.3)
 fnet1arrow.lab = label(pos=fnet1arrow.pos + fnet1arrow.axis, text="f_net1", height=11)
 # print("fnet1 = ", fnet1)
 
-fnet2 = f12 + f32
+fnet2 = interactions.net_force(q2)
 fnet2arrow = arrow(pos=q2.pos, axis=fnet2 * scale_factor(fnet2), color=color.yellow, opacity=0.3)
 fnet2arrow.lab = label(pos=fnet2arrow.pos + fnet2arrow.axis, text="f_net2", height=11)
 # print("fnet2 = ", fnet2)
 
-fnet3 = f13 + f23
+fnet3 = interactions.net_force(q3)
 fnet3arrow = arrow(pos=q3.pos, axis=fnet3 * scale_factor(fnet3), color=color.yellow, opacity=0.3)
 fnet3arrow.lab = label(pos=fnet3arrow.pos + fnet3arrow.axis, text="f_net3", height=11)
 # print("fnet3 = ", fnet3)
@@ -104,6 +111,43 @@ scene.autoscale = False
 t = 0
 dt = 0.01
 sim_speed = 6
+adaptive = False  # advance each frame with adaptive Dormand-Prince steps and stop once two charges touch
+multi_rate = False  # advance each frame with per-charge sub-steps (the light q3 sub-cycles) and stop once two touch
+
+# adaptive stepping state: positions and velocities of every charge packed into one vector
+charges = [q1, q2, q3]
+charge_values = np.array([q.chg for q in charges])
+masses = np.array([q.m for q in charges])
+# each frame is one solve over dt, which caps the steps at dt: rtol 1e-8 then gives the same touch time (1203.62 s) as
+# 1e-10, while one solve over the whole run, with no cap, only settles there below rtol 1e-10 (911 s at 1e-8)
+stepper = DormandPrince(rtol=1e-8, atol=1e-15)
+state = DormandPrince.pack([(q.pos.x, q.pos.y, q.pos.z) for q in charges], [(q.v.x, q.v.y, q.v.z) for q in charges])
+
+
+def derivative(time, y):
+    positions, velocities = DormandPrince.unpack(y)
+    return DormandPrince.pack(velocities, ElectricForceKernel.net_forces(positions, charge_values) / masses[:, None])
+
+
+# smallest gap between the surfaces of two charges, crossing zero when they touch
+def smallest_gap(time, y):
+    positions = DormandPrince.unpack(y)[0]
+    gaps = np.linalg.norm(positions[:, None] - positions[None, :], axis=2)
+    gaps[np.diag_indices(len(charges))] = np.inf
+    return gaps.min() - 2 * q1.radius
+
+
+touching = Event(smallest_gap, terminal=True, direction=-1, name="touching")
+
+# multi-rate stepping state: every charge steps by dt / 2^level, the level coming from its own acceleration and speed
+multi_stepper = MultiRate(length=q1.radius, eta=0.01)
+bodies = DormandPrince.unpack(state.copy())
+
+
+def acceleration(time, positions, velocities, targets):
+    field = ElectricForceKernel.fields_at(positions[targets], positions, charge_values)[0]
+    return field * (charge_values / masses)[targets, None]
+
 
 # Go until user stops it
 while True:
@@ -111,49 +155,51 @@ while True:
 
     # print("Starting iteration for t = ", t)
 
-    # update forces & arrows
-    f12 = calc_force12(q1, q2)
+    # update forces & arrows, only the pairs of charges that moved since the last tick are recomputed
+    interactions.tick()
+
+    f12 = interactions.force(q1, q2)
     # print("f13 = ", f12)
     f12arrow.pos = q2.pos
     f12arrow.axis = f12 * scale_factor(f12)
     f12arrow.lab.pos = f12arrow.pos + f12arrow.axis
 
-    f13 = calc_force12(q1, q3)
+    f13 = interactions.force(q1, q3)
     # print("f13 = ", f13)
     f13arrow.pos = q3.pos
     f13arrow.axis = f13 * scale_factor(f13)
     f13arrow.lab.pos = f13arrow.pos + f13arrow.axis
 
-    f21 = calc_force12(q2, q1)
+    f21 = interactions.force(q2, q1)
     # print("f21 = ", f21)
     f21arrow.pos = q1.pos
     f21arrow.axis = f21 * scale_factor(f21)
     f21arrow.lab.pos = f21arrow.pos + f21arrow.axis
 
-    f23 = calc_force12(q2, q3)
+    f23 = interactions.force(q2, q3)
     # print("f23 = ", f23)
     f23arrow.pos = q3.pos
     f23arrow.axis = f23 * scale_factor(f23)
     f23arrow.lab.pos = f23arrow.pos + f23arrow.axis
 
-    f31 = calc_force12(q3, q1)
+    f31 = interactions.force(q3, q1)
     # print("f31 = ", f31)
     f31arrow.pos = q1.pos
     f31arrow.axis = f31 * scale_factor(f31)
     f31arrow.lab.pos = f31arrow.pos + f31arrow.axis
 
-    f32 = calc_force12(q3, q2)
+    f32 = interactions.force(q3, q2)
     # print("f32 = ", f32)
     f32arrow.pos = q2.pos
     f32arrow.axis = f32 * scale_factor(f32)
     f32arrow.lab.pos = f32arrow.pos + f32arrow.axis
 
     # update net forces
-    fnet1 = f21 + f31
+    fnet1 = interactions.net_force(q1)
     # print("fnet1 = ", fnet1)
-    fnet2 = f12 + f32
+    fnet2 = interactions.net_force(q2)
     # print("fnet2 = ", fnet2)
-    fnet3 = f13 + f23
+    fnet3 = interactions.net_force(q3)
     # print("fnet3 = ", fnet3)
 
     fnet1arrow.pos = q1.pos
@@ -168,29 +214,58 @@ while True:
     fnet3arrow.axis = fnet3 * scale_factor(fnet3)
     fnet3arrow.lab.pos = fnet3arrow.pos + fnet3arrow.axis
 
-    # update accel
-    q1.a = fnet1 / q1.m
-    # print("q1.a = ", q1.a)
-    q2.a = fnet1 / q2.m
-    # print("q2.a = ", q2.a)
-    q3.a = fnet3 / q3.m
-    # print("q3.a = ", q3.a)
-
-    # update vel
-    q1.v += q1.a * dt
-    # print("q1.v = ", q1.v)
-    q2.v += q2.a * dt
-    # print("q2.v = ", q2.v)
-    q3.v += q3.a * dt
-    # print("q3.v = ", q3.v)
-
-    # update pos
-    q1.pos += q1.v * dt
-    # print("q1.pos = ", q1.pos)
-    q2.pos += q2.v * dt
-    # print("q2.pos = ", q2.pos)
-    q3.pos += q3.v * dt
-    # print("q3.pos = ", q3.pos)
+    if adaptive:
+        # as many steps as the frame needs, small ones only while the charges are close
+        result = stepper.solve(derivative, t, state, t + dt, events=[touching], record=False)
+        state = result['y'][-1]
+        positions, velocities = DormandPrince.unpack(state)
+
+        for (q, position, velocity) in zip(charges, positions, velocities):
+            q.pos = vec(*position)
+            q.v = vec(*velocity)
+
+        if result['terminated']:
+            print(f"Two charges touched at t = {result['t'][-1]:.4f} s, stopping")
+            break
+
+        if not result['completed']:
+            print(f"The adaptive stepper ran out of steps at t = {result['t'][-1]:.4f} s, stopping")
+            break
+    elif multi_rate:
+        # one step of dt for q1 and q2, as many sub-steps as q3 needs inside it
+        bodies = multi_stepper.step(t, *bodies, dt, acceleration)
+
+        for (q, position, velocity) in zip(charges, *bodies):
+            q.pos = vec(*position)
+            q.v = vec(*velocity)
+
+        if smallest_gap(t + dt, DormandPrince.pack(*bodies)) <= 0:
+            print(f"Two charges touched by t = {t + dt:.4f} s, stopping")
+            break
+    else:
+        # update accel
+        q1.a = fnet1 / q1.m
+        # print("q1.a = ", q1.a)
+        q2.a = fnet2 / q2.m
+        # print("q2.a = ", q2.a)
+        q3.a = fnet3 / q3.m
+        # print("q3.a = ", q3.a)
+
+        # update vel
+        q1.v += q1.a * dt
+        # print("q1.v = ", q1.v)
+        q2.v += q2.a * dt
+        # print("q2.v = ", q2.v)
+        q3.v += q3.a * dt
+        # print("q3.v = ", q3.v)
+
+        # update pos
+        q1.pos += q1.v * dt
+        # print("q1.pos = ", q1.pos)
+        q2.pos += q2.v * dt
+        # print("q2.pos = ", q2.pos)
+        q3.pos += q3.v * dt
+        # print("q3.pos = ", q3.pos)
 
     # update labels
     q1.lab.pos = q1.pos
@@ -1,4 +1,8 @@
 from vpython import *
+import numpy as np
+
+from physics.FieldEvaluator import FieldEvaluator
+from physics.ProbeGrid import ProbeGrid
 
 # Configure the scene
 scene.width = 1024
@@ -21,7 +25,6 @@ def draw_charge(name, value, pos):
 
 
 # Constants
-k = 8.99e9  # Coulomb's constant
 q1 = -10.0e-9  # charge 1, -10 nC
 q2 = 10.0e-9  # charge 2, +10 nC
 x_min = -8
@@ -50,6 +53,12 @@ x_potential = graph(width=1024, height=225,
 # Create a curve for plotting on the graph
 x_potential_curve = gcurve(color=vec(0, 0.4, 1))
 
+# Evaluate the field and potential at every POI (dx, dy) in one pass; POIs directly on top of a charge come back as 0
+probe_grid = ProbeGrid.arange(x_min, x_max, dx, y_min, y_max, dy)
+charges = (np.array([[q1_sphere.pos.x, q1_sphere.pos.y, q1_sphere.pos.z],
+                     [q2_sphere.pos.x, q2_sphere.pos.y, q2_sphere.pos.z]]), np.array([q1, q2]))
+E_grid, V_grid = FieldEvaluator.evaluate_field(probe_grid, charges)
+
 # Simulation variables
 E_min = 0
 E_max = 0
@@ -59,8 +68,8 @@ print("Drawing the electric potential grids and field arrows...")
 
 # Draw electric field arrows at every y in y_min to y_max + dy by dy
 # for every x in x_min - dx to x_max by dx
-for x in arange(x_min, x_max + dx, dx):
-    for y in arange(y_min, y_max + dy, dy):
+for (i, x) in enumerate(probe_grid.xs):
+    for (j, y) in enumerate(probe_grid.ys):
         # print(f"Drawing potential grid and field arrow at ({x}, {y})")
         rate(240)
 
@@ -71,17 +80,8 @@ for x in arange(x_min, x_max + dx, dx):
         # Create potential grid
         grid = box(pos=point_of_interest, size=vec(dx, dy, 0))
 
-        # Find r-vectors from POI to each charge
-        r1 = point_of_interest - q1_sphere.pos
-        r2 = point_of_interest - q2_sphere.pos
-
-        if mag(r1) == 0 or mag(r2) == 0:
-            # if the POI is directly on top of a charge, both the potential and the field become infinite - we ignore them
-            E = vec(0, 0, 0)
-            V = 0
-        else:
-            # we create the net electric field at this POI by summing the individual fields created by each charge
-            E = ((k * q1 * r1) / (mag(r1) ** 3)) + ((k * q2 * r2) / (mag(r2) ** 3))
+        # Look up the net electric field at this POI
+        E = vec(*E_grid[i, j, 0])
 
         # Get the magnitude of the electric field at this POI
         E_mag = mag(E)
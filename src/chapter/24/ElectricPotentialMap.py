@@ -1,4 +1,9 @@
 from vpython import *
+import numpy as np
+
+from physics.AdaptiveMesh import AdaptiveMesh
+from physics.FieldEvaluator import FieldEvaluator
+from physics.ProbeGrid import ProbeGrid
 
 # Configure the scene
 scene.width = 1024
@@ -10,6 +15,9 @@ scene.title = "<h2>Map of Electric Potential</h2><p>Simulates a map of electric
 # Config
 pos_color = color.red  # for positive charges, color them red
 neg_color = color.blue  # for negative charges, color them blue
+adaptive_mesh = False  # draw an adaptive mesh, refined around the charges, instead of the uniform dx, dy grid
+mesh_tolerance = 0.5  # largest allowed error (V) of the adaptive mesh cell potentials
+mesh_max_depth = 5  # how many times the coarsest adaptive mesh cells may be halved
 
 
 # Functions to use later
@@ -20,7 +28,6 @@ def draw_charge(name, value, pos):
 
 
 # Constants
-k = 8.99e9  # Coulomb's constant
 q1 = -10.0e-9  # charge 1, -10 nC
 q2 = 10.0e-9  # charge 2, +10 nC
 x_min = -8
@@ -52,47 +59,49 @@ x_potential_curve = gcurve(color=vec(0, 0.4, 1))
 # Simulation variables
 V_max = 15
 
+charges = (np.array([[q1_sphere.pos.x, q1_sphere.pos.y, q1_sphere.pos.z],
+                     [q2_sphere.pos.x, q2_sphere.pos.y, q2_sphere.pos.z]]), np.array([q1, q2]))
+
+if adaptive_mesh:
+    # Start from coarse cells and split the ones whose potential is poorly represented by their corners
+    mesh = AdaptiveMesh.from_charges(charges, (x_min, y_min, 0), (x_max, y_max, 0), base_cells=(8, 8, 1),
+                                     tolerance=mesh_tolerance, max_depth=mesh_max_depth)
+    leaves = mesh.leaves()
+    cells = [(vec(*center), vec(size[0], size[1], 0), V) for (center, size, V) in
+             zip(leaves["center"], leaves["size"], leaves["V"])]
+    print(f"Adaptive mesh of {len(cells)} cells from {mesh.evaluations} evaluations "
+          f"(a uniform grid this fine needs {mesh.uniform_evaluations})")
+else:
+    # Evaluate the potential at every POI (dx, dy) in one pass; POIs directly on top of a charge come back as 0
+    probe_grid = ProbeGrid.arange(x_min, x_max, dx, y_min, y_max, dy)
+    E_grid, V_grid = FieldEvaluator.evaluate_field(probe_grid, charges)
+    cells = [(vec(x, y, 0), vec(dx, dy, 0), V_grid[i, j, 0]) for (i, x) in enumerate(probe_grid.xs)
+             for (j, y) in enumerate(probe_grid.ys)]
+
 print("Drawing the electric potential grids...")
 
-# Draw electric field arrows at every y in y_min to y_max by dy
-# for every x in x_min to x_max by dx
-for x in arange(x_min, x_max + dx, dx):
-    for y in arange(y_min, y_max + dy, dy):
-        # print(f"Drawing potential at ({x}, {y})")
-        rate(240)
-
-        # Declare the POI, which is every point
-        # (dx, dy) visited by the loop
-        point_of_interest = vec(x, y, 0)
-
-        # Create potential grid
-        grid = box(pos=point_of_interest, size=vec(dx, dy, 0))
-
-        # Find r-vectors from POI to each charge
-        r1 = point_of_interest - q1_sphere.pos
-        r2 = point_of_interest - q2_sphere.pos
-
-        if mag(r1) == 0 or mag(r2) == 0:
-            # if the POI is directly on top of a charge, the voltage becomes infinite - we ignore it
-            V = 0
-        else:
-            # we create the net electric potential at this POI by summing the individual potentials created by each charge
-            V = ((k * q1) / mag(r1)) + ((k * q2) / mag(r2))
-
-        # Set the color of the grid based on resulting potential
-        if V >= 0:
-            grid.color = pos_color
-        else:
-            grid.color = neg_color
-
-        # Determine opacity of grid based on if it is greater than V_max or smaller than -V_max
-        if V > V_max:
-            grid.opacity = 1
-        elif V < -V_max:
-            grid.opacity = 1
-        else:
-            grid.opacity = abs(V)/V_max
-
-        x_potential_curve.plot(x, V)
+# Draw a potential grid cell at every POI
+for (point_of_interest, cell_size, V) in cells:
+    # print(f"Drawing potential at {point_of_interest}")
+    rate(240)
+
+    # Create potential grid
+    grid = box(pos=point_of_interest, size=cell_size)
+
+    # Set the color of the grid based on resulting potential
+    if V >= 0:
+        grid.color = pos_color
+    else:
+        grid.color = neg_color
+
+    # Determine opacity of grid based on if it is greater than V_max or smaller than -V_max
+    if V > V_max:
+        grid.opacity = 1
+    elif V < -V_max:
+        grid.opacity = 1
+    else:
+        grid.opacity = abs(V)/V_max
+
+    x_potential_curve.plot(point_of_interest.x, V)
 
 print("The electric potential grids have been drawn.")
@@ -1,4 +1,13 @@
 from vpython import *
+import numpy as np
+
+from physics.BorisPusher import BorisPusher
+from physics.CurrentLoop import CurrentLoop
+from physics.EnsembleTracer import EnsembleTracer
+from physics.FieldTable import FieldTable
+from physics.GuidingCenter import GuidingCenter
+from util.integrator.DormandPrince import DormandPrince
+from util.integrator.Event import Event
 
 # design
 scene.title = "<h1>Magnetic Bottle Simulation</h1><p>Electron initially stuck in a magnetic bottle. The particle will corkscrew within the bottle until it hits a loss cone (not depicted) at which point<br />it will leave the system. Simulation does not stop on its own. Press \"Stop simulation\" or close the page when done.<br />"
@@ -8,14 +17,7 @@ scene.background = vec(161, 152, 151) / 255
 
 # constants
 ring_radius = 0.105  # radius of ring, meters
-num_slices = 360  # how many slices to cut ring into
-theta_min = 0  # min angle of ring, radians
-theta_max = 2 * pi  # max angle of ring, radians
-total_theta = theta_max - theta_min  # total angle of ring, radians
-dtheta = total_theta / num_slices  # differential angle of each slice, radians
-mu_naught = (4 * pi) * 1e-7  # tesla*meter/sec
 current = -500  # amps
-integration_constant = (mu_naught * current) / (4 * pi)  # constant out front of BS law integral
 
 # size constants
 x_min = -2
@@ -27,6 +29,25 @@ y_max = 1
 
 # sim settings
 run_sim = False
+field_table = False  # trace the electron through a B table sampled once instead of evaluating both rings every step
+# (the ensemble always evaluates the rings: for many points at once they are faster than the table)
+table_spacing = ring_radius / 16  # spacing of the B table, meters
+boris_pusher = True  # advance the electron with the Boris pusher instead of forward Euler
+boris_dt = 12e-7  # Boris keeps |v| exactly, so it can take 10x the 12e-8 s forward Euler step
+frame_rate = 60  # frames drawn per second
+steps_per_frame = 17  # physics steps per frame, about the 1024 steps per second taken when every step was drawn
+
+# ensemble settings
+ensemble_size = 0  # when > 0, first trace this many electrons at once and print how many escape the bottle
+ensemble_duration = 4e-3  # how long to trace the ensemble for, seconds
+ensemble_sampling = "halton"  # "halton" or "random"
+ensemble_output = None  # .npy file to save the ensemble's result table to, if any
+ensemble_guiding_center = False  # follow the ensemble by guiding centers (bounce motion only) instead of full orbits
+guiding_center_dt = 5e-5  # guiding center step, about 40 per bounce, seconds
+
+# adaptive settings
+adaptive_trace = False  # first trace the initial electron with adaptive steps until it leaves the bottle
+adaptive_duration = 4e-3  # longest time to trace it for, seconds
 
 # axes
 line_x = cylinder(pos=vec(x_min, 0, 0), axis=vec(x_max, 0, 0), radius=0.0025, color=color.black)
@@ -46,25 +67,18 @@ scene.autoscale = False
 
 
 # essential methods
-# calculate the magnetic field caused by the given rings at a given point of interest
-
+# calculate the magnetic field caused by the given rings at every given point of interest in one pass
 # noinspection PyShadowingNames
-def calc_mag_field(rings, point_of_interest):
-    b_total = vec(0, 0, 0)
+def calc_mag_fields(rings, points_of_interest):
+    pois = np.array([(poi.x, poi.y, poi.z) for poi in points_of_interest]).reshape(-1, 3)
 
-    for theta in arange(theta_min, theta_max, dtheta):
-        theta_hat = vec(0, cos(theta), -sin(theta))
-        ds = ring_radius * dtheta * theta_hat
+    return [vec(*b) for b in sum(ring.source.field_at(pois) for ring in rings)]
 
-        for ring in rings:
-            segment = vec(ring.pos.x, ring.pos.y + ring_radius * sin(theta), ring.pos.z + ring_radius * cos(theta))
-            r = point_of_interest - segment  # r vector from segment to arbitrary POI --ring in yz plane--
-            r_mag = mag(r)  # mag of r vector
 
-            if r_mag != 0:
-                b_total += integration_constant * ((cross(ds, r)) / r_mag ** 3)  # append differential B to total B
-
-    return b_total
+# calculate the magnetic field caused by the given rings at a given point of interest
+# noinspection PyShadowingNames
+def calc_mag_field(rings, point_of_interest):
+    return calc_mag_fields(rings, [point_of_interest])[0]
 
 
 # calculate a scale factor proportional to the ring_radius for a given vector
@@ -74,15 +88,24 @@ def scale_factor(b, prop_to=ring_radius):
     return factor
 
 
-# draw a ring
+# draw a ring along with its exact field source; the current runs from +z towards +y, i.e. counterclockwise about -x
 def create_ring(pos):
-    return ring(pos=pos, axis=vec(1, 0, 0), radius=ring_radius, thickness=0.01, color=color.purple)
+    out = ring(pos=pos, axis=vec(1, 0, 0), radius=ring_radius, thickness=0.01, color=color.purple)
+    out.source = CurrentLoop(center=(pos.x, pos.y, pos.z), axis=(-1, 0, 0), radius=ring_radius, current=current)
+    return out
 
 
 # draw rings
 left_ring = create_ring(vec(x_min, 0, 0))
 right_ring = create_ring(vec(x_min+x_max, 0, 0))
 
+# B table around the axis of the bottle; outside of it the rings are evaluated directly
+b_table = None
+if field_table:
+    b_table = FieldTable.from_sources([left_ring.source, right_ring.source], lower=(x_min, -ring_radius / 2, -ring_radius / 2),
+                                      upper=(x_min + x_max, ring_radius / 2, ring_radius / 2), spacing=table_spacing)
+    print(f"B table {b_table.grid.shape}, error vs rings: {b_table.error_estimate()}")
+
 # electron settings
 electron_init = dict()
 electron_init['pos'] = vec(0, ring_radius / 8, 0)
@@ -109,27 +132,24 @@ def draw_b_field():
     y_end = y_max + y_min
     z_end = z_max + z_min
 
-    for x in arange(x_min, x_max, dx):
-        for y in arange(y_min, y_max, dy):
-            for z in arange(z_min, z_max, dz):
-                poi = vec(x, y, z)
-                b_at_poi = calc_mag_field([left_ring, right_ring], poi)
+    pois = [vec(x, y, z) for x in arange(x_min, x_max, dx) for y in arange(y_min, y_max, dy) for z in arange(z_min, z_max, dz)
+            if x_start <= x <= x_end and y_start <= y <= y_end and z_start <= z <= z_end]
 
-                if x_start <= x <= x_end and y_start <= y <= y_end and z_start <= z <= z_end:
-                    b_arrow = arrow(pos=poi, axis=b_at_poi * 1e6, color=color.blue, opacity=0.15)
+    for (poi, b_at_poi) in zip(pois, calc_mag_fields([left_ring, right_ring], pois)):
+        b_arrow = arrow(pos=poi, axis=b_at_poi * 1e6, color=color.blue, opacity=0.15)
 
-                    if mag(b_arrow.axis) > arrow_sat:
-                        b_arrow.axis = arrow_sat * hat(b_arrow.axis)
+        if mag(b_arrow.axis) > arrow_sat:
+            b_arrow.axis = arrow_sat * hat(b_arrow.axis)
 
-                    b_arrow.b = b_at_poi
-                    b_arrow.poi = poi
+        b_arrow.b = b_at_poi
+        b_arrow.poi = poi
 
 
 # create physical electron from given settings
 def set_electron(settings, already_exists=None):
     exists = already_exists is not None
 
-    out = already_exists if exists else sphere(radius=0.025, color=color.red, make_trail=True, retain=150)
+    out = already_exists if exists else sphere(radius=0.025, color=color.red)
     out.pos = settings['pos']
     out.charge = settings['charge']
     out.mass = settings['mass']
@@ -150,6 +170,8 @@ def set_electron(settings, already_exists=None):
         out.force_arrow.pos = out.pos
         out.force_arrow.axis = out.b_force * scale_factor(out.b_force, prop_to=out.radius)
     else:
+        # the trail is drawn by hand, all of a frame's steps at once, so it keeps every step of the last 150
+        out.trail = curve(color=out.color, retain=150)
         out.velocity_label = label(pos=label_pos, text=label_text, height=10)
         out.velocity_arrow = arrow(pos=out.pos, axis=out.velocity * scale_factor(out.velocity), color=color.purple)
         out.force_arrow = arrow(pos=out.pos, axis=out.b_force * scale_factor(out.b_force), color=color.orange)
@@ -166,47 +188,120 @@ draw_b_field()
 # print(f"Maximum B seen: {b_max}")
 
 
+# magnetic field of both rings at the given (N, 3) positions, as an array
+def bottle_field(positions):
+    return left_ring.source.field_at(positions) + right_ring.source.field_at(positions)
+
+
+# whether each of the given (N, 3) positions is still between the rings and within their radius
+def inside_bottle(positions):
+    return ((positions[:, 0] > left_ring.pos.x) & (positions[:, 0] < right_ring.pos.x) &
+            (np.hypot(positions[:, 1], positions[:, 2]) < ring_radius))
+
+
+# trace an ensemble of electrons around the initial one: spread over its gyroradius, half to one and a half times its
+# speed and isotropic pitch angles
+if ensemble_size > 0:
+    tracer = EnsembleTracer(electron_init['charge'], electron_init['mass'], bottle_field, inside_bottle)
+    initial_speed = mag(electron_init['velocity'])
+    positions, velocities = tracer.sample(ensemble_size, center=(0, 0, 0), spread=(0, ring_radius / 8, ring_radius / 8),
+                                          speeds=(0.5 * initial_speed, 1.5 * initial_speed), sampling=ensemble_sampling)
+    if ensemble_guiding_center:
+        guiding_centers = GuidingCenter(electron_init['charge'], electron_init['mass'], bottle_field, inside_bottle)
+        ensemble = guiding_centers.run(positions, velocities, guiding_center_dt, ensemble_duration, full_orbit_dt=boris_dt)
+    else:
+        ensemble = tracer.run(positions, velocities, boris_dt, ensemble_duration, check_every=10)
+    print(f"Ensemble: {EnsembleTracer.summary(ensemble)}")
+
+    if ensemble_output is not None:
+        np.save(ensemble_output, ensemble)
+
+
+# trace the initial electron with the adaptive stepper, recording every mirror point (where v is perpendicular to B)
+# and stopping as soon as it leaves the bottle
+if adaptive_trace:
+    charge_to_mass = electron_init['charge'] / electron_init['mass']
+
+    def lorentz(t, y):
+        positions, velocities = DormandPrince.unpack(y)
+        return DormandPrince.pack(velocities, charge_to_mass * np.cross(velocities, bottle_field(positions)))
+
+    def outside_bottle(t, y):
+        position = y[:3]
+        return max(left_ring.pos.x - position[0], position[0] - right_ring.pos.x, np.hypot(position[1], position[2]) - ring_radius)
+
+    def parallel_velocity(t, y):
+        positions, velocities = DormandPrince.unpack(y)
+        return float(np.dot(velocities[0], bottle_field(positions)[0]))
+
+    start = electron_init['pos']
+    start_velocity = electron_init['velocity']
+    trace = DormandPrince(rtol=1e-8, atol=1e-12).solve(
+        lorentz, 0, DormandPrince.pack((start.x, start.y, start.z), (start_velocity.x, start_velocity.y, start_velocity.z)),
+        adaptive_duration, events=[Event(outside_bottle, terminal=True, direction=1, name="escaped"),
+                                   Event(parallel_velocity, name="mirror point")], record=False)
+
+    outcome = 'escaped' if trace['terminated'] else 'still trapped' if trace['completed'] else 'out of steps'
+    print(f"Adaptive trace: {trace['steps']} steps ({trace['rejected']} rejected), "
+          f"{outcome} at {trace['t'][-1] * 1e3:.3f} ms")
+
+    for (name, t, state) in trace['events']:
+        print(f"  {name} at {t * 1e3:.4f} ms, x = {state[0]:.4f} m")
+
+
 def reset_electron():
     global run_sim, electron_init, electron
 
     run_sim = False
     electron = set_electron(electron_init, electron)
-    electron.clear_trail()
+    electron.trail.clear()
 
 
 def simulate_electron():
     global run_sim, electron
 
     t = 0
-    dt = 12e-8
+    dt = boris_dt if boris_pusher else 12e-8
+    pusher = BorisPusher(electron.charge, electron.mass)
 
     while True:
-        # rate loop to 60 itr/sec
-        rate(1024)
+        # one frame per iteration: steps_per_frame physics steps, then the electron is drawn once
+        rate(frame_rate)
 
         # if the sim should not run, skip iteration
         if not run_sim:
             continue
 
-        b_field = calc_mag_field([left_ring, right_ring], electron.pos)
-        # print(f"Magnetic field is {b_field}T ({mag(b_field)}T)")
-
-        # find force on electron due to B_total
-        electron.magnetic_force = cross(electron.charge * electron.velocity, b_field)
-        # print(f"Force on electron is {electron.magnetic_force}N ({mag(electron.magnetic_force)}N)")
-
-        # update electron's momentum
-        electron.momentum += electron.magnetic_force * dt
-        # print(f"Momentum of electron is {electron.momentum}kgm/s")
-
-        # update electron's velocity
-        electron.velocity = electron.momentum / electron.mass
-        electron.vperp2b = cross(electron.velocity, b_field)
-        # print(f"Velocity of electron is {electron.velocity}m/s")
-
-        # update the position due to the updated momentum
-        electron.pos += electron.velocity * dt
-        # print(f"Position of electron is ({electron.pos.x:.2e}, {electron.pos.y:.2e}, {electron.pos.z:.2e})")
+        position = np.array((electron.pos.x, electron.pos.y, electron.pos.z))
+        velocity = np.array((electron.velocity.x, electron.velocity.y, electron.velocity.z))
+        trail = []
+
+        for _ in range(steps_per_frame):
+            if b_table is not None:
+                b_field = b_table.field_at(position)[0]
+            else:
+                b_field = bottle_field(position[None])[0]
+
+            # find force on electron due to B_total
+            magnetic_force = np.cross(electron.charge * velocity, b_field)
+
+            if boris_pusher:
+                # rotate the velocity about B_total without changing its magnitude, then move the electron
+                position, velocity = pusher.step(position, velocity, dt, b_values=b_field)
+            else:
+                # update electron's momentum, then the position due to the updated momentum
+                velocity = velocity + magnetic_force / electron.mass * dt
+                position = position + velocity * dt
+
+            trail.append(vec(*position))
+            t += dt
+
+        electron.velocity = vec(*velocity)
+        electron.momentum = electron.mass * electron.velocity
+        electron.vperp2b = cross(electron.velocity, vec(*b_field))
+        electron.magnetic_force = vec(*magnetic_force)
+        electron.pos = vec(*position)
+        electron.trail.append(trail)
 
         # update velocity label
         electron.velocity_label.text = f"{mag(electron.velocity) / 1000:.2f} km/s"
@@ -218,9 +313,6 @@ def simulate_electron():
         electron.force_arrow.pos = electron.pos
         electron.force_arrow.axis = electron.magnetic_force * scale_factor(electron.magnetic_force)
 
-        # print()
-        t += dt
-
 
 def toggle_sim_running(b):
     global run_sim
@@ -1,4 +1,7 @@
 from vpython import *
+import numpy as np
+
+from physics.CurrentPath import CurrentPath
 
 # constants
 ring_radius = 5  # radius of ring, meters
@@ -10,7 +13,6 @@ dtheta = total_theta / num_slices  # differential angle of each slice, radians
 
 mu_naught = (4 * pi) * 1e-7  # tesla*meter/sec
 current = -300.0  # amps
-integration_constant = (mu_naught * current) / (4 * pi)  # constant out front of BS law integral
 
 scale_factor = 2e-14  # factor by which to scale arrows
 
@@ -23,31 +25,20 @@ label_y = label(pos=line_y.pos + line_y.axis, text='y', height=10)
 label_z = label(pos=line_z.pos + line_z.axis, text='z', height=10)
 
 
-# get direction of any theta position on the ring
-def calc_theta_hat(theta):
-    return vec(0, cos(theta), -sin(theta))  # yz plane, x set to zero
+# slice the ring once in the yz plane, theta running from +z towards +y (counterclockwise about -x)
+ring_path = CurrentPath.arc(center=(0, 0, 0), axis=(-1, 0, 0), radius=ring_radius, theta_min=theta_min,
+                            theta_max=theta_max, num_slices=num_slices, current=current, reference=(0, 0, 1))
 
 
-# get differential arclength of ring
-def calc_ds(theta):
-    return ring_radius * dtheta * calc_theta_hat(theta)
+# calculate the magnetic field of the ring at every given position in one pass
+def calc_mag_fields(positions):
+    pois = np.array([(position.x, position.y, position.z) for position in positions]).reshape(-1, 3)
+    return [vec(*b) for b in ring_path.field_at(pois)]
 
 
 # calculate the magnetic field of the ring at a specific position
 def calc_mag_field(position):
-    B_total = vec(0, 0, 0)  # total magnetic field
-
-    for theta in arange(theta_min, theta_max, dtheta):
-        segment = ring_radius * vec(0, sin(theta), cos(theta))
-        r = position - segment  # r vector from segment to arbitrary POI --ring in yz plane--
-        r_mag = mag(r)  # mag of r vector
-
-        ds = calc_ds(theta)  # differential arclength of a specific theta
-
-        if r_mag != 0:
-            B_total += integration_constant * (cross(ds, r) / r_mag ** 3)  # append differential B to total B
-
-    return B_total
+    return calc_mag_fields([position])[0]
 
 
 # draw ring
@@ -1,9 +1,13 @@
 from vpython import *
 
+from physics.BiotSavart import BiotSavart
+from physics.StraightSegment import StraightSegment
+
 # wire size constants
 y_min = -10  # bottom end from origin, meters
 y_max = 10  # top end from origin, meters
 num_slices = 600  # how many slices to cut wire into
+exact_segment = False  # evaluate the wire as one exact straight segment instead of num_slices slices
 wire_length = y_max - y_min  # length of wire, meters
 dy = wire_length / num_slices  # length of each slice, meters
 
@@ -11,7 +15,6 @@ dy = wire_length / num_slices  # length of each slice, meters
 mu_naught = (4 * pi) * 1e-7  # tesla*meter/sec
 i = 1.00  # amps
 i_flow_direction = 1 if i > 0 else -1
-integration_constant = (mu_naught * i) / (4 * pi)  # constant out front of BS law integral
 point_of_interest = vec(5, 0, 0)  # point at which to calculate B field
 
 # data holders
@@ -44,19 +47,14 @@ for y in arange(y_min, y_max, dy):
 for segment in wire:
     segment.i_arrow = arrow(pos=segment.pos + vec(0, dy / 4, 0), axis=vec(0, i * i_flow_direction * 0.75, 0), color=color.red)
 
-# calculate magnetic field
-for segment in wire:
-    adjusted_source = segment.pos - vec(0, dy / 2, 0)  # middle of source/segment
-    r = point_of_interest - adjusted_source  # calculate r vector from adjusted source to POI
-    r_mag = mag(r)  # magnitude of r vector
-    ds = segment.axis  # differential length of wire
-
-    if mag(r) == 0:
-        print(f"r = 0 for source {adjusted_source}; B_field would be infinite at this area. Skipping iteration.")
-        continue
-
-    segment.dB = integration_constant * (cross(ds, r) / pow(r_mag, 3))  # differential B field
-    B_experimental += segment.dB  # add diff B to total B
+# calculate magnetic field, summing the differential B of every segment (from its middle) in one pass
+if exact_segment:
+    # closed form field of the whole wire, a single evaluation however many slices it is drawn with
+    wire_source = StraightSegment(start=(0, y_min, 0), end=(0, y_max, 0), current=i)
+    B_experimental = vec(*wire_source.field_at([BiotSavart.as_array(point_of_interest)])[0])
+else:
+    midpoints, dls = BiotSavart.segment_arrays(wire)
+    B_experimental = vec(*BiotSavart.field_at([BiotSavart.as_array(point_of_interest)], midpoints, dls, current=i)[0])
 
 # desaturate B_experimental if necessary
 desaturated_b_experimental = B_experimental
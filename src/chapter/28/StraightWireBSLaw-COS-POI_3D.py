@@ -1,8 +1,13 @@
 from vpython import *
+import numpy as np
+
+from physics.BiotSavart import BiotSavart
+from physics.StraightSegment import StraightSegment
 # import time
 
 # wire size constants
 num_slices = 200  # how many slices to cut wire into
+exact_segment = False  # evaluate the wire as one exact straight segment instead of num_slices slices
 wire_length = 20  # length of wire, meters
 y_min = -(wire_length / 2)  # bottom end from origin, meters
 y_max = wire_length / 2  # top end from origin, meters
@@ -13,7 +18,6 @@ dy = wire_length / num_slices  # length of each slice, meters
 mu_naught = (4 * pi) * 1e-7  # tesla*meter/sec
 i = -1.00  # amps
 i_flow_direction = 1 if i > 0 else -1
-integration_constant = (mu_naught * i) / (4 * pi)  # constant out front of BS law integral
 
 # display constants
 sat_level = 1.75e-8
@@ -36,28 +40,24 @@ for y in arange(y_min, y_max, dy):
     wire.append(segment)
 
 
-def calc_mag_field(chunks, poi):
-    b_experimental = vec(0, 0, 0)
-
-    r_tot = vec(0, 0, 0)
-    ds_tot = vec(0, 0, 0)
-
-    for chunk in chunks:
-        source = chunk.pos + vec(0, dy / 2, 0)  # calculate middle of chunk
-        ds = chunk.axis
-        ds_tot += ds
-
-        r = poi - source  # calculate r vector from middle of source to POI
-        if mag(r) == 0:
-            print(f"r = 0; B_field would be infinite at this area. Skipping iteration.")
-            continue
+# noinspection PyShadowingNames
+def calc_mag_fields(segments, points_of_interest):
+    # B at every POI in one pass, summing the differential b of every segment (from its middle)
+    midpoints, dls = BiotSavart.segment_arrays(segments)
+    pois = np.array([BiotSavart.as_array(poi) for poi in points_of_interest]).reshape(-1, 3)
 
-        r_tot += r
+    if exact_segment:
+        # closed form field of the whole wire, a single evaluation per POI however many slices it is drawn with
+        b_experimental = StraightSegment(start=(0, y_min, 0), end=(0, y_max, 0), current=i).field_at(pois)
+    else:
+        b_experimental = BiotSavart.field_at(pois, midpoints, dls, current=i)
 
-        db = integration_constant * cross(ds, r) / (mag(r) ** 3)  # differential b
-        b_experimental += db  # add diff B to total B
+    # direction of ds_tot x r_tot, r_tot being the sum of the r vectors from the middle of each source to the POI
+    ds_tot = dls.sum(axis=0)
+    r_tot = len(midpoints) * pois - midpoints.sum(axis=0)
+    directions = np.cross(ds_tot, r_tot)
 
-    return b_experimental, hat(cross(ds_tot, r_tot))
+    return [(vec(*b), hat(vec(*direction))) for (b, direction) in zip(b_experimental, directions)]
 
 
 # def quick_gen_chunks(len, num):
@@ -110,50 +110,45 @@ def calc_mag_field(chunks, poi):
 #     print()
 
 # draw POIs, calculate B at those POIs, and draw arrows
-for x in arange(-10, 12, 2):
-    for y in arange(-10, 12, 2):
-        for z in arange(-10, 12, 2):
-            if x == 0 and z == 0:
-                continue
-
-            point_of_interest = vec(x, y, z)
-            b, r_hat = calc_mag_field(wire, point_of_interest)
-            b_mag = mag(b)
-            # print(f"b_mag = {b_mag}")
-
-            desat_b = b
-            if b_mag > sat_level:
-                # print(">> desaturating")
-                desat_b = sat_level * hat(b)
-
-            desat_b_mag = mag(desat_b)
-            # print(f"desat_b_mag = {desat_b_mag}")
-
-            if desat_b_mag != 0:
-                b_arrow_color = color.red if b_mag > desat_b_mag else color.white
-                b_arrow_opacity = (desat_b_mag / b_mag)
-                # print(f">> opacity = {b_arrow_opacity}")
-                b_arrow = arrow(pos=point_of_interest, axis=desat_b * scale_factor(desat_b), color=b_arrow_color, opacity=b_arrow_opacity)
-                # print(b_arrow.axis)
-
-            b_theory = vec(0, 0, 0)
-            b_theory_mag = 0
-            a = mag(point_of_interest)
-            if a != 0:
-                b_theory = ((mu_naught * i) / (2 * pi * a)) * hat(r_hat)
-                b_theory_mag = mag(b_theory)
-
-                desat_b_th = b_theory
-                if mag(desat_b_th) > sat_level:
-                    desat_b_th = sat_level * hat(b_theory)
-
-                desat_b_th_mag = mag(desat_b_th)
-                if desat_b_th_mag != 0:
-                    b_th_arrow_color = color.yellow if b_theory_mag > desat_b_th_mag else color.blue
-                    b_th_arrow_opacity = b_theory_mag / desat_b_th_mag
-                    b_th_arrow = arrow(pos=point_of_interest, axis=desat_b_th * 1e8, color=b_th_arrow_color, opacity=b_th_arrow_opacity)
-
-            print(f"b @ {point_of_interest} = {b} (= {b_mag:.3e})")
-            print(f"b_exact @ {point_of_interest} = {b_theory} (= {b_theory_mag:.3e})")
-            print(f"pdiff @ {point_of_interest} = {((b_mag - b_theory_mag) / b_theory_mag) * 100:.2f}%")
-            print()
+points_of_interest = [vec(x, y, z) for x in arange(-10, 12, 2) for y in arange(-10, 12, 2) for z in arange(-10, 12, 2)
+                      if not (x == 0 and z == 0)]
+for (point_of_interest, (b, r_hat)) in zip(points_of_interest, calc_mag_fields(wire, points_of_interest)):
+    b_mag = mag(b)
+    # print(f"b_mag = {b_mag}")
+
+    desat_b = b
+    if b_mag > sat_level:
+        # print(">> desaturating")
+        desat_b = sat_level * hat(b)
+
+    desat_b_mag = mag(desat_b)
+    # print(f"desat_b_mag = {desat_b_mag}")
+
+    if desat_b_mag != 0:
+        b_arrow_color = color.red if b_mag > desat_b_mag else color.white
+        b_arrow_opacity = (desat_b_mag / b_mag)
+        # print(f">> opacity = {b_arrow_opacity}")
+        b_arrow = arrow(pos=point_of_interest, axis=desat_b * scale_factor(desat_b), color=b_arrow_color, opacity=b_arrow_opacity)
+        # print(b_arrow.axis)
+
+    b_theory = vec(0, 0, 0)
+    b_theory_mag = 0
+    a = mag(point_of_interest)
+    if a != 0:
+        b_theory = ((mu_naught * i) / (2 * pi * a)) * hat(r_hat)
+        b_theory_mag = mag(b_theory)
+
+        desat_b_th = b_theory
+        if mag(desat_b_th) > sat_level:
+            desat_b_th = sat_level * hat(b_theory)
+
+        desat_b_th_mag = mag(desat_b_th)
+        if desat_b_th_mag != 0:
+            b_th_arrow_color = color.yellow if b_theory_mag > desat_b_th_mag else color.blue
+            b_th_arrow_opacity = b_theory_mag / desat_b_th_mag
+            b_th_arrow = arrow(pos=point_of_interest, axis=desat_b_th * 1e8, color=b_th_arrow_color, opacity=b_th_arrow_opacity)
+
+    print(f"b @ {point_of_interest} = {b} (= {b_mag:.3e})")
+    print(f"b_exact @ {point_of_interest} = {b_theory} (= {b_theory_mag:.3e})")
+    print(f"pdiff @ {point_of_interest} = {((b_mag - b_theory_mag) / b_theory_mag) * 100:.2f}%")
+    print()
@@ -1,7 +1,11 @@
 from vpython import *
 
+from physics.BiotSavart import BiotSavart
+from physics.StraightSegment import StraightSegment
+
 # wire size constants
 num_slices = 200  # how many slices to cut wire into
+exact_segment = False  # evaluate the wire as one exact straight segment instead of num_slices slices
 wire_length = 20  # length of wire, meters
 y_min = -(wire_length / 2)  # bottom end from origin, meters
 y_max = wire_length / 2  # top end from origin, meters
@@ -12,7 +16,6 @@ print(f"dy = {dy}")
 mu_naught = (4 * pi) * 1e-7  # tesla*meter/sec
 i = 1.00  # amps
 i_flow_direction = 1 if i > 0 else -1
-integration_constant = (mu_naught * i) / (4 * pi)  # constant out front of BS law integral
 point_of_interest = vec(1, 0, 0)  # point at which to calculate B field
 
 # data holders
@@ -38,16 +41,14 @@ for y in arange(y_min, y_max, dy):
     # segment.i_arrow = arrow(pos=segment.pos + vec(0, dy / 4, 0), axis=vec(0, i * 0.75, 0), color=color.red)  # draw current (for visual only)
     wire.append(segment)
 
-# find b total
-for segment in wire:
-    r = point_of_interest - (segment.pos + vec(0, dy / 2, 0))  # calculate r vector from middle of source to POI
-    if mag(r) == 0:
-        print(f"r = 0; B_field would be infinite at this area. Skipping iteration.")
-        continue
-
-    ds = segment.axis  # length of wire segment
-    db = integration_constant * cross(ds, r) / (mag(r) ** 3)  # differential b
-    B_experimental += db  # add diff B to total B
+# find b total, summing the differential b of every segment (from its middle) in one pass
+if exact_segment:
+    # closed form field of the whole wire, a single evaluation however many slices it is drawn with
+    wire_source = StraightSegment(start=(0, y_min, 0), end=(0, y_max, 0), current=i)
+    B_experimental = vec(*wire_source.field_at([BiotSavart.as_array(point_of_interest)])[0])
+else:
+    midpoints, dls = BiotSavart.segment_arrays(wire)
+    B_experimental = vec(*BiotSavart.field_at([BiotSavart.as_array(point_of_interest)], midpoints, dls, current=i)[0])
 
 # desaturate B_experimental if necessary
 desaturated_b_experimental = B_experimental
@@ -0,0 +1 @@
+# Lets pytest import the physics and util modules the same way the chapter scripts do, run from src/: python -m pytest
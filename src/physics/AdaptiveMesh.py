@@ -0,0 +1,169 @@
+import numpy as np
+
+from physics.FieldEvaluator import FieldEvaluator
+
+
+class AdaptiveMesh:
+    """
+    AdaptiveMesh samples a field over a box with a quadtree (flat in one axis) or octree of cells instead of a uniform
+    grid. It starts from a coarse grid of base cells and splits a cell into 4 or 8 children wherever the potential is
+    poorly represented by its corners:
+        the interpolation error |V(center) - mean of V(corners)| exceeds tolerance (volts), or
+        |E(center)| * cell size, i.e. |grad V| times the cell width, exceeds gradient_tolerance (volts), if given.
+
+    Smooth regions stay coarse while cells around singular sources keep splitting down to max_depth, which reaches the
+    fidelity of a uniform grid at the finest spacing with a small fraction of its samples. Corners shared by several
+    cells are evaluated once; sample points live on an integer lattice of the finest half-cell so they can be cached.
+
+    evaluate(points) gets an (M, 3) array of points and returns the field (M, 3) and potential (M,) there, e.g.
+    FieldEvaluator.evaluate_points. The finished mesh is exposed as a leaf-cell list, see leaves() and export().
+    """
+
+    def __init__(self, evaluate, lower, upper, base_cells=(8, 8, 8), tolerance: float = 0.5,
+                 gradient_tolerance: float = None, max_depth: int = 8, min_depth: int = 0):
+        self.evaluate_points = evaluate
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.active = self.upper > self.lower  # axes the mesh extends along, a flat axis makes it a quadtree
+        self.base_cells = np.where(self.active, np.asarray(base_cells, dtype=np.int64), 1)
+        self.tolerance = tolerance
+        self.gradient_tolerance = gradient_tolerance
+        self.max_depth = max_depth
+        self.min_depth = min_depth
+
+        # lattice unit: half the edge of a cell at max_depth, so corners and centers of every cell are lattice points
+        self.base_size = 2 ** (max_depth + 1)
+        self.unit = np.where(self.active, (self.upper - self.lower) / (self.base_cells * self.base_size), 0.0)
+        self.extent = np.where(self.active, self.base_cells * self.base_size + 1, 1)
+
+        if np.sum(np.log2(self.extent.astype(float))) > 62:
+            raise ValueError("base_cells and max_depth are too fine for 64 bit lattice keys")
+
+        self.cache_keys = np.zeros(0, dtype=np.int64)
+        self.cache_fields = np.zeros((0, 3))
+        self.cache_potentials = np.zeros(0)
+        self.evaluations = 0
+
+        self.leaf_mins = None
+        self.leaf_levels = None
+        self.leaf_fields = None
+        self.leaf_potentials = None
+
+    @staticmethod
+    def from_charges(charges, lower, upper, **kwargs) -> 'AdaptiveMesh':
+        """Builds a mesh of the field of point charges, a list of ElectricCharge or a (positions, values) pair"""
+        return AdaptiveMesh(lambda points: FieldEvaluator.evaluate_points(points, charges), lower, upper, **kwargs)
+
+    def refine(self) -> 'AdaptiveMesh':
+        """Builds the mesh, level by level from the base cells down, and keeps the leaf cells"""
+        corner_offsets = self.__corner_offsets__()
+        mins = np.stack([axis.ravel() for axis in np.meshgrid(*(np.arange(n) for n in self.base_cells),
+                                                              indexing='ij')], axis=1) * self.base_size
+
+        leaf_mins, leaf_levels, leaf_fields, leaf_potentials = [], [], [], []
+
+        for level in range(self.max_depth + 1):
+            if mins.shape[0] == 0:
+                break
+
+            size = self.base_size >> level
+            half = np.where(self.active, size // 2, 0)
+            centers = mins + half
+            corners = (mins[:, None, :] + corner_offsets[None, :, :] * size).reshape(-1, 3)
+
+            center_fields, center_potentials = self.__sample__(centers)
+            corner_potentials = self.__sample__(corners)[1].reshape(mins.shape[0], -1)
+
+            split = np.abs(center_potentials - corner_potentials.mean(axis=1)) > self.tolerance
+
+            if self.gradient_tolerance is not None:
+                width = np.max(self.unit * size)
+                split |= np.sqrt(np.einsum('ij,ij->i', center_fields, center_fields)) * width > self.gradient_tolerance
+
+            if level < self.min_depth:
+                split[:] = True
+            elif level == self.max_depth:
+                split[:] = False
+
+            leaf_mins.append(mins[~split])
+            leaf_levels.append(np.full(np.count_nonzero(~split), level))
+            leaf_fields.append(center_fields[~split])
+            leaf_potentials.append(center_potentials[~split])
+
+            # children: the split cells' min corners offset by half their size along each active axis
+            mins = (mins[split][:, None, :] + corner_offsets[None, :, :] * (size // 2)).reshape(-1, 3)
+
+        self.leaf_mins = np.concatenate(leaf_mins)
+        self.leaf_levels = np.concatenate(leaf_levels)
+        self.leaf_fields = np.concatenate(leaf_fields)
+        self.leaf_potentials = np.concatenate(leaf_potentials)
+
+        return self
+
+    def leaves(self) -> dict:
+        """
+        Gets the leaf-cell list as a dict of arrays, one row per leaf: center (L, 3) and size (L, 3) in meters, level
+        (L,), and the field E (L, 3) and potential V (L,) at the center. A flat axis has size 0.
+        """
+        if self.leaf_mins is None:
+            self.refine()
+
+        sizes = (self.base_size >> self.leaf_levels)[:, None] * self.unit[None, :]
+
+        return {
+            "center": self.lower + self.leaf_mins * self.unit + sizes / 2,
+            "size": sizes,
+            "level": self.leaf_levels,
+            "E": self.leaf_fields,
+            "V": self.leaf_potentials,
+        }
+
+    def export(self, path: str) -> None:
+        """Saves the leaf-cell list to a compressed .npz file with the arrays of leaves()"""
+        np.savez_compressed(path, lower=self.lower, upper=self.upper, evaluations=self.evaluations, **self.leaves())
+
+    @property
+    def uniform_evaluations(self) -> int:
+        """Gets the number of samples a uniform grid at the spacing of the finest leaves would have needed"""
+        if self.leaf_mins is None:
+            self.refine()
+
+        finest = int(self.leaf_levels.max(initial=0))
+        points = np.where(self.active, self.base_cells * 2 ** finest + 1, 1)
+
+        return int(np.prod(points))
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    def __corner_offsets__(self) -> np.ndarray:
+        """Gets the 0 / 1 corner offsets of a cell, 4 of them for a quadtree and 8 for an octree"""
+        ranges = [(0, 1) if active else (0,) for active in self.active]
+        return np.stack([axis.ravel() for axis in np.meshgrid(*ranges, indexing='ij')], axis=1)
+
+    def __sample__(self, lattice_points: np.ndarray):
+        """Gets the field and potential at lattice points, evaluating only the ones not seen before"""
+        keys = (lattice_points[:, 0] * self.extent[1] + lattice_points[:, 1]) * self.extent[2] + lattice_points[:, 2]
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+
+        known = np.zeros(unique_keys.size, dtype=bool)
+
+        if self.cache_keys.size > 0:
+            rows = np.minimum(np.searchsorted(self.cache_keys, unique_keys), self.cache_keys.size - 1)
+            known = self.cache_keys[rows] == unique_keys
+
+        if not np.all(known):
+            new_keys = unique_keys[~known]
+            new_points = np.stack(np.unravel_index(new_keys, tuple(self.extent)), axis=1)
+            new_fields, new_potentials = self.evaluate_points(self.lower + new_points * self.unit)
+            self.evaluations += new_keys.size
+
+            keys_all = np.concatenate((self.cache_keys, new_keys))
+            order = np.argsort(keys_all, kind='stable')
+            self.cache_keys = keys_all[order]
+            self.cache_fields = np.concatenate((self.cache_fields, np.asarray(new_fields).reshape(-1, 3)))[order]
+            self.cache_potentials = np.concatenate((self.cache_potentials, np.asarray(new_potentials).ravel()))[order]
+
+        rows = np.searchsorted(self.cache_keys, unique_keys)[inverse]
+
+        return self.cache_fields[rows], self.cache_potentials[rows]
@@ -0,0 +1,411 @@
+import numpy as np
+
+from physics.Constants import Constants
+from physics.ElectricForceKernel import ElectricForceKernel
+
+
+class BarnesHut:
+    """
+    BarnesHut evaluates electric forces and potentials of a large set of point charges with an octree instead of the
+    direct O(N^2) sum. Distant cells are replaced by their multipole expansion (monopole, dipole and quadrupole, taken
+    about the cell center so that mixed sign cells stay accurate) whenever the cell size s and the distance d from the
+    target to the cell satisfy s / d < theta. Smaller theta is more accurate and slower; theta = 0 is the direct sum.
+
+    The tree is built level by level from sorted Morton codes. Targets are walked through the tree in compact groups
+    (the tree's own leaves, or runs of leaf_size targets along the same curve) that share one interaction list, so all
+    of the heavy lifting happens in NumPy on dense (pair, target) blocks rather than in per-charge Python loops.
+    """
+    K = Constants.K  # Coulomb's constant
+    MAX_DEPTH = 21  # 21 bits per axis fit a Morton code in 63 bits
+    PAIR_BLOCK_BYTES = 4 * 1024 * 1024  # memory budget for one block of pair evaluations
+
+    def __init__(self, positions, charges, theta: float = 0.7, leaf_size: int = 12, softening: float = 0.0,
+                 group_batch: int = 512):
+        self.positions = np.ascontiguousarray(np.asarray(positions, dtype=float).reshape(-1, 3))
+        self.charges = np.ascontiguousarray(np.broadcast_to(np.asarray(charges, dtype=float),
+                                                            self.positions.shape[:1]))
+        self.theta = theta
+        self.leaf_size = max(1, leaf_size)
+        self.softening = softening
+        self.group_batch = group_batch
+
+        self.__build_tree__()
+
+    @staticmethod
+    def from_charges(charges, **kwargs) -> 'BarnesHut':
+        """Builds a tree from a list of ElectricCharge objects"""
+        positions, values = ElectricForceKernel.charge_arrays(charges)
+        return BarnesHut(positions, values, **kwargs)
+
+    ##############################
+    # Evaluation
+    ##############################
+    def fields(self, targets=None):
+        """
+        Gets the electric field (M, 3) and potential (M,) at the given target points, or at every charge (excluding
+        its own contribution) if no targets are given.
+        """
+        m = self.positions.shape[0] if targets is None else int(np.size(targets) // 3)
+
+        if m == 0 or self.node_count == 0:
+            return np.zeros((m, 3)), np.zeros(m)
+
+        if targets is None:
+            # the tree's own leaves are the most compact groups of the charges themselves
+            groups = self.leaf_positions
+            owner = self.order[self.leaf_index]
+            valid = self.leaf_index >= 0
+        else:
+            # sort the targets along the Morton curve and cut them into groups of leaf_size neighbours, padding the last
+            # group by repeating its final target
+            targets = np.asarray(targets, dtype=float).reshape(-1, 3)
+            order = np.argsort(self.__morton_of__(targets), kind='stable')
+            group_count = -(-m // self.leaf_size)
+            owner = np.concatenate((order, np.full(group_count * self.leaf_size - m, -1))).reshape(group_count, -1)
+            valid = owner >= 0
+            groups = targets[np.where(valid, owner, order[-1])]
+
+        group_count, size = groups.shape[:2]
+        group_min = groups.min(axis=1)
+        group_max = groups.max(axis=1)
+        group_center = (group_min + group_max) / 2
+        group_radius = np.linalg.norm(group_max - group_min, axis=1) / 2
+
+        field = np.zeros((group_count, size, 3))
+        potential = np.zeros((group_count, size))
+
+        for start in range(0, group_count, self.group_batch):
+            g = np.arange(start, min(start + self.group_batch, group_count))
+            accepted, direct = self.__interaction_lists__(g, group_center, group_radius)
+            self.__apply_multipoles__(groups, accepted, field, potential)
+            self.__apply_direct__(groups, direct, field, potential)
+
+        out_field = np.empty((m, 3))
+        out_potential = np.empty(m)
+        out_field[owner[valid]] = field[valid]
+        out_potential[owner[valid]] = potential[valid]
+
+        return self.K * out_field, self.K * out_potential
+
+    def net_forces(self, with_error: bool = False):
+        """
+        Gets the (N, 3) array of net electric forces on each charge due to all of the others, or with with_error the
+        (forces, error_estimate()) pair, the estimate reusing the same tree pass
+        """
+        fields = self.fields()
+        forces = self.charges[:, None] * fields[0]
+
+        if with_error:
+            return forces, self.error_estimate(fields=fields)
+
+        return forces
+
+    def potentials(self) -> np.ndarray:
+        """Gets the (N,) array of electric potentials at each charge due to all of the others"""
+        _, potential = self.fields()
+        return potential
+
+    def error_estimate(self, sample_size: int = 256, seed: int = 0, fields=None) -> dict:
+        """
+        Estimates the tree error by comparing the forces and potentials of a random sample of charges against direct
+        summation. The tree values are the sampled rows of fields() over every charge, so they come from the same leaf
+        groups and acceptance tests as net_forces(); pass the (field, potential) of an earlier fields() call to reuse
+        it instead of walking the tree again. Errors are relative to the RMS of the direct values over the sample.
+        """
+        n = self.positions.shape[0]
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(n, size=min(sample_size, n), replace=False))
+
+        tree_field, tree_potential = fields if fields is not None else self.fields()
+        tree_field, tree_potential = tree_field[sample], tree_potential[sample]
+        direct_field, direct_potential = ElectricForceKernel.fields_at(self.positions[sample], self.positions,
+                                                                       self.charges, softening=self.softening)
+
+        tree_force = self.charges[sample, None] * tree_field
+        direct_force = self.charges[sample, None] * direct_field
+        force_error = np.linalg.norm(tree_force - direct_force, axis=1)
+        force_scale = np.sqrt(np.mean(np.sum(direct_force ** 2, axis=1)))
+        potential_error = np.abs(tree_potential - direct_potential)
+        potential_scale = np.sqrt(np.mean(direct_potential ** 2))
+
+        return dict(
+            sample_size=int(sample.size),
+            theta=self.theta,
+            force_rms_relative=float(np.sqrt(np.mean(force_error ** 2)) / force_scale) if force_scale > 0 else 0.0,
+            force_max_relative=float(force_error.max() / force_scale) if force_scale > 0 else 0.0,
+            potential_rms_relative=float(np.sqrt(np.mean(potential_error ** 2)) / potential_scale)
+            if potential_scale > 0 else 0.0,
+        )
+
+    ##############################
+    # Tree construction
+    ##############################
+    def __build_tree__(self):
+        """Sorts the charges along a Morton curve and splits occupied cells level by level into octants"""
+        n = self.positions.shape[0]
+        self.node_count = 0
+
+        if n == 0:
+            return
+
+        self.box_min = self.positions.min(axis=0)
+        size = float((self.positions.max(axis=0) - self.box_min).max())
+        self.box_size = size * (1 + 1e-9) if size > 0 else 1.0
+
+        codes = self.__morton_of__(self.positions)
+        self.order = np.argsort(codes, kind='stable')
+        codes = codes[self.order]
+        self.sorted_positions = self.positions[self.order]
+        self.sorted_charges = self.charges[self.order]
+
+        # Node storage, appended level by level. Children of a node are contiguous, so (first, count) describes them.
+        starts = [np.array([0])]
+        ends = [np.array([n])]
+        centers = [(self.box_min + self.box_size / 2)[None, :]]
+        halves = [np.array([self.box_size / 2])]
+        first_child = np.array([-1])
+        child_count = np.array([0])
+
+        live_nodes = np.array([0]) if n > self.leaf_size else np.array([], dtype=np.int64)
+        live_starts = np.array([0])
+        live_ends = np.array([n])
+        live_centers = centers[0]
+        live_halves = halves[0]
+        node_offset = 1
+
+        for level in range(1, self.MAX_DEPTH + 1):
+            if live_nodes.size == 0:
+                break
+
+            # particles that still sit in internal nodes of the previous level
+            idx = BarnesHut.__ranges__(live_starts, live_ends)
+            parent_of = np.repeat(np.arange(live_nodes.size), live_ends - live_starts)
+
+            prefix = codes[idx] >> (3 * (self.MAX_DEPTH - level))
+            new_segment = np.ones(idx.size, dtype=bool)
+            new_segment[1:] = (prefix[1:] != prefix[:-1]) | (parent_of[1:] != parent_of[:-1])
+            segment_starts = np.flatnonzero(new_segment)
+            segment_ends = np.append(segment_starts[1:], idx.size)
+
+            child_starts = idx[segment_starts]
+            child_ends = idx[segment_ends - 1] + 1
+            child_parent = parent_of[segment_starts]
+            octant = prefix[segment_starts] & 7
+
+            # offset every child from its parent center by half of the parent half-width along each axis
+            offsets = np.stack(((octant >> 2) & 1, (octant >> 1) & 1, octant & 1), axis=1) * 2 - 1
+            child_halves = live_halves[child_parent] / 2
+            child_centers = live_centers[child_parent] + offsets * child_halves[:, None]
+
+            child_ids = node_offset + np.arange(child_starts.size)
+            parents, first_index, per_parent = np.unique(child_parent, return_index=True, return_counts=True)
+            first_child = np.concatenate((first_child, np.full(child_starts.size, -1)))
+            child_count = np.concatenate((child_count, np.zeros(child_starts.size, dtype=np.int64)))
+            first_child[live_nodes[parents]] = child_ids[first_index]
+            child_count[live_nodes[parents]] = per_parent
+
+            starts.append(child_starts)
+            ends.append(child_ends)
+            centers.append(child_centers)
+            halves.append(child_halves)
+
+            splittable = (child_ends - child_starts > self.leaf_size) & (level < self.MAX_DEPTH)
+            live_nodes = child_ids[splittable]
+            live_starts = child_starts[splittable]
+            live_ends = child_ends[splittable]
+            live_centers = child_centers[splittable]
+            live_halves = child_halves[splittable]
+            node_offset += child_starts.size
+
+        self.node_start = np.concatenate(starts)
+        self.node_end = np.concatenate(ends)
+        self.node_center = np.concatenate(centers)
+        self.node_half = np.concatenate(halves)
+        self.node_first_child = first_child
+        self.node_child_count = child_count
+        self.node_is_leaf = child_count == 0
+        self.node_count = self.node_start.size
+
+        self.__compute_moments__()
+        self.__pack_leaves__()
+
+    def __compute_moments__(self):
+        """Computes the monopole, dipole and traceless quadrupole of every node about its center"""
+        counts = self.node_end - self.node_start
+        node_of = np.repeat(np.arange(self.node_count), counts)
+        idx = BarnesHut.__ranges__(self.node_start, self.node_end)
+
+        q = self.sorted_charges[idx]
+        s = self.sorted_positions[idx] - self.node_center[node_of]
+        s2 = np.sum(s * s, axis=1)
+
+        def node_sum(weights):
+            return np.bincount(node_of, weights=weights, minlength=self.node_count)
+
+        # q, dipole x/y/z, then quadrupole xx, yy, zz, xy, xz, yz
+        self.node_moments = np.stack([
+            node_sum(q),
+            node_sum(q * s[:, 0]),
+            node_sum(q * s[:, 1]),
+            node_sum(q * s[:, 2]),
+            node_sum(q * (3 * s[:, 0] * s[:, 0] - s2)),
+            node_sum(q * (3 * s[:, 1] * s[:, 1] - s2)),
+            node_sum(q * (3 * s[:, 2] * s[:, 2] - s2)),
+            node_sum(q * 3 * s[:, 0] * s[:, 1]),
+            node_sum(q * 3 * s[:, 0] * s[:, 2]),
+            node_sum(q * 3 * s[:, 1] * s[:, 2]),
+        ], axis=1)
+
+    def __pack_leaves__(self):
+        """Copies the charges of every leaf into a padded (leaves, width) block for dense direct summation"""
+        leaves = np.flatnonzero(self.node_is_leaf)
+        counts = self.node_end[leaves] - self.node_start[leaves]
+        width = int(counts.max())
+
+        self.leaf_slot = np.full(self.node_count, -1)
+        self.leaf_slot[leaves] = np.arange(leaves.size)
+
+        # Padding sits at the leaf center with zero charge so it contributes nothing
+        self.leaf_positions = np.repeat(self.node_center[leaves][:, None, :], width, axis=1)
+        self.leaf_charges = np.zeros((leaves.size, width))
+
+        row = np.repeat(np.arange(leaves.size), counts)
+        column = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        idx = BarnesHut.__ranges__(self.node_start[leaves], self.node_end[leaves])
+        self.leaf_positions[row, column] = self.sorted_positions[idx]
+        self.leaf_charges[row, column] = self.sorted_charges[idx]
+        self.leaf_index = np.full((leaves.size, width), -1)
+        self.leaf_index[row, column] = idx
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    def __interaction_lists__(self, g, group_center, group_radius):
+        """
+        Walks the tree for a batch of target groups at once, carrying a frontier of (group, node) pairs. Returns the
+        (group, node) pairs to be evaluated by multipole expansion and the (group, leaf) pairs to be summed directly.
+        """
+        theta = self.theta
+        nd = np.zeros(g.size, dtype=np.int64)
+        accepted = ([], [])
+        direct = ([], [])
+
+        while g.size > 0:
+            half = self.node_half[nd]
+            gap = np.linalg.norm(self.node_center[nd] - group_center[g], axis=1) - group_radius[g]
+
+            # every target in the group is at least gap away from the node center, and the node box lies within
+            # sqrt(3) * half of it, so the group is outside the box and every target sees s / d < theta
+            accept = (2 * half < theta * gap) & (gap > np.sqrt(3) * half)
+            leaf = ~accept & self.node_is_leaf[nd]
+            opened = ~(accept | leaf)
+
+            accepted[0].append(g[accept])
+            accepted[1].append(nd[accept])
+            direct[0].append(g[leaf])
+            direct[1].append(nd[leaf])
+
+            counts = self.node_child_count[nd[opened]]
+            g = np.repeat(g[opened], counts)
+            first = self.node_first_child[nd[opened]]
+            nd = BarnesHut.__ranges__(first, first + counts)
+
+        return (np.concatenate(accepted[0]), np.concatenate(accepted[1])), \
+            (np.concatenate(direct[0]), np.concatenate(direct[1]))
+
+    def __apply_multipoles__(self, groups, pairs, field, potential):
+        """Adds the multipole expansion of every accepted node onto every target in its group"""
+        g, nd = BarnesHut.__sorted_pairs__(*pairs)
+        block = max(1, self.PAIR_BLOCK_BYTES // (groups.shape[1] * 3 * 8 * 12))
+
+        for start in range(0, g.size, block):
+            bg = g[start:start + block]
+            bn = nd[start:start + block]
+
+            d = groups[bg] - self.node_center[bn][:, None, :]
+            moments = self.node_moments[bn]
+            q = moments[:, 0, None]
+            px, py, pz = moments[:, 1, None], moments[:, 2, None], moments[:, 3, None]
+            qxx, qyy, qzz = moments[:, 4, None], moments[:, 5, None], moments[:, 6, None]
+            qxy, qxz, qyz = moments[:, 7, None], moments[:, 8, None], moments[:, 9, None]
+            dx, dy, dz = d[:, :, 0], d[:, :, 1], d[:, :, 2]
+
+            inv_r2 = 1 / (dx * dx + dy * dy + dz * dz)
+            inv_r = np.sqrt(inv_r2)
+            inv_r3 = inv_r * inv_r2
+            inv_r5 = inv_r3 * inv_r2
+
+            p_dot_d = px * dx + py * dy + pz * dz
+            mx = qxx * dx + qxy * dy + qxz * dz
+            my = qxy * dx + qyy * dy + qyz * dz
+            mz = qxz * dx + qyz * dy + qzz * dz
+            d_m_d = dx * mx + dy * my + dz * mz
+
+            v = q * inv_r + p_dot_d * inv_r3 + 0.5 * d_m_d * inv_r5
+            radial = q * inv_r3 + 3 * p_dot_d * inv_r5 + 2.5 * d_m_d * inv_r5 * inv_r2
+            f = np.stack((dx * radial - px * inv_r3 - mx * inv_r5,
+                          dy * radial - py * inv_r3 - my * inv_r5,
+                          dz * radial - pz * inv_r3 - mz * inv_r5), axis=-1)
+
+            BarnesHut.__reduce_onto__(bg, f, v, field, potential)
+
+    def __apply_direct__(self, groups, pairs, field, potential):
+        """Adds the direct Coulomb sum of every near leaf onto every target in its group"""
+        g, nd = BarnesHut.__sorted_pairs__(*pairs)
+        slot = self.leaf_slot[nd]
+        width = self.leaf_charges.shape[1]
+        block = max(1, self.PAIR_BLOCK_BYTES // (groups.shape[1] * width * 3 * 8 * 4))
+        eps2 = self.softening * self.softening
+
+        for start in range(0, g.size, block):
+            bg = g[start:start + block]
+            bs = slot[start:start + block]
+
+            r = groups[bg][:, :, None, :] - self.leaf_positions[bs][:, None, :, :]
+            r2 = np.einsum('pijk,pijk->pij', r, r)
+            r2[r2 == 0] = np.inf  # a charge does not act on itself
+            inv_r = 1 / np.sqrt(r2 + eps2)
+            q_inv_r = self.leaf_charges[bs][:, None, :] * inv_r
+
+            v = q_inv_r.sum(axis=2)
+            f = np.einsum('pij,pijk->pik', q_inv_r * inv_r * inv_r, r)
+
+            BarnesHut.__reduce_onto__(bg, f, v, field, potential)
+
+    @staticmethod
+    def __reduce_onto__(g, f, v, field, potential):
+        """Sums per-pair contributions of consecutive equal groups and adds them onto those groups"""
+        if g.size == 0:
+            return
+
+        starts = np.flatnonzero(np.concatenate(([True], g[1:] != g[:-1])))
+        field[g[starts]] += np.add.reduceat(f, starts, axis=0)
+        potential[g[starts]] += np.add.reduceat(v, starts, axis=0)
+
+    @staticmethod
+    def __sorted_pairs__(g, nd):
+        order = np.argsort(g, kind='stable')
+        return g[order], nd[order]
+
+    @staticmethod
+    def __ranges__(starts, ends) -> np.ndarray:
+        """Concatenates arange(start, end) for every (start, end) pair"""
+        counts = ends - starts
+        return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+
+    def __morton_of__(self, points: np.ndarray) -> np.ndarray:
+        """Gets the Morton codes of points within the tree's bounding cube; outside points are clamped onto it"""
+        cells = np.floor((points - self.box_min) / self.box_size * (1 << self.MAX_DEPTH))
+        cells = np.clip(cells, 0, (1 << self.MAX_DEPTH) - 1).astype(np.uint64)
+
+        def spread(v):
+            v = v & np.uint64(0x1fffff)
+            v = (v | (v << np.uint64(32))) & np.uint64(0x1f00000000ffff)
+            v = (v | (v << np.uint64(16))) & np.uint64(0x1f0000ff0000ff)
+            v = (v | (v << np.uint64(8))) & np.uint64(0x100f00f00f00f00f)
+            v = (v | (v << np.uint64(4))) & np.uint64(0x10c30c30c30c30c3)
+            v = (v | (v << np.uint64(2))) & np.uint64(0x1249249249249249)
+            return v
+
+        codes = (spread(cells[:, 0]) << np.uint64(2)) | (spread(cells[:, 1]) << np.uint64(1)) | spread(cells[:, 2])
+        return codes.astype(np.int64)
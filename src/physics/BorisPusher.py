@@ -0,0 +1,113 @@
+import numpy as np
+
+from physics.Constants import Constants
+
+
+class BorisPusher:
+    """
+    BorisPusher advances charged particles through static electric and magnetic fields with the Boris scheme: half an
+    electric kick, a rotation about B, the other half of the electric kick and a drift. The magnetic rotation turns v by
+    2 arctan(q B dt / 2 m), close to the true gyration angle for small steps, and never changes |v|, so in a pure
+    magnetic field the kinetic energy is conserved to rounding whatever the step, unlike a forward Euler momentum
+    update, which grows |v| every step.
+
+    Positions and velocities are (N, 3) arrays (one particle is a (3,) array), charge and mass are scalars or (N,)
+    arrays. Fields are callables taking (N, 3) positions and returning (N, 3) values, or sources with a field_at method
+    (CurrentLoop, CurrentPath, FieldTable...); a missing field is zero.
+
+    As in any leapfrog scheme, the velocities are taken half a step behind the positions. With relativistic=True the
+    pusher works on u = gamma v internally (relativistic Boris) and still takes and returns ordinary velocities.
+    """
+    C = Constants.C  # speed of light, m/s
+
+    def __init__(self, charge, mass, e_field=None, b_field=None, relativistic: bool = False):
+        self.charge_to_mass = np.asarray(charge, dtype=float) / np.asarray(mass, dtype=float)
+        self.e_field = BorisPusher.__as_callable__(e_field)
+        self.b_field = BorisPusher.__as_callable__(b_field)
+        self.relativistic = relativistic
+
+    def step(self, positions, velocities, dt: float, e_values=None, b_values=None):
+        """Gets the (positions, velocities) one step of dt later, e_values / b_values being the fields if already known"""
+        positions = np.asarray(positions, dtype=float)
+        velocities = np.asarray(velocities, dtype=float)
+        shape = positions.shape
+        x = positions.reshape(-1, 3)
+        qm = np.reshape(self.charge_to_mass, (-1, 1)) * (dt / 2)
+
+        u = velocities.reshape(-1, 3)
+
+        if self.relativistic:
+            u = u * BorisPusher.__gamma_of_velocity__(u)
+
+        # half electric kick
+        e = self.e_field(x) if e_values is None else np.reshape(e_values, (-1, 3))
+        u = u + qm * e if e is not None else u
+
+        # magnetic rotation, t the tangent of half the rotation angle
+        b = self.b_field(x) if b_values is None else np.reshape(b_values, (-1, 3))
+
+        if b is not None:
+            t = qm * b
+
+            if self.relativistic:
+                t = t / BorisPusher.__gamma_of_momentum__(u)
+
+            s = 2 * t / (1 + np.einsum('ij,ij->i', t, t))[:, None]
+            u_prime = u + np.cross(u, t)
+            u = u + np.cross(u_prime, s)
+
+        # second half electric kick
+        u = u + qm * e if e is not None else u
+
+        v = u / BorisPusher.__gamma_of_momentum__(u) if self.relativistic else u
+
+        return (x + v * dt).reshape(shape), v.reshape(shape)
+
+    def run(self, positions, velocities, dt: float, steps: int, record_every: int = 0):
+        """
+        Gets the (positions, velocities) after steps steps of dt, along with the (K, N, 3) positions recorded every
+        record_every steps (starting with the initial ones) when record_every > 0, None otherwise
+        """
+        history = [np.array(positions, dtype=float)] if record_every > 0 else None
+
+        for n in range(1, steps + 1):
+            positions, velocities = self.step(positions, velocities, dt)
+
+            if history is not None and n % record_every == 0:
+                history.append(positions)
+
+        return positions, velocities, (np.array(history) if history is not None else None)
+
+    def kinetic_energy(self, velocities, mass) -> np.ndarray:
+        """Gets the kinetic energy of particles of the given mass, relativistic if the pusher is"""
+        velocities = np.asarray(velocities, dtype=float).reshape(-1, 3)
+        mass = np.asarray(mass, dtype=float)
+
+        if self.relativistic:
+            return mass * self.C ** 2 * (BorisPusher.__gamma_of_velocity__(velocities)[:, 0] - 1)
+
+        return 0.5 * mass * np.einsum('ij,ij->i', velocities, velocities)
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    @staticmethod
+    def __as_callable__(field):
+        """Gets field as a callable of (N, 3) positions, or one returning None for a missing field"""
+        if field is None:
+            return lambda positions: None
+
+        if hasattr(field, 'field_at'):
+            return field.field_at
+
+        return field
+
+    @staticmethod
+    def __gamma_of_velocity__(v: np.ndarray) -> np.ndarray:
+        """Gets the (N, 1) Lorentz factor of velocities v"""
+        return 1 / np.sqrt(1 - np.einsum('ij,ij->i', v, v)[:, None] / BorisPusher.C ** 2)
+
+    @staticmethod
+    def __gamma_of_momentum__(u: np.ndarray) -> np.ndarray:
+        """Gets the (N, 1) Lorentz factor of u = gamma v"""
+        return np.sqrt(1 + np.einsum('ij,ij->i', u, u)[:, None] / BorisPusher.C ** 2)
@@ -0,0 +1,11 @@
+from math import pi
+
+
+class Constants:
+    """
+    Physical constants shared by the physics classes. Kept free of VPython so that numerical kernels can use them
+    without pulling in a scene.
+    """
+    K = 8.99e9  # Coulomb's constant, N*m^2/C^2
+    MU_NAUGHT = (4 * pi) * 1e-7  # permeability of free space, T*m/A
+    C = 299792458.0  # speed of light, m/s
@@ -0,0 +1,159 @@
+import numpy as np
+
+from physics.BiotSavart import BiotSavart
+
+
+class CurrentPath:
+    """
+    CurrentPath is a discretized current carrying wire whose segment midpoints, dl vectors and currents are computed
+    once when the path is built and then frozen as read-only contiguous arrays. Every Biot-Savart evaluation against
+    the path reuses those same buffers instead of recomputing sin, cos, theta_hat and ds for every call.
+
+    Paths are built from rings, arcs and helices (sliced evenly in angle, each slice taken at its middle with its
+    tangent dl) or from arbitrary polylines (each slice the chord between consecutive vertices), including polylines
+    loaded from a point file. Rigid translations and rotations give new paths without rediscretizing, and several
+    paths can be combined into one so a whole coil set is a single evaluation.
+
+    Curved paths measure theta from the reference direction (perpendicular to the axis) towards axis x reference, so
+    the current circulates counterclockwise when looking from the tip of the axis for a positive current.
+    """
+
+    def __init__(self, midpoints, dls, current=1.0):
+        midpoints = np.asarray(midpoints, dtype=float).reshape(-1, 3)
+        dls = np.asarray(dls, dtype=float).reshape(-1, 3)
+
+        if midpoints.shape != dls.shape:
+            raise ValueError("A current path needs one dl vector per midpoint")
+
+        self.midpoints = CurrentPath.__frozen__(midpoints)
+        self.dls = CurrentPath.__frozen__(dls)
+        self.currents = CurrentPath.__frozen__(np.broadcast_to(np.asarray(current, dtype=float), midpoints.shape[:1]))
+
+    @staticmethod
+    def ring(center, axis, radius: float, num_slices: int, current=1.0, reference=None) -> 'CurrentPath':
+        """Builds a full ring of num_slices slices"""
+        return CurrentPath.arc(center, axis, radius, 0.0, 2 * np.pi, num_slices, current, reference)
+
+    @staticmethod
+    def arc(center, axis, radius: float, theta_min: float, theta_max: float, num_slices: int, current=1.0,
+            reference=None) -> 'CurrentPath':
+        """Builds an arc from theta_min to theta_max (radians) out of num_slices slices"""
+        return CurrentPath.__curve__(center, axis, radius, theta_min, theta_max, num_slices, 0.0, current, reference)
+
+    @staticmethod
+    def helix(center, axis, radius: float, pitch: float, turns: float, slices_per_turn: int, current=1.0,
+              reference=None) -> 'CurrentPath':
+        """Builds a helix starting in the plane through center and advancing pitch along the axis per turn"""
+        num_slices = max(1, int(round(turns * slices_per_turn)))
+        return CurrentPath.__curve__(center, axis, radius, 0.0, 2 * np.pi * turns, num_slices, pitch, current,
+                                     reference)
+
+    @staticmethod
+    def polyline(vertices, current=1.0, closed: bool = False) -> 'CurrentPath':
+        """Builds one slice per pair of consecutive vertices, current flowing from the first vertex to the last"""
+        vertices = np.asarray(vertices, dtype=float).reshape(-1, 3)
+
+        if closed:
+            vertices = np.concatenate((vertices, vertices[:1]))
+
+        return CurrentPath((vertices[:-1] + vertices[1:]) / 2, vertices[1:] - vertices[:-1], current)
+
+    @staticmethod
+    def from_file(path, current=1.0, closed: bool = False, delimiter=None) -> 'CurrentPath':
+        """Builds a polyline from a text file with one x y z vertex per line ('#' starts a comment)"""
+        return CurrentPath.polyline(np.loadtxt(path, delimiter=delimiter, usecols=(0, 1, 2), ndmin=2), current, closed)
+
+    @staticmethod
+    def combine(paths) -> 'CurrentPath':
+        """Joins several paths (each keeping its own currents) into one"""
+        return CurrentPath(np.concatenate([path.midpoints for path in paths]),
+                           np.concatenate([path.dls for path in paths]),
+                           np.concatenate([path.currents for path in paths]))
+
+    def translated(self, offset) -> 'CurrentPath':
+        """Gets a copy of this path moved by offset, sharing its dl and current buffers"""
+        return self.__with__(self.midpoints + np.asarray(offset, dtype=float).reshape(3), self.dls)
+
+    def rotated(self, angle: float, axis, origin=(0, 0, 0)) -> 'CurrentPath':
+        """Gets a copy of this path rotated by angle (radians) about the line through origin along axis"""
+        rotation = CurrentPath.__rotation__(angle, axis)
+        origin = np.asarray(origin, dtype=float).reshape(3)
+
+        return self.__with__((self.midpoints - origin) @ rotation.T + origin, self.dls @ rotation.T)
+
+    def field_at(self, probes, chunk_elements: int = BiotSavart.CHUNK_ELEMENTS) -> np.ndarray:
+        """Gets the (M, 3) magnetic field of the path at M probes"""
+        return BiotSavart.field_at(probes, self.midpoints, self.dls, self.currents, chunk_elements)
+
+    def __len__(self):
+        return self.midpoints.shape[0]
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    def __with__(self, midpoints, dls) -> 'CurrentPath':
+        """Gets a path with new geometry and this path's currents, reusing frozen buffers that did not change"""
+        out = CurrentPath.__new__(CurrentPath)
+        out.midpoints = CurrentPath.__frozen__(midpoints)
+        out.dls = dls if dls is self.dls else CurrentPath.__frozen__(dls)
+        out.currents = self.currents
+
+        return out
+
+    @staticmethod
+    def __curve__(center, axis, radius, theta_min, theta_max, num_slices, pitch, current, reference) -> 'CurrentPath':
+        """Slices a (possibly pitched) circular curve evenly in theta, taking each slice at its middle"""
+        if radius <= 0 or num_slices < 1:
+            raise ValueError("A curved path needs a positive radius and at least one slice")
+
+        w, u, v = CurrentPath.__basis__(axis, reference)
+        center = np.asarray(center, dtype=float).reshape(3)
+        dtheta = (theta_max - theta_min) / num_slices
+        thetas = theta_min + dtheta * (np.arange(num_slices) + 0.5)
+        cos, sin = np.cos(thetas)[:, None], np.sin(thetas)[:, None]
+        rise = pitch / (2 * np.pi)  # advance along the axis per radian
+
+        midpoints = center + radius * (cos * u + sin * v) + (rise * (thetas - theta_min))[:, None] * w
+        dls = dtheta * (radius * (cos * v - sin * u) + rise * w)
+
+        return CurrentPath(midpoints, dls, current)
+
+    @staticmethod
+    def __basis__(axis, reference):
+        """Gets the unit axis w and the unit vectors u (theta = 0) and v (theta = pi / 2) perpendicular to it"""
+        w = np.asarray(axis, dtype=float).reshape(3)
+
+        if not np.any(w):
+            raise ValueError("A curved path needs a non-zero axis")
+
+        w = w / np.linalg.norm(w)
+
+        if reference is None:
+            reference = np.eye(3)[np.argmin(np.abs(w))]  # the coordinate axis furthest from w
+
+        u = np.asarray(reference, dtype=float).reshape(3)
+        u = u - (u @ w) * w
+
+        if not np.any(np.abs(u) > 1e-12):
+            raise ValueError("The reference direction of a curved path can not be parallel to its axis")
+
+        u = u / np.linalg.norm(u)
+
+        return w, u, np.cross(w, u)
+
+    @staticmethod
+    def __rotation__(angle, axis) -> np.ndarray:
+        """Gets the 3x3 matrix rotating by angle (radians) about axis (Rodrigues' formula)"""
+        k = np.asarray(axis, dtype=float).reshape(3)
+        k = k / np.linalg.norm(k)
+        cross = np.array([[0, -k[2], k[1]], [k[2], 0, -k[0]], [-k[1], k[0], 0]])
+
+        return np.eye(3) + np.sin(angle) * cross + (1 - np.cos(angle)) * (cross @ cross)
+
+    @staticmethod
+    def __frozen__(array) -> np.ndarray:
+        """Gets a read-only, C contiguous copy of array"""
+        out = np.array(array, dtype=float, order='C')
+        out.setflags(write=False)
+
+        return out
@@ -1,5 +1,7 @@
 from vpython import arrow, mag
 
+from physics.Constants import Constants
+
 
 class ElectricForce:
     """
@@ -7,7 +9,7 @@ class ElectricForce:
     the charge of q1 onto q2. The class makes use of Coulomb's Law to calculate this force. The class also accepts a
     dictionary of indicator properties to draw an automatically scaled arrow on q2 if desired.
     """
-    K = 8.99e9  # Coulomb's constant
+    K = Constants.K  # Coulomb's constant
 
     def __init__(self, q1, q2, name, draw=True, base_scale_factor=1, trace_log=False, indicator_props=None):
         if indicator_props is None:
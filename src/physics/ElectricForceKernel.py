@@ -0,0 +1,156 @@
+import numpy as np
+
+from physics.Constants import Constants
+
+
+class ElectricForceKernel:
+    """
+    ElectricForceKernel is the batch counterpart of ElectricForce. Instead of one object per q1 -> q2 pair it takes
+    arrays of charge positions and values and returns every net force in one call, using the same Coulomb's constant.
+
+    The all-pairs sum is worked through in square tiles of at most tile_size x tile_size pairs, so memory stays bounded
+    by the tile instead of growing as N x N x 3. Each off-diagonal tile is evaluated once and applied to both of its
+    charge groups with opposite signs (Newton's third law), halving the work of the direct sum.
+
+    Self-interaction, and any pair of coincident charges, contributes nothing. An optional softening length eps replaces
+    r^2 with r^2 + eps^2 so close encounters stay finite.
+    """
+    K = Constants.K  # Coulomb's constant
+
+    @staticmethod
+    def net_forces(positions, charges, softening: float = 0.0, tile_size: int = 256) -> np.ndarray:
+        """Gets the (N, 3) array of net electric forces on each of N charges due to all of the others"""
+        positions, charges = ElectricForceKernel.__as_arrays__(positions, charges)
+        n = positions.shape[0]
+        eps2 = softening * softening
+        forces = np.zeros((n, 3))
+
+        for i_start in range(0, n, tile_size):
+            i_end = min(i_start + tile_size, n)
+
+            for j_start in range(i_start, n, tile_size):
+                j_end = min(j_start + tile_size, n)
+
+                # per pair differences (not p_i and p_j apart), so a close pair far from the origin keeps its precision
+                r, r2 = ElectricForceKernel.__differences__(positions[i_start:i_end], positions[j_start:j_end])
+                weight = ElectricForceKernel.__inverse_of_squares__(r2, eps2, 3)
+                weight *= charges[i_start:i_end, None]
+                weight *= charges[None, j_start:j_end]
+
+                for axis in range(3):
+                    r[axis] *= weight
+                    forces[i_start:i_end, axis] += r[axis].sum(axis=1)
+
+                    if j_start != i_start:
+                        forces[j_start:j_end, axis] -= r[axis].sum(axis=0)
+
+        return ElectricForceKernel.K * forces
+
+    @staticmethod
+    def potentials(positions, charges, softening: float = 0.0, tile_size: int = 256) -> np.ndarray:
+        """Gets the (N,) array of electric potentials at each of N charges due to all of the others"""
+        positions, charges = ElectricForceKernel.__as_arrays__(positions, charges)
+        n = positions.shape[0]
+        eps2 = softening * softening
+        out = np.zeros(n)
+
+        for i_start in range(0, n, tile_size):
+            i_end = min(i_start + tile_size, n)
+
+            for j_start in range(i_start, n, tile_size):
+                j_end = min(j_start + tile_size, n)
+
+                inv_r = ElectricForceKernel.__inverse_power__(positions[i_start:i_end], positions[j_start:j_end],
+                                                              eps2, 1)
+
+                out[i_start:i_end] += inv_r @ charges[j_start:j_end]
+
+                if j_start != i_start:
+                    out[j_start:j_end] += charges[i_start:i_end] @ inv_r
+
+        return ElectricForceKernel.K * out
+
+    @staticmethod
+    def fields_at(targets, positions, charges, softening: float = 0.0, tile_size: int = 256, with_field: bool = True):
+        """
+        Gets the electric field (M, 3) and potential (M,) at M arbitrary target points due to N source charges.
+        Targets that sit exactly on a source skip that source, like the r = 0 checks in the chapter scripts.
+        With with_field False only the potential is computed and the field is left zero.
+        """
+        positions, charges = ElectricForceKernel.__as_arrays__(positions, charges)
+        targets = np.asarray(targets, dtype=float).reshape(-1, 3)
+        m = targets.shape[0]
+        n = positions.shape[0]
+        eps2 = softening * softening
+        field = np.zeros((m, 3))
+        potential = np.zeros(m)
+
+        # with fewer sources than a tile, take more targets per tile so a tile still holds up to tile_size^2 pairs
+        target_tile = tile_size * tile_size // max(1, min(n, tile_size))
+
+        for i_start in range(0, m, target_tile):
+            i_end = min(i_start + target_tile, m)
+
+            for j_start in range(0, n, tile_size):
+                j_end = min(j_start + tile_size, n)
+
+                # per pair differences, so a target close to a source far from the origin keeps its precision
+                r, r2 = ElectricForceKernel.__differences__(targets[i_start:i_end], positions[j_start:j_end])
+                inv_r = ElectricForceKernel.__inverse_of_squares__(r2, eps2, 1)
+                potential[i_start:i_end] += inv_r @ charges[j_start:j_end]
+
+                if not with_field:
+                    continue
+
+                weight = (inv_r ** 3) * charges[None, j_start:j_end]
+
+                for axis in range(3):
+                    r[axis] *= weight
+                    field[i_start:i_end, axis] += r[axis].sum(axis=1)
+
+        return ElectricForceKernel.K * field, ElectricForceKernel.K * potential
+
+    @staticmethod
+    def charge_arrays(charges):
+        """Converts a list of ElectricCharge objects into (positions, values) arrays for the kernel"""
+        positions = np.array([(c.position.x, c.position.y, c.position.z) for c in charges], dtype=float).reshape(-1, 3)
+        values = np.array([c.value for c in charges], dtype=float)
+        return positions, values
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    @staticmethod
+    def __as_arrays__(positions, charges):
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        charges = np.broadcast_to(np.asarray(charges, dtype=float), positions.shape[:1])
+
+        return positions, charges
+
+    @staticmethod
+    def __inverse_power__(p_i: np.ndarray, p_j: np.ndarray, eps2: float, power: int) -> np.ndarray:
+        """Gets 1 / (|r|^2 + eps^2)^(power / 2), power being 1 or 3, for every pair (i, j) with zero length pairs as 0"""
+        r2 = ElectricForceKernel.__differences__(p_i, p_j)[1]
+        return ElectricForceKernel.__inverse_of_squares__(r2, eps2, power)
+
+    @staticmethod
+    def __differences__(p_i: np.ndarray, p_j: np.ndarray):
+        """Gets the x, y and z components (i, j) of p_i - p_j for every pair, and their squared lengths (i, j)"""
+        r = [np.subtract.outer(p_i[:, axis], p_j[:, axis]) for axis in range(3)]
+
+        return r, r[0] * r[0] + r[1] * r[1] + r[2] * r[2]
+
+    @staticmethod
+    def __inverse_of_squares__(r2: np.ndarray, eps2: float, power: int) -> np.ndarray:
+        """Gets 1 / (r2 + eps^2)^(power / 2) from squared pair lengths r2 (overwritten), with zero lengths as 0"""
+        # Zero length pairs (self-interaction, or coincident charges) are pushed to infinity so they contribute 0
+        r2[r2 == 0] = np.inf
+        r2 += eps2
+
+        out = np.sqrt(r2)
+        np.reciprocal(out, out=out)
+
+        if power == 3:
+            out *= out * out
+
+        return out
@@ -0,0 +1,126 @@
+import numpy as np
+
+from physics.BorisPusher import BorisPusher
+from util.math.Halton import Halton
+
+
+class EnsembleTracer:
+    """
+    EnsembleTracer pushes a whole ensemble of charged particles at once with the Boris scheme and records, for every
+    particle, whether and when it left the trapping region. Particles are held as (N, 3) arrays, the field is evaluated
+    for all of them in one call per step and escaped particles are dropped from the arrays, so every step only costs
+    what the particles still trapped cost.
+
+    inside is a callable taking (N, 3) positions and giving an (N,) mask, True while a particle is still trapped (for
+    the magnetic bottle: between the rings and within their radius).
+
+    Initial states are sampled with sample(): positions uniformly in a box, speeds uniformly in a range, pitch angles
+    to the local B isotropically (uniform in cos) within a range and uniform gyrophases, drawn either from a Halton
+    sequence or at random. The result is a compact structured array with one row per particle.
+    """
+    RESULT_DTYPE = np.dtype([('x', 'f8'), ('y', 'f8'), ('z', 'f8'), ('speed', 'f8'), ('pitch_angle', 'f8'),
+                             ('escaped', '?'), ('escape_time', 'f8')])
+
+    def __init__(self, charge: float, mass: float, b_field, inside, e_field=None, relativistic: bool = False):
+        self.pusher = BorisPusher(charge, mass, e_field=e_field, b_field=b_field, relativistic=relativistic)
+        self.inside = inside
+
+    def sample(self, count: int, center, spread, speeds, pitch_angles=(0.0, np.pi), sampling: str = "halton",
+               seed: int = 0):
+        """
+        Gets (positions, velocities) of count particles: positions within center +- spread (per axis), speeds
+        uniform in (low, high) (or one value) and pitch angles (radians, to the local B) within (low, high), uniform
+        in cos; sampling is "halton" (skipping seed + 1 points) or "random" (seeded with seed)
+        """
+        if sampling == "halton":
+            u = Halton.points(count, 6, skip=seed + 1)
+        elif sampling == "random":
+            u = np.random.default_rng(seed).random((count, 6))
+        else:
+            raise ValueError(f"Unknown sampling {sampling}, expected 'halton' or 'random'")
+
+        center = np.asarray(center, dtype=float).reshape(3)
+        spread = np.broadcast_to(np.asarray(spread, dtype=float), (3,))
+        positions = center + (2 * u[:, :3] - 1) * spread
+
+        low, high = np.broadcast_to(np.asarray(speeds, dtype=float), (2,))
+        speed = low + (high - low) * u[:, 3]
+
+        cos_low, cos_high = np.cos(pitch_angles[0]), np.cos(pitch_angles[1])
+        cos_pitch = cos_low + (cos_high - cos_low) * u[:, 4]
+        sin_pitch = np.sqrt(np.maximum(0.0, 1 - cos_pitch ** 2))
+        phase = 2 * np.pi * u[:, 5]
+
+        # parallel and perpendicular unit vectors of the local field
+        b_hat = self.pusher.b_field(positions)
+        b_hat = b_hat / np.linalg.norm(b_hat, axis=1)[:, None]
+        helper = np.where(np.abs(b_hat[:, :1]) < 0.9, [[1.0, 0.0, 0.0]], [[0.0, 1.0, 0.0]])
+        e1 = np.cross(b_hat, helper)
+        e1 /= np.linalg.norm(e1, axis=1)[:, None]
+        e2 = np.cross(b_hat, e1)
+
+        directions = (cos_pitch[:, None] * b_hat +
+                      sin_pitch[:, None] * (np.cos(phase)[:, None] * e1 + np.sin(phase)[:, None] * e2))
+
+        return positions, speed[:, None] * directions
+
+    def run(self, positions, velocities, dt: float, duration: float, check_every: int = 1,
+            progress=None) -> np.ndarray:
+        """
+        Pushes the particles for duration seconds in steps of dt, checking for escapes every check_every steps, and
+        gets the result table (escape_time is nan for particles still trapped at the end). progress, if given, is
+        called with (time, number still trapped) at every check.
+        """
+        positions = np.array(positions, dtype=float).reshape(-1, 3)
+        velocities = np.array(velocities, dtype=float).reshape(-1, 3)
+        count = positions.shape[0]
+        table = self.__initial_table__(positions, velocities)
+
+        active = np.arange(count)
+        steps = int(np.ceil(duration / dt))
+        x, v = positions, velocities
+
+        for n in range(1, steps + 1):
+            x, v = self.pusher.step(x, v, dt)
+
+            if n % check_every != 0 and n != steps:
+                continue
+
+            gone = ~self.inside(x)
+
+            if np.any(gone):
+                table['escaped'][active[gone]] = True
+                table['escape_time'][active[gone]] = n * dt
+                active, x, v = active[~gone], x[~gone], v[~gone]
+
+            if progress is not None:
+                progress(n * dt, active.size)
+
+            if active.size == 0:
+                break
+
+        return table
+
+    @staticmethod
+    def summary(table: np.ndarray) -> dict:
+        """Gets the particle count, the escaped fraction and the median escape time of the escaped ones"""
+        escaped = table['escaped']
+
+        return {"particles": int(table.size), "escaped_fraction": float(np.mean(escaped)) if table.size else 0.0,
+                "median_escape_time": float(np.median(table['escape_time'][escaped])) if np.any(escaped) else np.nan}
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    def __initial_table__(self, positions: np.ndarray, velocities: np.ndarray) -> np.ndarray:
+        """Gets the result table filled with the initial state of every particle"""
+        table = np.zeros(positions.shape[0], dtype=self.RESULT_DTYPE)
+        table['x'], table['y'], table['z'] = positions.T
+        table['speed'] = np.linalg.norm(velocities, axis=1)
+        table['escape_time'] = np.nan
+
+        b = self.pusher.b_field(positions)
+        cos_pitch = np.einsum('ij,ij->i', velocities, b) / np.maximum(table['speed'] * np.linalg.norm(b, axis=1), 1e-300)
+        table['pitch_angle'] = np.arccos(np.clip(cos_pitch, -1, 1))
+
+        return table
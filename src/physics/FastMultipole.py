@@ -0,0 +1,353 @@
+import numpy as np
+
+from physics.Constants import Constants
+from physics.ElectricForceKernel import ElectricForceKernel
+
+
+class FastMultipole:
+    """
+    FastMultipole evaluates the electric field and potential of N point charges at M separate target points in
+    roughly O(N + M) with a Chebyshev interpolation ("black box") fast multipole method on a uniform octree.
+
+    Every box carries its far field as charges sitting on order^3 Chebyshev nodes. Those are gathered upward through
+    the tree (P2M, M2M), converted between well separated boxes of the same size (M2L), pushed down to the leaves
+    (L2L) and interpolated at the targets (L2P), while neighbouring leaves are summed directly (P2P). The expansion
+    order is the number of Chebyshev nodes per axis: the error falls off geometrically with it, order 4 giving
+    roughly 1e-3 and order 6 roughly 1e-5 relative accuracy.
+
+    Targets that sit exactly on a source skip that source, like the r = 0 checks in the chapter 24 maps.
+    """
+    K = Constants.K  # Coulomb's constant
+    MAX_LEVEL = 10
+    CHUNK = 32768  # targets or sources handled per block when interpolating
+
+    def __init__(self, positions, charges, order: int = 4, leaf_size: int = 8):
+        self.positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        self.charges = np.broadcast_to(np.asarray(charges, dtype=float), self.positions.shape[:1])
+        self.order = order
+        self.leaf_size = leaf_size
+
+        # Chebyshev nodes on [-1, 1] and the 3D node offsets in flattened (x, y, z) order
+        self.nodes = np.cos((2 * np.arange(1, order + 1) - 1) * np.pi / (2 * order))
+        grid = np.meshgrid(self.nodes, self.nodes, self.nodes, indexing='ij')
+        self.nodes_3d = np.stack([axis.ravel() for axis in grid], axis=1)
+
+        # M2M operators per child offset along one axis (-1 or +1); L2L uses their transposes
+        self.shift = {side: self.__interpolation_weights__(side / 2 + self.nodes / 2)[0].T for side in (-1, 1)}
+
+    @staticmethod
+    def from_charges(charges, **kwargs) -> 'FastMultipole':
+        """Builds an evaluator from a list of ElectricCharge objects"""
+        positions, values = ElectricForceKernel.charge_arrays(charges)
+        return FastMultipole(positions, values, **kwargs)
+
+    def evaluate(self, targets):
+        """Gets the electric field (M, 3) and potential (M,) at M target points"""
+        targets = np.asarray(targets, dtype=float).reshape(-1, 3)
+        m = targets.shape[0]
+
+        if m == 0 or self.positions.shape[0] == 0:
+            return np.zeros((m, 3)), np.zeros(m)
+
+        # the root cube (min corner, size) covers both sources and targets; it and the leaf level depend on the targets,
+        # so they are handed to every pass instead of being kept, which keeps evaluate re-entrant
+        points = np.concatenate((self.positions, targets))
+        box_min = points.min(axis=0)
+        size = float((points.max(axis=0) - box_min).max())
+        box = (box_min, size * (1 + 1e-9) if size > 0 else 1.0)
+        levels = self.__pick_levels__(box)
+
+        source_keys, multipoles = self.__upward_pass__(box, levels)
+        target_keys, locals_ = self.__target_boxes__(targets, box, levels)
+        self.__m2l__(source_keys, multipoles, target_keys, locals_, box, levels)
+        self.__downward_pass__(target_keys, locals_, levels)
+
+        field, potential = self.__l2p__(targets, target_keys[levels], locals_[levels], box, levels)
+        near_field, near_potential = self.__p2p__(targets, box, levels)
+
+        return self.K * (field + near_field), self.K * (potential + near_potential)
+
+    ##############################
+    # Tree passes
+    ##############################
+    def __pick_levels__(self, box) -> int:
+        """Picks the leaf level so that occupied source leaves hold about leaf_size charges on average"""
+        for level in range(2, self.MAX_LEVEL + 1):
+            occupied = np.unique(self.__keys__(self.__cells__(self.positions, level, box), level)).size
+
+            if self.positions.shape[0] / occupied <= self.leaf_size:
+                return level
+
+        return self.MAX_LEVEL
+
+    def __upward_pass__(self, box, levels):
+        """Computes the Chebyshev node charges of every source box at every level (P2M then M2M)"""
+        keys = [None] * (levels + 1)
+        multipoles = [None] * (levels + 1)
+
+        leaf_keys = self.__keys__(self.__cells__(self.positions, levels, box), levels)
+        keys[levels], box_of = np.unique(leaf_keys, return_inverse=True)
+        multipoles[levels] = np.zeros((keys[levels].size, self.order ** 3))
+        centers = self.__centers__(keys[levels], levels, box)
+        half = box[1] / (1 << levels) / 2
+
+        for start in range(0, self.positions.shape[0], self.CHUNK):
+            end = start + self.CHUNK
+            box = box_of[start:end]
+            u = (self.positions[start:end] - centers[box]) / half
+            weights = self.__weights_3d__(u) * self.charges[start:end, None]
+
+            for axis in range(weights.shape[1]):
+                multipoles[levels][:, axis] += np.bincount(box, weights=weights[:, axis], minlength=keys[levels].size)
+
+        for level in range(levels, 0, -1):
+            cells = self.__cells_of_keys__(keys[level], level)
+            parent_keys = self.__keys__(cells // 2, level - 1)
+            keys[level - 1], parent_of = np.unique(parent_keys, return_inverse=True)
+            multipoles[level - 1] = np.zeros((keys[level - 1].size, self.order ** 3))
+
+            for (octant, rows) in self.__by_octant__(cells):
+                operator = self.__tensor_shift__(octant)
+                multipoles[level - 1][parent_of[rows]] += multipoles[level][rows] @ operator.T
+
+        return keys, multipoles
+
+    def __target_boxes__(self, targets, box, levels):
+        """Finds the boxes that hold targets at every level and allocates their local expansions"""
+        keys = [None] * (levels + 1)
+        locals_ = [None] * (levels + 1)
+
+        leaf_keys = np.unique(self.__keys__(self.__cells__(targets, levels, box), levels))
+
+        for level in range(levels, -1, -1):
+            keys[level] = leaf_keys if level == levels else np.unique(
+                self.__keys__(self.__cells_of_keys__(keys[level + 1], level + 1) // 2, level))
+            locals_[level] = np.zeros((keys[level].size, self.order ** 3))
+
+        return keys, locals_
+
+    def __m2l__(self, source_keys, multipoles, target_keys, locals_, box, levels):
+        """Converts multipoles into local expansions between well separated boxes (children of the parent's neighbours)"""
+        pairs = {}
+
+        for level in range(2, levels + 1):
+            cells = self.__cells_of_keys__(target_keys[level], level)
+            base = (cells // 2) * 2
+
+            for candidate in self.__far_candidates__():
+                source_cells = base + candidate
+                offset = source_cells - cells
+                valid = np.all((source_cells >= 0) & (source_cells < (1 << level)), axis=1) & \
+                    np.any(np.abs(offset) > 1, axis=1)
+                found, source_rows = self.__lookup__(source_keys[level], self.__keys__(source_cells, level), valid)
+                target_rows = np.flatnonzero(found)
+
+                if target_rows.size == 0:
+                    continue
+
+                codes = self.__offset_codes__(offset[target_rows])
+
+                for code in np.unique(codes):
+                    chosen = codes == code
+                    pairs.setdefault(int(code), []).append((level, target_rows[chosen], source_rows[found][chosen]))
+
+        # each offset needs one kernel matrix, shared across levels by scaling with the box width
+        for (code, entries) in pairs.items():
+            operator = self.__m2l_operator__(code)
+
+            for (level, target_rows, source_rows) in entries:
+                width = box[1] / (1 << level)
+                locals_[level][target_rows] += multipoles[level][source_rows] @ operator.T / width
+
+    def __downward_pass__(self, target_keys, locals_, levels):
+        """Pushes local expansions from every target box down to its children (L2L)"""
+        for level in range(2, levels):
+            cells = self.__cells_of_keys__(target_keys[level + 1], level + 1)
+            parent_rows = np.searchsorted(target_keys[level], self.__keys__(cells // 2, level))
+
+            for (octant, rows) in self.__by_octant__(cells):
+                operator = self.__tensor_shift__(octant)
+                locals_[level + 1][rows] += locals_[level][parent_rows[rows]] @ operator
+
+    def __l2p__(self, targets, leaf_keys, leaf_locals, box, levels):
+        """Interpolates leaf local expansions (and their gradient) at the targets"""
+        m = targets.shape[0]
+        field = np.zeros((m, 3))
+        potential = np.zeros(m)
+        half = box[1] / (1 << levels) / 2
+        p = self.order
+
+        for start in range(0, m, self.CHUNK):
+            chunk = targets[start:start + self.CHUNK]
+            cells = self.__cells__(chunk, levels, box)
+            rows = np.searchsorted(leaf_keys, self.__keys__(cells, levels))
+            u = (chunk - self.__centers_of_cells__(cells, levels, box)) / half
+
+            s = [self.__interpolation_weights__(u[:, axis]) for axis in range(3)]
+            local = leaf_locals[rows].reshape(-1, p, p, p)
+
+            # contract z, then y, then x, carrying the derivative along one axis at a time
+            z_value = np.einsum('mijk,mk->mij', local, s[2][0])
+            z_slope = np.einsum('mijk,mk->mij', local, s[2][1])
+            y_value = np.einsum('mij,mj->mi', z_value, s[1][0])
+
+            potential[start:start + self.CHUNK] = np.einsum('mi,mi->m', y_value, s[0][0])
+            field[start:start + self.CHUNK, 0] = -np.einsum('mi,mi->m', y_value, s[0][1]) / half
+            field[start:start + self.CHUNK, 1] = -np.einsum('mij,mj,mi->m', z_value, s[1][1], s[0][0]) / half
+            field[start:start + self.CHUNK, 2] = -np.einsum('mij,mj,mi->m', z_slope, s[1][0], s[0][0]) / half
+
+        return field, potential
+
+    def __p2p__(self, targets, box, levels):
+        """Sums the sources of the 27 leaves around every target's leaf directly"""
+        m = targets.shape[0]
+        field = np.zeros((m, 3))
+        potential = np.zeros(m)
+
+        # pack the sources of every leaf into a padded (leaves, width) block
+        leaf_keys = self.__keys__(self.__cells__(self.positions, levels, box), levels)
+        order = np.argsort(leaf_keys, kind='stable')
+        keys, starts, counts = np.unique(leaf_keys[order], return_index=True, return_counts=True)
+        width = int(counts.max())
+        packed_positions = np.zeros((keys.size, width, 3))
+        packed_charges = np.zeros((keys.size, width))
+        row = np.repeat(np.arange(keys.size), counts)
+        column = np.arange(order.size) - np.repeat(starts, counts)
+        packed_positions[row, column] = self.positions[order]
+        packed_charges[row, column] = self.charges[order]
+
+        neighbours = np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing='ij'), axis=-1).reshape(-1, 3)
+        chunk_size = max(1, 2 * self.CHUNK // width)
+
+        for start in range(0, m, chunk_size):
+            chunk = targets[start:start + chunk_size]
+            cells = self.__cells__(chunk, levels, box)[:, None, :] + neighbours[None, :, :]
+            inside = np.all((cells >= 0) & (cells < (1 << levels)), axis=2)
+            found, slots = self.__lookup__(keys, self.__keys__(cells.reshape(-1, 3), levels), inside.ravel())
+
+            # only (target, occupied neighbour leaf) pairs are evaluated
+            pair = np.flatnonzero(found)
+            pair_target = pair // 27
+            pair_slot = slots[pair]
+
+            r = chunk[pair_target][:, None, :] - packed_positions[pair_slot]
+            r2 = np.einsum('pwk,pwk->pw', r, r)
+            r2[r2 == 0] = np.inf  # a target sitting on a source skips that source
+            inv_r = 1 / np.sqrt(r2)
+            q_inv_r = packed_charges[pair_slot] * inv_r
+            f = np.einsum('pw,pwk->pk', q_inv_r * inv_r * inv_r, r)
+
+            n = chunk.shape[0]
+            potential[start:start + n] = np.bincount(pair_target, weights=q_inv_r.sum(axis=1), minlength=n)
+
+            for axis in range(3):
+                field[start:start + n, axis] = np.bincount(pair_target, weights=f[:, axis], minlength=n)
+
+        return field, potential
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    def __interpolation_weights__(self, u: np.ndarray):
+        """
+        Gets the Chebyshev interpolation weights S(t_k, u) of points u in [-1, 1] for every node t_k, and their
+        derivatives with respect to u, as two (len(u), order) arrays
+        """
+        p = self.order
+        u = np.asarray(u, dtype=float)
+        t_u = np.zeros((u.size, p))
+        dt_u = np.zeros((u.size, p))
+        t_u[:, 0] = 1
+
+        if p > 1:
+            t_u[:, 1] = u
+            dt_u[:, 1] = 1
+
+        # T_j' = 2 T_{j-1} + 2u T_{j-1}' - T_{j-2}', from T_j = 2u T_{j-1} - T_{j-2}
+        for j in range(2, p):
+            t_u[:, j] = 2 * u * t_u[:, j - 1] - t_u[:, j - 2]
+            dt_u[:, j] = 2 * t_u[:, j - 1] + 2 * u * dt_u[:, j - 1] - dt_u[:, j - 2]
+
+        t_nodes = np.cos(np.outer(np.arange(p), np.arccos(self.nodes)))  # T_j(t_k), (j, k)
+        scale = np.full(p, 2 / p)
+        scale[0] = 1 / p
+        coefficients = scale[:, None] * t_nodes
+
+        return t_u @ coefficients, dt_u @ coefficients
+
+    def __weights_3d__(self, u: np.ndarray) -> np.ndarray:
+        """Gets the (n, order^3) tensor product interpolation weights of points u in [-1, 1]^3"""
+        sx = self.__interpolation_weights__(u[:, 0])[0]
+        sy = self.__interpolation_weights__(u[:, 1])[0]
+        sz = self.__interpolation_weights__(u[:, 2])[0]
+        return np.einsum('ni,nj,nk->nijk', sx, sy, sz).reshape(u.shape[0], -1)
+
+    def __tensor_shift__(self, octant) -> np.ndarray:
+        """Gets the (order^3, order^3) M2M operator from a child in the given octant to its parent"""
+        ax, ay, az = (self.shift[1 if bit else -1] for bit in octant)
+        return np.kron(np.kron(ax, ay), az)
+
+    def __m2l_operator__(self, code: int) -> np.ndarray:
+        """
+        Gets the unit width M2L kernel matrix 1 / |(y - x) / 2 - d| between the target box nodes y and the nodes x of a
+        source box offset from it by d box widths
+        """
+        offset = np.array((code // 49, (code // 7) % 7, code % 7)) - 3
+        r = (self.nodes_3d[:, None, :] - self.nodes_3d[None, :, :]) / 2 - offset[None, None, :]
+        return 1 / np.sqrt(np.einsum('ijk,ijk->ij', r, r))
+
+    @staticmethod
+    def __far_candidates__():
+        """Gets the child offsets 2 * n + o, for every neighbour n of the parent and child octant o"""
+        n = np.arange(-1, 2)
+        o = np.arange(2)
+        steps = (2 * n[:, None] + o[None, :]).ravel()
+        return np.stack(np.meshgrid(steps, steps, steps, indexing='ij'), axis=-1).reshape(-1, 3)
+
+    @staticmethod
+    def __offset_codes__(offset: np.ndarray) -> np.ndarray:
+        return (offset[:, 0] + 3) * 49 + (offset[:, 1] + 3) * 7 + (offset[:, 2] + 3)
+
+    @staticmethod
+    def __by_octant__(cells: np.ndarray):
+        """Yields (octant, rows) for the boxes in each of the eight octants of their parents"""
+        octants = cells % 2
+        codes = octants[:, 0] * 4 + octants[:, 1] * 2 + octants[:, 2]
+
+        for code in range(8):
+            rows = np.flatnonzero(codes == code)
+
+            if rows.size > 0:
+                yield ((code >> 2) & 1, (code >> 1) & 1, code & 1), rows
+
+    @staticmethod
+    def __lookup__(sorted_keys: np.ndarray, keys: np.ndarray, valid: np.ndarray):
+        """Finds keys in a sorted key array. Returns (found mask, row indices) with rows meaningful where found"""
+        rows = np.searchsorted(sorted_keys, keys)
+        rows = np.minimum(rows, sorted_keys.size - 1)
+        found = valid & (sorted_keys[rows] == keys)
+        return found, rows
+
+    @staticmethod
+    def __cells__(points: np.ndarray, level: int, box) -> np.ndarray:
+        """Gets the cells at the given level of the root cube box = (min corner, size) that hold the points"""
+        cells = np.floor((points - box[0]) / (box[1] / (1 << level))).astype(np.int64)
+        return np.clip(cells, 0, (1 << level) - 1)
+
+    @staticmethod
+    def __keys__(cells: np.ndarray, level: int) -> np.ndarray:
+        side = np.int64(1 << level)
+        return (cells[:, 0] * side + cells[:, 1]) * side + cells[:, 2]
+
+    @staticmethod
+    def __cells_of_keys__(keys: np.ndarray, level: int) -> np.ndarray:
+        side = 1 << level
+        return np.stack((keys // (side * side), (keys // side) % side, keys % side), axis=1)
+
+    @staticmethod
+    def __centers_of_cells__(cells: np.ndarray, level: int, box) -> np.ndarray:
+        return box[0] + (cells + 0.5) * (box[1] / (1 << level))
+
+    @staticmethod
+    def __centers__(keys: np.ndarray, level: int, box) -> np.ndarray:
+        return FastMultipole.__centers_of_cells__(FastMultipole.__cells_of_keys__(keys, level), level, box)
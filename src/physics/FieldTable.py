@@ -0,0 +1,171 @@
+import numpy as np
+
+from physics.ProbeGrid import ProbeGrid
+
+
+class FieldTable:
+    """
+    FieldTable is a precomputed lookup table of a static vector field (usually B) on a regular 3D ProbeGrid. The static
+    sources are sampled once, and every later query is a tricubic (Catmull-Rom) interpolation from the 4 x 4 x 4 grid
+    values around it, so the cost of a particle step no longer depends on how the field is produced.
+
+    The interpolant is C1 continuous and reproduces quadratic fields exactly, with an error of order spacing^3 for smooth
+    fields. It interpolates each component on its own, which does not make it divergence free; divergence_at() gets
+    the divergence of the interpolant so its departure from div B = 0 can be checked alongside error_estimate().
+    Near the edges of the table the missing neighbours are clamped and the accuracy drops to second order.
+
+    A table built from sources keeps them, probes outside its bounds are then evaluated directly instead of failing.
+    Sources are anything with a field_at(probes) -> (M, 3) method: CurrentLoop, CurrentPath, StraightSegment or another
+    FieldTable.
+    """
+    BLOCK_POINTS = 1 << 14  # query points interpolated per block
+
+    # Catmull-Rom weights of the neighbours -1, 0, 1, 2 as [1, t, t^2, t^3] @ matrix, and their derivatives in t
+    CATMULL_ROM = np.array([[0, 2, 0, 0], [-1, 0, 1, 0], [2, -5, 4, -1], [-1, 3, -3, 1]]) / 2
+    CATMULL_ROM_DERIVATIVE = np.array([[-1, 0, 1, 0], [4, -10, 8, -2], [-3, 9, -9, 3], [0, 0, 0, 0]]) / 2
+
+    def __init__(self, grid: ProbeGrid, values, sources=None):
+        values = np.asarray(values, dtype=float)
+
+        if values.shape != grid.shape + (3,):
+            raise ValueError(f"A field table over a {grid.shape} grid needs values shaped {grid.shape + (3,)}")
+
+        if any(np.any(np.abs(np.diff(np.diff(axis))) > 1e-9 * max(1.0, np.ptp(axis)))
+               for axis in (grid.xs, grid.ys, grid.zs) if axis.size > 2):
+            raise ValueError("A field table needs evenly spaced grid axes")
+
+        self.grid = grid
+        self.values = np.ascontiguousarray(values)
+        self.sources = list(sources) if sources is not None else []
+        self.lower = np.array([grid.xs[0], grid.ys[0], grid.zs[0]])
+        self.upper = np.array([grid.xs[-1], grid.ys[-1], grid.zs[-1]])
+
+        # per axis layout of the table; a flat axis gets an infinite step so every probe sits on its single point
+        counts = np.array(grid.shape)
+        self.steps = np.where(counts > 1, (self.upper - self.lower) / np.maximum(counts - 1, 1), np.inf)
+        self.last_cells = np.maximum(counts - 2, 0)
+
+        # the values padded with copies of the edges (1 before, 2 after, enough for a flat axis), so the 4 x 4 x 4
+        # neighbours of any cell are at fixed flat offsets from its corner and never need clamping
+        padded = np.pad(self.values, ((1, 2), (1, 2), (1, 2), (0, 0)), mode='edge')
+        self.strides = np.array([padded.shape[1] * padded.shape[2], padded.shape[2], 1])
+        self.neighbour_offsets = (np.arange(4)[:, None, None] * self.strides[0] +
+                                  np.arange(4)[None, :, None] * self.strides[1] + np.arange(4)[None, None, :]).ravel()
+        self.flat_values = padded.reshape(-1, 3)
+
+    @staticmethod
+    def from_sources(sources, lower, upper, spacing) -> 'FieldTable':
+        """
+        Samples the summed field of the sources on an evenly spaced grid covering the box from lower to upper (both
+        (3,)), spacing being one step for every axis or a (dx, dy, dz) triple; an axis with lower == upper is flat
+        """
+        lower = np.asarray(lower, dtype=float).reshape(3)
+        upper = np.asarray(upper, dtype=float).reshape(3)
+        spacing = np.broadcast_to(np.asarray(spacing, dtype=float), (3,))
+        counts = [int(np.ceil((high - low) / step - 1e-9)) + 1 for (low, high, step) in zip(lower, upper, spacing)]
+        grid = ProbeGrid(*(np.linspace(low, high, count) for (low, high, count) in zip(lower, upper, counts)))
+
+        return FieldTable(grid, grid.reshape(FieldTable.__direct__(sources, grid.points())), sources)
+
+    @staticmethod
+    def load(path) -> 'FieldTable':
+        """Loads a table saved with save(), without its sources"""
+        with np.load(path) as data:
+            return FieldTable(ProbeGrid(data['xs'], data['ys'], data['zs']), data['values'])
+
+    def save(self, path):
+        """Saves the grid axes and values to a .npz file"""
+        np.savez(path, xs=self.grid.xs, ys=self.grid.ys, zs=self.grid.zs, values=self.values)
+
+    def contains(self, probes) -> np.ndarray:
+        """Gets an (M,) mask of the probes inside the table's bounds (flat axes are not checked)"""
+        probes = np.asarray(probes, dtype=float).reshape(-1, 3)
+        flat = self.lower == self.upper
+
+        return np.all(flat | ((probes >= self.lower) & (probes <= self.upper)), axis=1)
+
+    def field_at(self, probes) -> np.ndarray:
+        """Gets the (M, 3) interpolated field at M probes"""
+        return self.__lookup__(probes, derivative=False)
+
+    def divergence_at(self, probes) -> np.ndarray:
+        """Gets the (M,) divergence of the interpolant at M probes inside the table"""
+        return self.__lookup__(probes, derivative=True)
+
+    def error_estimate(self, probes=None, samples: int = 1000, seed: int = 0) -> dict:
+        """
+        Compares the table with direct evaluation of its sources at the given probes, or at uniformly random points
+        inside the table, and gets the max and rms error relative to the local |B| along with the max absolute error
+        """
+        if not self.sources:
+            raise ValueError("Only a table built from sources can be compared against them")
+
+        if probes is None:
+            probes = np.random.default_rng(seed).uniform(self.lower, self.upper, size=(samples, 3))
+
+        probes = np.asarray(probes, dtype=float).reshape(-1, 3)
+        error = np.linalg.norm(self.field_at(probes) - FieldTable.__direct__(self.sources, probes), axis=1)
+        magnitude = np.linalg.norm(FieldTable.__direct__(self.sources, probes), axis=1)
+        relative = error / np.where(magnitude > 0, magnitude, np.inf)
+
+        return {"max_relative": float(relative.max()), "rms_relative": float(np.sqrt(np.mean(relative ** 2))),
+                "max_absolute": float(error.max())}
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    def __lookup__(self, probes, derivative: bool) -> np.ndarray:
+        """Interpolates the field (or its divergence) at the probes, evaluating outside probes directly"""
+        probes = np.asarray(probes, dtype=float).reshape(-1, 3)
+        inside = self.contains(probes)
+
+        if inside.all() and probes.shape[0] <= self.BLOCK_POINTS:
+            return self.__interpolate__(probes, derivative)
+
+        out = np.zeros(probes.shape[0] if derivative else probes.shape)
+
+        if not inside.all():
+            if derivative or not self.sources:
+                raise ValueError("Probes outside the field table's bounds")
+
+            out[~inside] = FieldTable.__direct__(self.sources, probes[~inside])
+
+        where = np.flatnonzero(inside)
+
+        for start in range(0, where.size, self.BLOCK_POINTS):
+            block = where[start:start + self.BLOCK_POINTS]
+            out[block] = self.__interpolate__(probes[block], derivative)
+
+        return out
+
+    def __interpolate__(self, points: np.ndarray, derivative: bool) -> np.ndarray:
+        """Tricubic interpolation of the field, or of its divergence, at points inside the table"""
+        u = (points - self.lower) / self.steps
+        cell = np.minimum(np.maximum(np.floor(u), 0), self.last_cells)
+        t = np.minimum(np.maximum(u - cell, 0.0), 1.0)
+        powers = t[:, :, None] ** np.arange(4)  # (M, 3, 4)
+
+        # flat indices of the 4 x 4 x 4 neighbours cell - 1 ... cell + 2 along every axis, in the padded values
+        flat = (cell.astype(np.intp) @ self.strides)[:, None] + self.neighbour_offsets
+        values = np.take(self.flat_values, flat, axis=0)  # (M, 64, 3)
+
+        w = powers @ FieldTable.CATMULL_ROM  # (M, 3, 4)
+
+        if not derivative:
+            return (FieldTable.__outer__(w[:, 0], w[:, 1], w[:, 2])[:, None, :] @ values)[:, 0]
+
+        dw = (powers @ FieldTable.CATMULL_ROM_DERIVATIVE) / self.steps[:, None]
+
+        return (np.einsum('mk,mk->m', FieldTable.__outer__(dw[:, 0], w[:, 1], w[:, 2]), values[..., 0]) +
+                np.einsum('mk,mk->m', FieldTable.__outer__(w[:, 0], dw[:, 1], w[:, 2]), values[..., 1]) +
+                np.einsum('mk,mk->m', FieldTable.__outer__(w[:, 0], w[:, 1], dw[:, 2]), values[..., 2]))
+
+    @staticmethod
+    def __outer__(wx: np.ndarray, wy: np.ndarray, wz: np.ndarray) -> np.ndarray:
+        """Gets the (M, 64) products of the per axis (M, 4) weights, in the x-outer, z-inner neighbour order"""
+        return (wx[:, :, None, None] * wy[:, None, :, None] * wz[:, None, None, :]).reshape(-1, 64)
+
+    @staticmethod
+    def __direct__(sources, probes: np.ndarray) -> np.ndarray:
+        """Gets the summed field of the sources at the probes"""
+        return sum((source.field_at(probes) for source in sources), np.zeros((np.shape(probes)[0], 3)))
@@ -5,5 +5,5 @@ class Force:
     def __init__(self, value: Vector):
         self.value = value
 
-    def get_acceleration(self, mass: float) -> float:
-        return self.value.
+    def get_acceleration(self, mass: float) -> Vector:
+        return self.value / mass
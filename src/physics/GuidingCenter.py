@@ -0,0 +1,212 @@
+import numpy as np
+
+from physics.BorisPusher import BorisPusher
+
+
+class GuidingCenter:
+    """
+    GuidingCenter advances charged particles in a static magnetic field by their guiding centers instead of their full
+    gyration. Each particle is reduced to its guiding center R, its velocity along the field v_par and its magnetic
+    moment mu = m v_perp^2 / 2B, an adiabatic invariant that stays constant, and moves with
+
+        dR/dt     = v_par b + b x (mu grad B + m v_par^2 kappa) / (q B)
+        dv_par/dt = -(mu / m) b . grad B
+
+    b being the field direction and kappa = (b . grad) b its curvature; the second term of dR/dt is the grad-B and
+    curvature drift. The steps then only need to resolve the bounce motion, not every gyration, which in the magnetic
+    bottle is a few hundred times fewer steps. grad B and kappa come from central differences of the field over
+    derivative_step, so any field callable or field_at source (CurrentLoop, FieldTable...) works.
+
+    The reduction only holds while the gyroradius is small next to the length over which B changes. Particles whose
+    adiabaticity parameter (gyroradius x max(|grad B| / B, |kappa|)) exceeds adiabatic_limit are switched to a full
+    orbit Boris push, started from their guiding center with gyrophase 0, for the rest of the run.
+    """
+    RESULT_DTYPE = np.dtype([('x', 'f8'), ('y', 'f8'), ('z', 'f8'), ('speed', 'f8'), ('pitch_angle', 'f8'),
+                             ('escaped', '?'), ('escape_time', 'f8'), ('bounces', 'i8'), ('full_orbit', '?'),
+                             ('switch_time', 'f8')])
+
+    # the guiding center and its 6 neighbours for the central differences
+    OFFSETS = np.vstack((np.zeros(3), np.eye(3), -np.eye(3)))
+
+    def __init__(self, charge: float, mass: float, b_field, inside=None, adiabatic_limit: float = 0.1,
+                 derivative_step: float = 1e-4):
+        self.charge = charge
+        self.mass = mass
+        self.b_field = b_field.field_at if hasattr(b_field, 'field_at') else b_field
+        self.inside = inside
+        self.adiabatic_limit = adiabatic_limit
+        self.derivative_step = derivative_step
+        self.pusher = BorisPusher(charge, mass, b_field=self.b_field)
+
+    def from_particles(self, positions, velocities):
+        """Gets the guiding centers (N, 3), parallel velocities (N,) and magnetic moments (N,) of particles"""
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        velocities = np.asarray(velocities, dtype=float).reshape(-1, 3)
+        b = self.b_field(positions)
+        b2 = np.einsum('ij,ij->i', b, b)
+        b_hat = b / np.sqrt(b2)[:, None]
+
+        v_par = np.einsum('ij,ij->i', velocities, b_hat)
+        v_perp = velocities - v_par[:, None] * b_hat
+        mu = self.mass * np.einsum('ij,ij->i', v_perp, v_perp) / (2 * np.sqrt(b2))
+
+        # the gyration center sits at m (v x B) / (q B^2) from the particle
+        centers = positions + self.mass * np.cross(velocities, b) / (self.charge * b2[:, None])
+
+        return centers, v_par, mu
+
+    def to_particles(self, centers, v_par, mu, phase=0.0):
+        """Gets (positions, velocities) of particles around the given guiding centers at the given gyrophase"""
+        centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        b = self.b_field(centers)
+        b2 = np.einsum('ij,ij->i', b, b)
+        b_hat = b / np.sqrt(b2)[:, None]
+        e1, e2 = GuidingCenter.__perpendicular__(b_hat)
+        phase = np.broadcast_to(np.asarray(phase, dtype=float), v_par.shape)
+
+        v_perp = np.sqrt(2 * mu * np.sqrt(b2) / self.mass)
+        velocities = (v_par[:, None] * b_hat +
+                      v_perp[:, None] * (np.cos(phase)[:, None] * e1 + np.sin(phase)[:, None] * e2))
+
+        return centers - self.mass * np.cross(velocities, b) / (self.charge * b2[:, None]), velocities
+
+    def derivatives(self, centers, v_par, mu):
+        """Gets dR/dt (N, 3) and dv_par/dt (N,) of guiding centers, along with their adiabaticity parameters (N,)"""
+        magnitude, b_hat, grad_b, kappa = self.__field_geometry__(centers)
+        mirror = np.einsum('ij,ij->i', b_hat, grad_b)
+
+        drift = np.cross(b_hat, mu[:, None] * grad_b + self.mass * (v_par ** 2)[:, None] * kappa)
+        velocity = v_par[:, None] * b_hat + drift / (self.charge * magnitude[:, None])
+
+        gyroradius = np.sqrt(2 * mu * self.mass / magnitude) / abs(self.charge)
+        gradient_scale = np.maximum(np.linalg.norm(grad_b, axis=1) / magnitude, np.linalg.norm(kappa, axis=1))
+
+        return velocity, -(mu / self.mass) * mirror, gyroradius * gradient_scale
+
+    def run(self, positions, velocities, dt: float, duration: float, full_orbit_dt: float = None) -> np.ndarray:
+        """
+        Advances the particles for duration seconds, guiding centers with RK4 steps of dt and any particle switched to
+        full orbit with Boris steps of full_orbit_dt (dt / 100 by default) in between, and gets the result table
+        """
+        positions = np.array(positions, dtype=float).reshape(-1, 3)
+        velocities = np.array(velocities, dtype=float).reshape(-1, 3)
+        full_orbit_dt = full_orbit_dt if full_orbit_dt is not None else dt / 100
+        sub_steps = max(1, int(np.ceil(dt / full_orbit_dt)))
+        table = self.__initial_table__(positions, velocities)
+
+        centers, v_par, mu = self.from_particles(positions, velocities)
+        guided = np.arange(positions.shape[0])  # particles still followed by their guiding center
+        orbits = np.zeros(0, dtype=int)  # particles switched to full orbit
+        x, v = np.zeros((0, 3)), np.zeros((0, 3))
+        orbit_v_par = np.zeros(0)
+        steps = int(np.ceil(duration / dt))
+
+        for n in range(1, steps + 1):
+            t = n * dt
+            switch = None
+
+            # guiding centers: one RK4 step, then find the ones that are no longer adiabatic
+            if guided.size:
+                new_centers, new_v_par, adiabaticity = self.__rk4__(centers, v_par, mu, dt)
+                table['bounces'][guided] += np.sign(new_v_par) != np.sign(v_par)
+                centers, v_par = new_centers, new_v_par
+
+                switch = adiabaticity > self.adiabatic_limit
+
+            # full orbits: sub-step up to the same time
+            if orbits.size:
+                for _ in range(sub_steps):
+                    x, v = self.pusher.step(x, v, dt / sub_steps)
+
+                b = self.b_field(x)
+                new_v_par = np.einsum('ij,ij->i', v, b) / np.linalg.norm(b, axis=1)
+                table['bounces'][orbits] += np.sign(new_v_par) != np.sign(orbit_v_par)
+                orbit_v_par = new_v_par
+
+            # switch after the sub-steps, the switched particles are already at t
+            if switch is not None and np.any(switch):
+                new_x, new_v = self.to_particles(centers[switch], v_par[switch], mu[switch])
+                table['full_orbit'][guided[switch]] = True
+                table['switch_time'][guided[switch]] = t
+                orbits = np.concatenate((orbits, guided[switch]))
+                x, v = np.concatenate((x, new_x)), np.concatenate((v, new_v))
+                orbit_v_par = np.concatenate((orbit_v_par, v_par[switch]))
+                guided, centers, v_par, mu = guided[~switch], centers[~switch], v_par[~switch], mu[~switch]
+
+            if self.inside is not None:
+                gone = ~self.inside(centers)
+
+                if np.any(gone):
+                    GuidingCenter.__escape__(table, guided[gone], t)
+                    guided, centers, v_par, mu = guided[~gone], centers[~gone], v_par[~gone], mu[~gone]
+
+                gone = ~self.inside(x)
+
+                if np.any(gone):
+                    GuidingCenter.__escape__(table, orbits[gone], t)
+                    orbits, x, v, orbit_v_par = orbits[~gone], x[~gone], v[~gone], orbit_v_par[~gone]
+
+            if guided.size == 0 and orbits.size == 0:
+                break
+
+        return table
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    def __rk4__(self, centers, v_par, mu, dt):
+        """Gets the guiding centers and parallel velocities one RK4 step later, and the adiabaticity at the start"""
+        k1_r, k1_v, adiabaticity = self.derivatives(centers, v_par, mu)
+        k2_r, k2_v, _ = self.derivatives(centers + k1_r * (dt / 2), v_par + k1_v * (dt / 2), mu)
+        k3_r, k3_v, _ = self.derivatives(centers + k2_r * (dt / 2), v_par + k2_v * (dt / 2), mu)
+        k4_r, k4_v, _ = self.derivatives(centers + k3_r * dt, v_par + k3_v * dt, mu)
+
+        return (centers + (k1_r + 2 * k2_r + 2 * k3_r + k4_r) * (dt / 6),
+                v_par + (k1_v + 2 * k2_v + 2 * k3_v + k4_v) * (dt / 6), adiabaticity)
+
+    def __field_geometry__(self, centers):
+        """Gets |B| (N,), b (N, 3), grad |B| (N, 3) and the curvature kappa (N, 3) at the guiding centers"""
+        h = self.derivative_step
+        n = centers.shape[0]
+        b = self.b_field((centers[:, None, :] + h * self.OFFSETS[None]).reshape(-1, 3)).reshape(n, 7, 3)
+        magnitudes = np.linalg.norm(b, axis=2)
+
+        magnitude = magnitudes[:, 0]
+        b_hat = b[:, 0] / magnitude[:, None]
+        grad_b = (magnitudes[:, 1:4] - magnitudes[:, 4:7]) / (2 * h)
+
+        # (b . grad) B, then kappa = ((b . grad) B - b (b . grad |B|)) / |B|
+        jacobian = (b[:, 1:4] - b[:, 4:7]) / (2 * h)  # [n, j, i] = d B_i / d x_j
+        along = np.einsum('nj,nji->ni', b_hat, jacobian)
+        kappa = (along - b_hat * np.einsum('ij,ij->i', b_hat, grad_b)[:, None]) / magnitude[:, None]
+
+        return magnitude, b_hat, grad_b, kappa
+
+    def __initial_table__(self, positions, velocities):
+        """Gets the result table filled with the initial state of every particle"""
+        table = np.zeros(positions.shape[0], dtype=self.RESULT_DTYPE)
+        table['x'], table['y'], table['z'] = positions.T
+        table['speed'] = np.linalg.norm(velocities, axis=1)
+        table['escape_time'] = np.nan
+        table['switch_time'] = np.nan
+
+        b = self.b_field(positions)
+        cos_pitch = np.einsum('ij,ij->i', velocities, b) / np.maximum(table['speed'] * np.linalg.norm(b, axis=1), 1e-300)
+        table['pitch_angle'] = np.arccos(np.clip(cos_pitch, -1, 1))
+
+        return table
+
+    @staticmethod
+    def __escape__(table, indices, t):
+        """Marks the given particles as escaped at time t"""
+        table['escaped'][indices] = True
+        table['escape_time'][indices] = t
+
+    @staticmethod
+    def __perpendicular__(b_hat):
+        """Gets two unit vectors perpendicular to each b_hat and to each other"""
+        helper = np.where(np.abs(b_hat[:, :1]) < 0.9, [[1.0, 0.0, 0.0]], [[0.0, 1.0, 0.0]])
+        e1 = np.cross(b_hat, helper)
+        e1 /= np.linalg.norm(e1, axis=1)[:, None]
+
+        return e1, np.cross(b_hat, e1)
@@ -0,0 +1,135 @@
+from physics.Constants import Constants
+
+
+class InteractionGraph:
+    """
+    InteractionGraph is a registry of pairwise Coulomb interactions between charges. Each pair is stored once, as the
+    force of the earlier registered charge on the later one, and applied to the other charge with the opposite sign
+    (Newton's third law), so f21 is never computed separately from f12.
+
+    Charges are registered as static or moving. On every tick the positions of the moving charges are compared against
+    the ones seen on the previous tick, and only the pairs touching a charge that actually moved are recomputed. Pairs
+    between two static charges are computed once when registered and folded into a permanent per-charge total.
+
+    Charges can be any object; position_of and value_of read the position vector and the signed charge out of one. The
+    defaults suit ElectricCharge, for plain VPython spheres pass e.g. position_of=lambda c: c.pos, value_of=lambda c:
+    c.chg. Positions only need x, y, z components, subtraction and scalar multiplication, so both vpython.vec and
+    util.math.Vector work.
+    """
+    K = Constants.K  # Coulomb's constant
+
+    def __init__(self, position_of=lambda c: c.position, value_of=lambda c: c.value):
+        self.position_of = position_of
+        self.value_of = value_of
+
+        self.charges = []
+        self.static = []
+        self.indices = {}
+        self.last_positions = []
+        self.neighbours = []  # per charge, the charges it shares a stored (non static-static) pair with
+        self.static_nets = []  # per charge, the permanent sum of its static-static pair forces
+        self.nets = []
+        self.pairs = {}  # (i, j) with i < j -> force of charge i on charge j
+        self.recomputed_pairs = 0
+
+    def add(self, charge, static: bool = False) -> int:
+        """Registers a charge, computing its pairs with every charge already registered, and gets its index"""
+        index = len(self.charges)
+        self.indices[id(charge)] = index
+        self.charges.append(charge)
+        self.static.append(static)
+        self.last_positions.append(self.__components__(index))
+        self.neighbours.append([])
+
+        zero = self.position_of(charge) * 0
+        self.static_nets.append(zero)
+        self.nets.append(zero)
+
+        for other in range(index):
+            force = self.__compute_pair__(other, index)
+
+            if static and self.static[other]:
+                self.static_nets[other] = self.static_nets[other] - force
+                self.static_nets[index] = self.static_nets[index] + force
+            else:
+                self.pairs[(other, index)] = force
+                self.neighbours[other].append(index)
+                self.neighbours[index].append(other)
+
+        for i in {index, *self.neighbours[index]}:
+            self.__sum_net__(i)
+
+        return index
+
+    def tick(self) -> set:
+        """Recomputes the pairs of every moving charge whose position changed since the last tick, and their nets"""
+        moved = set()
+
+        for i in range(len(self.charges)):
+            if self.static[i]:
+                continue
+
+            components = self.__components__(i)
+
+            if components != self.last_positions[i]:
+                self.last_positions[i] = components
+                moved.add(i)
+
+        touched = set(moved)
+
+        for i in moved:
+            for j in self.neighbours[i]:
+                # a pair of two moved charges is reached from both ends, only the lower end recomputes it
+                if j in moved and j < i:
+                    continue
+
+                a, b = min(i, j), max(i, j)
+                self.pairs[(a, b)] = self.__compute_pair__(a, b)
+                touched.add(j)
+
+        for i in touched:
+            self.__sum_net__(i)
+
+        return moved
+
+    def force(self, source, target):
+        """Gets the force of the source charge on the target charge"""
+        i = self.indices[id(source)]
+        j = self.indices[id(target)]
+
+        if i == j:
+            raise ValueError("A charge exerts no force on itself")
+
+        if (min(i, j), max(i, j)) not in self.pairs:
+            # both static and folded into the permanent totals, cheap enough to recompute on request
+            return self.__compute_pair__(i, j)
+
+        return self.pairs[(i, j)] if i < j else self.pairs[(j, i)] * -1
+
+    def net_force(self, charge):
+        """Gets the net force on a charge due to every other registered charge"""
+        return self.nets[self.indices[id(charge)]]
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    def __components__(self, index: int) -> tuple:
+        position = self.position_of(self.charges[index])
+        return position.x, position.y, position.z
+
+    def __compute_pair__(self, i: int, j: int):
+        """Calculate the electric force of charge i on charge j"""
+        self.recomputed_pairs += 1
+        r_vector = self.position_of(self.charges[j]) - self.position_of(self.charges[i])
+        r_squared = r_vector.x * r_vector.x + r_vector.y * r_vector.y + r_vector.z * r_vector.z
+        factor = self.K * self.value_of(self.charges[i]) * self.value_of(self.charges[j]) / (r_squared ** 1.5)
+
+        return r_vector * factor
+
+    def __sum_net__(self, i: int) -> None:
+        net = self.static_nets[i]
+
+        for j in self.neighbours[i]:
+            net = net + (self.pairs[(j, i)] if j < i else self.pairs[(i, j)] * -1)
+
+        self.nets[i] = net
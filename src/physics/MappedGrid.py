@@ -0,0 +1,137 @@
+import json
+import os
+
+import numpy as np
+
+from physics.ProbeGrid import ProbeGrid
+
+
+class MappedGrid:
+    """
+    MappedGrid keeps the values of one or more quantities (E, V, B, ...) over a ProbeGrid in memory-mapped .npy files,
+    one file per quantity, so grids far larger than RAM can be evaluated and later analysed without holding them.
+
+    The grid is filled tile by tile in flat point order, the tile size being picked from a memory budget, and each tile
+    is written straight into the mapped files. Progress is recorded after every tile in grid.json next to the arrays,
+    so an interrupted fill resumes where it stopped. Re-opening a directory with MappedGrid.open maps the finished
+    arrays read-only without copying or re-evaluating anything.
+    """
+    META = "grid.json"
+    DEFAULT_BUDGET = 256 * 1024 * 1024  # bytes of point coordinates and tile results held at once
+    WORKSPACE = 4  # tile temporaries per point value, a rough allowance for what the evaluator allocates
+
+    def __init__(self, directory: str, grid: ProbeGrid, components: dict, arrays: dict, completed: int):
+        self.directory = directory
+        self.grid = grid
+        self.components = components
+        self.arrays = arrays
+        self.completed = completed
+
+    @staticmethod
+    def create(directory: str, grid: ProbeGrid, components: dict, dtype=np.float64) -> 'MappedGrid':
+        """
+        Creates (or resumes, if one exists with the same layout) a mapped grid in directory. components maps each
+        quantity name to its number of components per point, e.g. {"E": 3, "V": 1}.
+        """
+        if os.path.exists(os.path.join(directory, MappedGrid.META)):
+            existing = MappedGrid.open(directory, mode='r+')
+
+            same_axes = all(np.array_equal(mine, theirs) for (mine, theirs) in
+                            ((existing.grid.xs, grid.xs), (existing.grid.ys, grid.ys), (existing.grid.zs, grid.zs)))
+
+            if (same_axes and existing.components == dict(components)
+                    and all(array.dtype == np.dtype(dtype) for array in existing.arrays.values())):
+                return existing
+
+        os.makedirs(directory, exist_ok=True)
+        arrays = {}
+
+        for (name, count) in components.items():
+            shape = grid.shape + ((count,) if count > 1 else ())
+            arrays[name] = np.lib.format.open_memmap(MappedGrid.__file_of__(directory, name), mode='w+', dtype=dtype,
+                                                     shape=shape)
+
+        mapped = MappedGrid(directory, grid, dict(components), arrays, 0)
+        mapped.__write_meta__()
+
+        return mapped
+
+    @staticmethod
+    def open(directory: str, mode: str = 'r') -> 'MappedGrid':
+        """Maps an existing grid without loading it; use mode 'r+' to allow writing"""
+        with open(os.path.join(directory, MappedGrid.META)) as file:
+            meta = json.load(file)
+
+        grid = ProbeGrid(meta["xs"], meta["ys"], meta["zs"])
+        arrays = {name: np.load(MappedGrid.__file_of__(directory, name), mmap_mode=mode) for name in meta["components"]}
+
+        return MappedGrid(directory, grid, meta["components"], arrays, meta["completed"])
+
+    @property
+    def complete(self) -> bool:
+        return self.completed >= self.grid.size
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """Gets the mapped array of a quantity, shaped (nx, ny, nz) or (nx, ny, nz, components)"""
+        return self.arrays[name]
+
+    def tile_size(self, memory_budget: int = DEFAULT_BUDGET) -> int:
+        """Gets the number of points per tile that keeps coordinates and results of one tile within memory_budget"""
+        values = sum(self.components.values())
+        itemsize = max(array.dtype.itemsize for array in self.arrays.values())
+
+        # flat and per axis indices plus coordinates of each point, then its results and their temporaries
+        per_point = 4 * 8 + 3 * 8 + values * (self.WORKSPACE * 8 + itemsize)
+
+        return int(max(1, min(self.grid.size, memory_budget // per_point)))
+
+    def fill(self, evaluate, memory_budget: int = DEFAULT_BUDGET, progress=None) -> 'MappedGrid':
+        """
+        Evaluates every point not yet done, tile by tile. evaluate(points) gets an (M, 3) array of points and returns
+        a dict of quantity name -> (M,) or (M, components) values. progress, if given, is called with (done, total)
+        after each tile.
+        """
+        tile = self.tile_size(memory_budget)
+        flat = {name: array.reshape(self.grid.size, -1) for (name, array) in self.arrays.items()}
+
+        while not self.complete:
+            start = self.completed
+            end = min(start + tile, self.grid.size)
+            values = evaluate(self.grid.points_between(start, end))
+
+            for (name, target) in flat.items():
+                target[start:end] = np.asarray(values[name]).reshape(end - start, -1)
+
+            for array in self.arrays.values():
+                array.flush()
+
+            self.completed = end
+            self.__write_meta__()
+
+            if progress is not None:
+                progress(self.completed, self.grid.size)
+
+        return self
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    @staticmethod
+    def __file_of__(directory: str, name: str) -> str:
+        return os.path.join(directory, name + ".npy")
+
+    def __write_meta__(self) -> None:
+        """Writes the grid layout and progress, via a temporary file so an interruption never leaves it half written"""
+        meta = {
+            "xs": self.grid.xs.tolist(),
+            "ys": self.grid.ys.tolist(),
+            "zs": self.grid.zs.tolist(),
+            "components": self.components,
+            "completed": self.completed,
+        }
+        path = os.path.join(self.directory, self.META)
+
+        with open(path + ".tmp", 'w') as file:
+            json.dump(meta, file)
+
+        os.replace(path + ".tmp", path)
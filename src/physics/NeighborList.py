@@ -0,0 +1,162 @@
+import numpy as np
+
+from physics.Constants import Constants
+
+
+class NeighborList:
+    """
+    NeighborList evaluates cutoff Coulomb forces with a cell list and a Verlet neighbor list, for screened or short
+    range dominated charge systems where pairs beyond a cutoff distance can be neglected or handled separately.
+
+    Charges are hashed into cells at least cutoff + skin wide, so every pair within that distance is found by looking
+    at neighbouring cells only. The resulting pair list is reused on later calls until some charge has moved more than
+    half the skin since the last build, which keeps the per-step cost linear in the number of charges.
+
+    It is used exactly like ElectricForceKernel.net_forces: net_forces(positions, charges) returns an (N, 3) array.
+
+    Pairs beyond the cutoff are handled by the long_range option:
+        None             plain truncation, the force jumps to zero at the cutoff
+        "shifted_force"  the pair force is shifted so it falls continuously to zero at the cutoff
+        callable         called as long_range(positions, charges) and its (N, 3) result is added, e.g. an external
+                         field or a coarse far field estimate
+    """
+    K = Constants.K  # Coulomb's constant
+
+    def __init__(self, cutoff: float, skin: float = None, screening_length: float = None, softening: float = 0.0,
+                 long_range=None):
+        if long_range is not None and long_range != "shifted_force" and not callable(long_range):
+            raise ValueError("long_range must be None, \"shifted_force\" or a callable")
+
+        self.cutoff = cutoff
+        self.skin = 0.1 * cutoff if skin is None else skin
+        self.screening_length = screening_length
+        self.softening = softening
+        self.long_range = long_range
+
+        self.pairs = None
+        self.reference_positions = None
+        self.rebuild_count = 0
+
+    def net_forces(self, positions, charges) -> np.ndarray:
+        """Gets the (N, 3) array of net electric forces on each charge due to all others within the cutoff"""
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        charges = np.broadcast_to(np.asarray(charges, dtype=float), positions.shape[:1])
+        n = positions.shape[0]
+
+        if self.__needs_rebuild__(positions):
+            self.rebuild(positions)
+
+        i, j = self.pairs
+        r = positions[i] - positions[j]
+        r2 = np.einsum('ij,ij->i', r, r)
+        within = (r2 < self.cutoff * self.cutoff) & (r2 > 0)
+        i, j, r, r2 = i[within], j[within], r[within], r2[within]
+
+        # softened like ElectricForceKernel: r / (r^2 + eps^2)^(3/2) for Coulomb, so the force vanishes at r = 0
+        softened = np.sqrt(r2 + self.softening ** 2)
+        magnitude = self.K * charges[i] * charges[j] * self.__radial__(softened)
+        pair_force = r * (magnitude / softened)[:, None]
+
+        forces = np.zeros((n, 3))
+
+        for axis in range(3):
+            forces[:, axis] += np.bincount(i, weights=pair_force[:, axis], minlength=n)
+            forces[:, axis] -= np.bincount(j, weights=pair_force[:, axis], minlength=n)
+
+        if callable(self.long_range):
+            forces += self.long_range(positions, charges)
+
+        return forces
+
+    def rebuild(self, positions) -> None:
+        """Rebuilds the pair list from a cell list with cells of width cutoff + skin"""
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        reach = self.cutoff + self.skin
+        self.reference_positions = positions.copy()
+        self.rebuild_count += 1
+
+        if positions.shape[0] == 0:
+            self.pairs = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+            return
+
+        cells = np.floor((positions - positions.min(axis=0)) / reach).astype(np.int64)
+        extent = cells.max(axis=0) + 3  # room for the +1 neighbour of the last cell on each axis
+        keys = NeighborList.__keys__(cells, extent)
+
+        order = np.argsort(keys, kind='stable')
+        cell_keys, cell_starts, cell_counts = np.unique(keys[order], return_index=True, return_counts=True)
+        cell_coords = cells[order][cell_starts]
+
+        found_i = []
+        found_j = []
+
+        # the own cell plus half of the 26 neighbours visits every pair of cells exactly once
+        for offset in NeighborList.__half_shell__():
+            neighbour_keys = NeighborList.__keys__(cell_coords + offset, extent)
+            rows = np.minimum(np.searchsorted(cell_keys, neighbour_keys), cell_keys.size - 1)
+            present = np.flatnonzero((cell_keys[rows] == neighbour_keys) & np.all(cell_coords + offset >= 0, axis=1))
+            a, b = NeighborList.__range_products__(cell_starts[present], cell_counts[present],
+                                                   cell_starts[rows[present]], cell_counts[rows[present]])
+            a, b = order[a], order[b]
+
+            if not np.any(offset):
+                keep = a < b
+                a, b = a[keep], b[keep]
+
+            r = positions[a] - positions[b]
+            close = np.einsum('ij,ij->i', r, r) < reach * reach
+            found_i.append(a[close])
+            found_j.append(b[close])
+
+        self.pairs = (np.concatenate(found_i), np.concatenate(found_j))
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    def __needs_rebuild__(self, positions: np.ndarray) -> bool:
+        """A rebuild is needed once any charge has moved more than half the skin since the last one"""
+        if self.pairs is None or self.reference_positions.shape != positions.shape:
+            return True
+
+        moved = positions - self.reference_positions
+        return bool(np.max(np.einsum('ij,ij->i', moved, moved), initial=0) > (self.skin / 2) ** 2)
+
+    def __radial__(self, r: np.ndarray) -> np.ndarray:
+        """
+        Gets the pair force magnitude per unit K q1 q2 at the softened distance r, including screening and the cutoff
+        shift (the magnitude at the softened cutoff, so the force still falls to zero right at the cutoff)
+        """
+        magnitude = NeighborList.__pair_magnitude__(r, self.screening_length)
+
+        if self.long_range == "shifted_force":
+            softened_cutoff = np.sqrt(self.cutoff ** 2 + self.softening ** 2)
+            magnitude = magnitude - NeighborList.__pair_magnitude__(softened_cutoff, self.screening_length)
+
+        return magnitude
+
+    @staticmethod
+    def __pair_magnitude__(r, screening_length):
+        """Coulomb 1 / r^2, or the screened (Yukawa) exp(-r / l) (1 + r / l) / r^2"""
+        if screening_length is None:
+            return 1 / (r * r)
+
+        return np.exp(-r / screening_length) * (1 + r / screening_length) / (r * r)
+
+    @staticmethod
+    def __keys__(cells: np.ndarray, extent: np.ndarray) -> np.ndarray:
+        return (cells[:, 0] * extent[1] + cells[:, 1]) * extent[2] + cells[:, 2]
+
+    @staticmethod
+    def __half_shell__() -> np.ndarray:
+        """Gets the own cell offset followed by the 13 neighbour offsets that come after it in key order"""
+        offsets = np.stack(np.meshgrid([-1, 0, 1], [-1, 0, 1], [-1, 0, 1], indexing='ij'), axis=-1).reshape(-1, 3)
+        return offsets[13:]
+
+    @staticmethod
+    def __range_products__(start_a, count_a, start_b, count_b):
+        """Gets every (a, b) index pair of the cartesian products of ranges [start_a, +count_a) x [start_b, +count_b)"""
+        sizes = count_a * count_b
+        block = np.repeat(np.arange(sizes.size), sizes)
+        local = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+
+        return start_a[block] + local // count_b[block], start_b[block] + local % count_b[block]
@@ -0,0 +1,52 @@
+import numpy as np
+
+
+class ProbeGrid:
+    """
+    ProbeGrid is a regular grid of probe points (points of interest) on which fields are evaluated. It is the product of
+    three 1D axes and keeps the x-outer, y-middle, z-inner order of the nested arange loops in the chapter 24 maps, so
+    the i-th point is the i-th point those loops would visit.
+
+    Point coordinates are generated on demand, either all at once with points() or a slice at a time with
+    points_between(start, end), so large grids never need their full (N, 3) coordinate array in memory.
+    """
+
+    def __init__(self, xs, ys, zs=(0.0,)):
+        self.xs = np.asarray(xs, dtype=float).ravel()
+        self.ys = np.asarray(ys, dtype=float).ravel()
+        self.zs = np.asarray(zs, dtype=float).ravel()
+
+    @staticmethod
+    def arange(x_min: float, x_max: float, dx: float, y_min: float, y_max: float, dy: float, z_min: float = 0.0,
+               z_max: float = 0.0, dz: float = 1.0) -> 'ProbeGrid':
+        """Builds the grid visited by `for x in arange(x_min, x_max + dx, dx): for y in arange(...)`, max inclusive"""
+        return ProbeGrid(np.arange(x_min, x_max + dx, dx), np.arange(y_min, y_max + dy, dy),
+                         np.arange(z_min, z_max + dz, dz))
+
+    @property
+    def shape(self) -> tuple:
+        return self.xs.size, self.ys.size, self.zs.size
+
+    @property
+    def size(self) -> int:
+        return self.xs.size * self.ys.size * self.zs.size
+
+    @property
+    def spacing(self) -> tuple:
+        """Gets the (dx, dy, dz) step along each axis, 0 for an axis with a single point"""
+        return tuple(float(axis[1] - axis[0]) if axis.size > 1 else 0.0 for axis in (self.xs, self.ys, self.zs))
+
+    def points(self) -> np.ndarray:
+        """Gets the (N, 3) coordinates of every point in the grid"""
+        return self.points_between(0, self.size)
+
+    def points_between(self, start: int, end: int) -> np.ndarray:
+        """Gets the (end - start, 3) coordinates of the points with flat indices start up to but excluding end"""
+        flat = np.arange(start, min(end, self.size))
+        ix, iy, iz = np.unravel_index(flat, self.shape)
+
+        return np.stack((self.xs[ix], self.ys[iy], self.zs[iz]), axis=1)
+
+    def reshape(self, values: np.ndarray) -> np.ndarray:
+        """Reshapes per point values, (N,) or (N, 3), to (nx, ny, nz) or (nx, ny, nz, 3)"""
+        return np.asarray(values).reshape(self.shape + np.shape(values)[1:])
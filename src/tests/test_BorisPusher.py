@@ -0,0 +1,54 @@
+import numpy as np
+
+from physics.BorisPusher import BorisPusher
+
+# electron
+charge = -1.602e-19  # coulombs
+mass = 9.10938356e-31  # kilograms
+
+
+def test_uniform_b_keeps_speed():
+    b = 1e-3  # teslas
+    pusher = BorisPusher(charge, mass, b_field=lambda positions: np.tile((0.0, 0.0, b), (len(positions), 1)))
+    period = 2 * np.pi * mass / (abs(charge) * b)
+    velocity = np.array([[3e5, 1e5, 2e4]])
+
+    _, velocities, _ = pusher.run(np.zeros((1, 3)), velocity, period / 7.3, 10000)
+
+    assert abs(np.linalg.norm(velocities) / np.linalg.norm(velocity) - 1) < 1e-12
+
+
+def test_e_cross_b_drift():
+    e, b = 100.0, 1e-3  # volts / meter, teslas
+    pusher = BorisPusher(charge, mass, e_field=lambda positions: np.tile((0.0, e, 0.0), (len(positions), 1)),
+                         b_field=lambda positions: np.tile((0.0, 0.0, b), (len(positions), 1)))
+    period = 2 * np.pi * mass / (abs(charge) * b)
+    steps_per_period = 1000
+
+    # from rest, the particle drifts along E x B at E / B while it gyrates; compare whole periods
+    positions, _, _ = pusher.run(np.zeros((1, 3)), np.zeros((1, 3)), period / steps_per_period,
+                                 20 * steps_per_period)
+
+    drift = positions[0] / (20 * period)
+    assert abs(drift[0] / (e / b) - 1) < 1e-3
+    assert abs(drift[1]) < 1e-3 * e / b
+
+
+def test_relativistic_gyration_closes():
+    b = 1e-2  # teslas
+    speed = 0.9 * BorisPusher.C
+    gamma = 1 / np.sqrt(1 - 0.9 ** 2)
+    pusher = BorisPusher(charge, mass, b_field=lambda positions: np.tile((0.0, 0.0, b), (len(positions), 1)),
+                         relativistic=True)
+    period = 2 * np.pi * gamma * mass / (abs(charge) * b)
+    radius = gamma * mass * speed / (abs(charge) * b)
+    steps = 2000
+
+    start = np.zeros((1, 3))
+    positions, velocities, history = pusher.run(start, np.array([[speed, 0.0, 0.0]]), period / steps, steps,
+                                                record_every=1)
+
+    # back where it started after one relativistic period, having gone round a circle of the relativistic radius
+    assert np.linalg.norm(positions - start) < 1e-4 * radius
+    assert abs(np.ptp(history[:, 0, 1]) / (2 * radius) - 1) < 1e-4
+    assert abs(np.linalg.norm(velocities) / speed - 1) < 1e-12
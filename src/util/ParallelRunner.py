@@ -0,0 +1,129 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class ParallelRunner:
+    """
+    ParallelRunner splits independent work (the particles of an ensemble, a set of independent Simulation runs, a
+    parameter study) into chunks and runs them across a pool of worker processes.
+
+    Large read-only arrays such as field table values or wire geometry are shared once with share() and live in
+    multiprocessing.shared_memory, every worker maps them instead of receiving a pickled copy with each chunk.
+
+    A task is a module level function task(chunk, shared, seed): chunk is a range of item indices, shared the dict of
+    shared arrays (read-only) and seed an integer derived from the runner's seed and the chunk's position. Chunks have
+    a fixed size, so chunks, seeds and results are the same whatever the number of workers. Chunk results are returned in chunk order, and merged with
+    np.concatenate by run() when they are arrays.
+    """
+    attached = {}  # shared arrays attached in this (worker) process, by name
+    attached_blocks = []  # their SharedMemory handles, kept open for as long as the process runs
+
+    def __init__(self, workers: int = None, seed: int = 0):
+        self.workers = workers or os.cpu_count() or 1
+        self.seed = seed
+        self.blocks = {}  # name -> (SharedMemory, shape, dtype)
+        self.views = {}  # name -> shared read-only array
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def share(self, name: str, array) -> np.ndarray:
+        """Copies array into shared memory under name and gets the shared (read-only) view of it"""
+        array = np.ascontiguousarray(array)
+
+        if name in self.blocks:
+            self.unshare(name)
+
+        block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        view[...] = array
+        view.setflags(write=False)
+        self.blocks[name] = (block, array.shape, array.dtype.str)
+        self.views[name] = view
+
+        return view
+
+    def unshare(self, name: str):
+        """Frees the shared memory of one shared array"""
+        block = self.blocks.pop(name)[0]
+        del self.views[name]
+        block.close()
+        block.unlink()
+
+    def close(self):
+        """Frees the shared memory of every shared array"""
+        for name in list(self.blocks):
+            self.unshare(name)
+
+    @staticmethod
+    def chunks(count: int, chunk_size: int):
+        """Splits the item indices 0 up to count into ranges of chunk_size items (the last one possibly shorter)"""
+        return [range(start, min(start + chunk_size, count)) for start in range(0, count, max(1, chunk_size))]
+
+    def map(self, task, chunks, workers: int = None) -> list:
+        """Runs task on every chunk across the pool (in this process for one worker) and gets the results in order"""
+        workers = workers or self.workers
+        specs = {name: (block.name, shape, dtype) for (name, (block, shape, dtype)) in self.blocks.items()}
+        seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(self.seed).spawn(len(chunks))]
+
+        if workers == 1:
+            return [task(chunk, self.views, seed) for (chunk, seed) in zip(chunks, seeds)]
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=ParallelRunner.__attach__,
+                                 initargs=(specs,)) as pool:
+            return list(pool.map(ParallelRunner.__run_chunk__, [task] * len(chunks), chunks, seeds))
+
+    def run(self, task, count: int, chunk_size: int, workers: int = None):
+        """Runs task over count items split into chunks of chunk_size items and gets the merged results"""
+        results = self.map(task, ParallelRunner.chunks(count, chunk_size), workers)
+
+        if results and all(isinstance(result, np.ndarray) for result in results):
+            return np.concatenate(results)
+
+        return results
+
+    def scaling(self, task, count: int, chunk_size: int) -> dict:
+        """
+        Runs the same work on one process and on every worker and gets the wall times, the speedup and the parallel
+        efficiency (speedup / workers)
+        """
+        chunks = ParallelRunner.chunks(count, chunk_size)
+
+        start = time.perf_counter()
+        self.map(task, chunks, workers=1)
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        self.map(task, chunks, workers=self.workers)
+        parallel = time.perf_counter() - start
+
+        speedup = serial / parallel
+
+        return {"workers": self.workers, "serial_seconds": serial, "parallel_seconds": parallel, "speedup": speedup,
+                "efficiency": speedup / self.workers}
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    @staticmethod
+    def __attach__(specs: dict):
+        """Maps the shared arrays described by specs (name -> (block name, shape, dtype)) into this worker process"""
+        for (name, (block_name, shape, dtype)) in specs.items():
+            # the pool's workers share the creating process's resource tracker, which unlinks the block only once
+            block = shared_memory.SharedMemory(name=block_name)
+            view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+            view.setflags(write=False)
+            ParallelRunner.attached[name] = view
+            ParallelRunner.attached_blocks.append(block)
+
+    @staticmethod
+    def __run_chunk__(task, chunk, seed):
+        """Runs one chunk of a task against the shared arrays attached in this worker process"""
+        return task(chunk, ParallelRunner.attached, seed)
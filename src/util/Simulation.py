@@ -1,43 +1,97 @@
-from vpython import graph, gcurve, vec, rate
+import queue
+import threading
+import time
+
+import numpy as np
 from util.LogLevel import LogLevel
+from util.SnapshotRing import SnapshotRing
+from util.integrator.Integrator import Integrator
+from util.integrator.VelocityVerlet import VelocityVerlet
 
 
 class Simulation:
-    def __init__(self, auto_run: bool = False, paused: bool = False, log_level: LogLevel = LogLevel.ESSENTIAL):
+    """
+    Simulation runs a scenario through create_sim_data, create_state, create_objects and create_graphs, then calls
+    tick_simulation until simulation_sentinel says to stop. VPython is only imported once something is drawn, so with
+    headless=True (batch runs without a browser) no objects or graphs are created, plot does nothing and the loop is
+    not throttled by rate(): ticks run as fast as the CPU allows and the throughput is reported when the loop ends.
+    Scenarios check is_headless() before touching their objects.
+
+    By default every tick also draws. Given render_every or frame_time, physics and rendering are decoupled:
+    tick_simulation only advances the physics, at itr_rate_lim ticks per second, and render(snapshot) draws frames on
+    their own budget, once every render_every ticks or once every frame_time seconds of wall time. With frame_time the
+    frame shows the state interpolated between the last two ticks, so motion stays smooth whether a frame falls on
+    several ticks or between two, and an expensive scene costs frames, not physics.
+
+    With background=True the ticks run in a worker thread that writes a snapshot of the state into a SnapshotRing
+    after each one, and the main thread only draws, every frame_time (1/60 s by default), the state one tick in the
+    past interpolated from the ring; neither waits for the other. Pausing, resetting and changing sim data are then
+    commands (see send), applied by whoever runs the ticks between two of them, so the state is only ever touched from
+    one thread. The button and slider callbacks of a scenario should send commands in every mode.
+    """
+    def __init__(self, auto_run: bool = False, paused: bool = False, log_level: LogLevel = LogLevel.ESSENTIAL,
+                 integrator: Integrator = None, headless: bool = False, render_every: int = None,
+                 frame_time: float = None, background: bool = False):
         # Storage space specifically for graphs shown on screen
-        self.graphs = self.create_graphs()
+        self.graphs = []
 
         # Storage space for various simulation data including physical objects
         self.sim_data = {
             "physical_objects": {}
         }
 
+        # State of the moving bodies (positions, velocities, masses, time), advanced by the integrator
+        self.state = None
+        self.integrator = integrator if integrator is not None else VelocityVerlet()
+
+        # Ticks and integrator steps taken by the last simulation loop, and how long it took
+        self.throughput = None
+        self.ticks = 0
+        self.state_steps = 0
+
+        # Commands for the physics (pause, resume, reset, set, stop) and, in the background, its worker and snapshots
+        self.commands = queue.Queue()
+        self.stopping = False
+        self.worker = None
+        self.worker_error = None
+        self.ring = None
+
         # Configuration for the simulation
         self.config = {
             'auto_run': auto_run,
             'paused': paused,
-            'log_level': log_level
+            'log_level': log_level,
+            'headless': headless,
+            'render_every': render_every,
+            'frame_time': frame_time,
+            'background': background
         }
 
         if auto_run:
             self.run_simulation()
 
-    def run_simulation(self):
+    def run_simulation(self, itr_rate_lim=60):
         """Run the entire simulation"""
         self.log('Setting initial simulation data...', LogLevel.EVERYTHING)
-        for (key, value) in self.create_sim_data():
+        for (key, value) in self.create_sim_data().items():
             self.set_sim_data(key, value)
 
-        self.log('Creating objects...', LogLevel.EVERYTHING)
-        for (key, value) in self.create_objects():
-            self.__add_object__(key, value)
+        self.log('Creating state...', LogLevel.EVERYTHING)
+        self.reset_state()
 
-        self.log('Creating graphs...', LogLevel.EVERYTHING)
-        for item in self.create_graphs():
-            self.__create_graph__(**item)
+        if self.is_headless():
+            self.log('Headless, skipping objects and graphs...', LogLevel.EVERYTHING)
+        else:
+            self.log('Creating objects...', LogLevel.EVERYTHING)
+            for (key, value) in self.create_objects().items():
+                self.__add_object__(key, value)
+
+            self.log('Creating graphs...', LogLevel.EVERYTHING)
+            for item in self.create_graphs() or []:
+                self.__create_graph__(**item)
 
         self.log('Starting simulation loop...', LogLevel.EVERYTHING)
-        self.run_simulation_loop()
+        self.run_simulation_loop(itr_rate_lim)
 
     ##############################
     # Simulation data
@@ -69,6 +123,88 @@ class Simulation:
 
         return target * scale_factor
 
+    ##############################
+    # State and integration
+    ##############################
+    def create_state(self):
+        """
+        Return the (positions, velocities, masses) of the bodies the integrator should move, as (N, 3), (N, 3) and (N,)
+        arrays, or None if the simulation steps itself in tick_simulation
+        """
+        return None
+
+    def forces(self, t, positions, velocities, targets=None):
+        """
+        Return the (N, 3) net forces on the bodies of the state at time t, or only those on the bodies indexed by
+        targets when given (the MultiRate integrator asks for the bodies it is kicking)
+        """
+        raise NotImplementedError("The forces method is not implemented.")
+
+    def reset_state(self):
+        """Recreates the state from create_state, back at t = 0"""
+        created = self.create_state()
+
+        if created is None:
+            self.state = None
+            return
+
+        positions, velocities, masses = created
+        positions = np.array(positions, dtype=float).reshape(-1, 3)
+
+        self.state = {
+            't': 0.0,
+            'positions': positions,
+            'velocities': np.array(velocities, dtype=float).reshape(positions.shape),
+            'masses': np.broadcast_to(np.asarray(masses, dtype=float), positions.shape[:1]).copy()
+        }
+
+    def get_state(self, name):
+        """Gets t, positions, velocities or masses out of the state"""
+        return self.state.get(name)
+
+    def snapshot(self):
+        """Gets a copy of the time, positions and velocities of the state (None without a state)"""
+        if self.state is None:
+            return None
+
+        return {
+            't': self.state['t'],
+            'positions': self.state['positions'].copy(),
+            'velocities': self.state['velocities'].copy()
+        }
+
+    @staticmethod
+    def interpolate(previous, latest, alpha):
+        """Gets the snapshot a fraction alpha of the way from previous to latest"""
+        if previous is None or latest is None or alpha >= 1:
+            return latest
+
+        return {name: previous[name] + (latest[name] - previous[name]) * alpha for name in latest}
+
+    def step_state(self, dt, steps=1):
+        """Advances the state by steps steps of dt with the integrator and returns the new positions"""
+        if self.state is None:
+            raise Exception("The simulation has no state to step")
+
+        masses = self.state['masses'][:, None]
+
+        def acceleration(t, positions, velocities, targets=None):
+            if targets is None:
+                return self.forces(t, positions, velocities) / masses
+
+            return self.forces(t, positions, velocities, targets) / masses[targets]
+
+        t, x, v = self.state['t'], self.state['positions'], self.state['velocities']
+
+        for n in range(steps):
+            x, v = self.integrator.step(t, x, v, dt, acceleration)
+            t += dt
+
+        self.state.update(t=t, positions=x, velocities=v)
+        self.state_steps += steps
+
+        return x
+
     ##############################
     # Physical objects
     ##############################
@@ -95,26 +231,31 @@ class Simulation:
         graphs = self.graphs.copy()
 
         for item in self.graphs:
-            item.graph.delete()
+            item['graph'].delete()
 
         self.graphs.clear()
 
         for item in graphs:
-            self.__create_graph__(to_recreate=item)
+            self.__create_graph__(name=item['name'], to_recreate=item)
 
     def plot(self, graph_name, x, y):
-        """Plot a value on a graph by name"""
-        self.log('Plotting ({0},{1}) on graph {2}'.format(x, y, graph_name))
+        """Plot a value on a graph by name (does nothing when headless)"""
+        if self.is_headless():
+            return
+
+        self.log('Plotting ({0},{1}) on graph {2}'.format(x, y, graph_name), LogLevel.EVERYTHING)
 
         found = self.__find_graph_by_name__(graph_name)
 
         if found is None:
             raise Exception("Graph by that name does not exist")
 
-        found.c.plot(x, y)
+        found['curve'].plot(x, y)
 
     def __create_graph__(self, **kwargs):
         """Create a single graph and store it in the graph store"""
+        from vpython import graph, gcurve, vec
+
         name = kwargs.get('name', None)
         if name is None:
             raise Exception("Cannot have nameless graph")
@@ -138,7 +279,7 @@ class Simulation:
 
     def __find_graph_by_name__(self, name):
         """Finds a graph by the earlier created name"""
-        return next(filter(lambda obj: obj.name is name, self.graphs), None)
+        return next(filter(lambda obj: obj['name'] == name, self.graphs), None)
 
     ##############################
     # Simulation tick and loop
@@ -146,17 +287,45 @@ class Simulation:
     def run_simulation_loop(self, itr_rate_lim=60):
         """
         This method handles the simulation loop. Should not need to be overwritten.
+        When headless, ticks are not limited to itr_rate_lim per second and the throughput is logged at the end.
+        When decoupled (render_every or frame_time), itr_rate_lim limits the physics ticks, None meaning no limit.
         """
         self.log("Running simulation loop", LogLevel.EVERYTHING)
 
-        while self.simulation_sentinel() is True:
-            self.log("Dumping simulation data for iteration: {0}".format(self.sim_data), LogLevel.EVERYTHING)
+        headless = self.is_headless()
+        first_tick = self.ticks
+        first_step = self.state_steps
+        start = time.perf_counter()
+        self.stopping = False
+
+        if headless:
+            while self.__tick__():
+                if self.check_config('paused', True):
+                    # nothing to draw, so wait for the command that resumes, resets or stops instead of spinning
+                    self.__apply_commands__(wait=0.05)
+        elif self.check_config('background', True):
+            self.__run_background_loop__(itr_rate_lim)
+        elif self.__get_config__('render_every') or self.__get_config__('frame_time'):
+            self.__run_decoupled_loop__(itr_rate_lim)
+        else:
+            from vpython import rate
+
+            while True:
+                rate(itr_rate_lim)
+
+                if not self.__tick__():
+                    break
 
-            rate(itr_rate_lim)
+        ticks = self.ticks - first_tick
+        seconds = time.perf_counter() - start
+        self.throughput = {"ticks": ticks, "steps": self.state_steps - first_step, "seconds": seconds,
+                           "ticks_per_second": ticks / seconds if seconds > 0 else np.inf,
+                           "steps_per_second": (self.state_steps - first_step) / seconds if seconds > 0 else np.inf}
 
-            if self.tick_simulation() is False:
-                self.log("The simulation tick method returned False. There may be an error. Simulation ending.")
-                break
+        if headless:
+            self.log("{0} ticks ({1} integrator steps) in {2:.2f} s: {3:.0f} ticks/s, {4:.0f} steps/s".format(
+                ticks, self.throughput['steps'], seconds, self.throughput['ticks_per_second'],
+                self.throughput['steps_per_second']))
 
     def simulation_sentinel(self):
         """Decides whether or not the loop should continue. Needs to return a bool."""
@@ -169,6 +338,181 @@ class Simulation:
         """
         raise NotImplementedError("The simulation tick method is not implemented")
 
+    def render(self, snapshot):
+        """
+        Draw a frame from a snapshot of the state (see snapshot). Only called when physics and rendering are decoupled,
+        tick_simulation then leaves all drawing to this method.
+        """
+        raise NotImplementedError("The render method is not implemented")
+
+    def send(self, command, *args):
+        """
+        Queues a command for the physics, applied before the next tick: "pause", "resume", "reset" (back to
+        create_state), "set" with a sim data name and value, or "stop" (ends the loop)
+        """
+        self.commands.put((command, args))
+
+    def __apply_commands__(self, wait=0.0):
+        """Applies the queued commands, waiting up to wait seconds for the first one"""
+        try:
+            command, args = self.commands.get(timeout=wait) if wait > 0 else self.commands.get_nowait()
+        except queue.Empty:
+            return
+
+        while True:
+            if command == "pause":
+                self.__set_config__('paused', True)
+            elif command == "resume":
+                self.__set_config__('paused', False)
+            elif command == "reset":
+                self.reset_state()
+
+                if self.ring is not None:
+                    self.ring.write(self.snapshot())
+            elif command == "set":
+                self.set_sim_data(*args)
+            elif command == "stop":
+                self.stopping = True
+            else:
+                raise Exception("Unknown simulation command {0}".format(command))
+
+            try:
+                command, args = self.commands.get_nowait()
+            except queue.Empty:
+                return
+
+    def __tick__(self):
+        """Applies the queued commands and runs one tick unless paused, returns whether the loop can go on"""
+        self.__apply_commands__()
+
+        if self.stopping or self.simulation_sentinel() is not True:
+            return False
+
+        if self.check_config('paused', True):
+            return True
+
+        self.log("Dumping simulation data for iteration: {0}".format(self.sim_data), LogLevel.EVERYTHING)
+
+        if self.tick_simulation() is False:
+            self.log("The simulation tick method returned False. There may be an error. Simulation ending.")
+            return False
+
+        self.ticks += 1
+
+        return True
+
+    def __run_decoupled_loop__(self, itr_rate_lim):
+        """
+        Runs the loop with rendering decoupled from physics. Each pass draws one frame:
+        render_every ticks per frame, or with frame_time, the ticks owed at itr_rate_lim ticks per second (as many as
+        fit in frame_time without a limit), a frame showing the state interpolated alpha of the way into the next tick.
+        """
+        from vpython import rate
+
+        render_every = self.__get_config__('render_every')
+        frame_time = self.__get_config__('frame_time')
+        previous = latest = self.snapshot()
+        owed = 0.0  # ticks owed to the tick rate, the fraction being how far into the next tick the frame falls
+        last = time.perf_counter()
+        running = True
+
+        while running:
+            if render_every:
+                if itr_rate_lim:
+                    rate(itr_rate_lim / render_every)
+
+                budget, deadline = render_every, np.inf
+            else:
+                rate(1 / frame_time)
+                now = time.perf_counter()
+                owed += (now - last) * itr_rate_lim if itr_rate_lim else np.inf
+                budget, deadline = owed, now + frame_time
+                last = now
+
+            done = 0
+
+            while done + 1 <= budget and time.perf_counter() < deadline:
+                if not self.__tick__():
+                    running = False
+                    break
+
+                previous, latest = latest, self.snapshot()
+                done += 1
+
+            alpha = 1.0
+
+            if not render_every and itr_rate_lim:
+                # ticks that did not fit in the frame are dropped, the simulation slows down instead of falling behind
+                owed = min(owed - done, 1.0)
+                alpha = owed
+            elif not render_every:
+                owed = 0.0
+
+            self.render(Simulation.interpolate(previous, latest, alpha))
+
+    def __run_background_loop__(self, itr_rate_lim):
+        """
+        Runs the ticks in a worker thread and draws frames in this one, each showing the state one tick (at
+        itr_rate_lim ticks per second) in the past, or the newest state when the ticks are not limited
+        """
+        from vpython import rate
+
+        if self.state is None:
+            raise Exception("Running the physics in the background needs a state, see create_state")
+
+        frame_time = self.__get_config__('frame_time') or 1 / 60
+        delay = 1 / itr_rate_lim if itr_rate_lim else 0.0
+
+        self.ring = SnapshotRing(self.state['positions'].shape[0])
+        self.ring.write(self.snapshot())
+        self.worker_error = None
+        self.worker = threading.Thread(target=self.__run_worker__, args=(itr_rate_lim,), daemon=True)
+        self.worker.start()
+
+        while self.worker.is_alive():
+            rate(1 / frame_time)
+            self.render(self.ring.at(time.perf_counter() - delay))
+
+        self.worker.join()
+        self.worker = None
+        self.render(self.ring.latest())
+
+        if self.worker_error is not None:
+            raise self.worker_error
+
+    def __run_worker__(self, itr_rate_lim):
+        """Ticks at up to itr_rate_lim ticks per second, writing a snapshot after each tick, until the loop ends"""
+        interval = 1 / itr_rate_lim if itr_rate_lim else 0.0
+        next_tick = time.perf_counter()
+
+        try:
+            while True:
+                if self.check_config('paused', True):
+                    # wait for the command that resumes, resets or stops instead of spinning
+                    self.__apply_commands__(wait=0.05)
+                    next_tick = time.perf_counter()
+
+                    if not self.stopping and self.check_config('paused', True):
+                        continue
+
+                ticks = self.ticks
+
+                if not self.__tick__():
+                    break
+
+                if self.ticks > ticks:
+                    self.ring.write(self.snapshot())
+
+                if interval:
+                    # keep the tick rate, but after falling behind start again from now rather than catching up
+                    next_tick = max(next_tick + interval, time.perf_counter() - interval)
+                    wait = next_tick - time.perf_counter()
+
+                    if wait > 0:
+                        time.sleep(wait)
+        except Exception as error:
+            self.worker_error = error
+
     ##############################
     # Helpers and private methods
     ##############################
@@ -176,6 +520,10 @@ class Simulation:
         if self.check_config("log_level", level):
             print("> [{0}]: {1}".format(level, msg))
 
+    def is_headless(self):
+        """Whether the simulation runs without VPython objects, graphs or rate limiting"""
+        return self.check_config('headless', True)
+
     def check_config(self, name, value):
         """Verifies that a particular config option has a particular value"""
         return self.__get_config__(name) is value
@@ -0,0 +1,94 @@
+import time
+
+import numpy as np
+
+
+class SnapshotRing:
+    """
+    SnapshotRing hands state snapshots from a physics worker to a renderer without either one waiting on the other.
+    It holds capacity preallocated slots of (t, wall time, positions, velocities) for a fixed number of bodies; the
+    single writer fills the slot after the newest one and then publishes it by bumping the written count, the reader
+    copies the slots it wants and checks afterwards that the writer has not lapped them meanwhile (a sequence lock),
+    retrying on the newer ones if it has. Nothing is locked and no snapshot is allocated once the ring exists.
+
+    Snapshots are dicts with 't', 'positions' and 'velocities' like Simulation.snapshot(). at() interpolates between
+    the two snapshots written around a given wall time, so a renderer drawing slightly in the past moves smoothly
+    whatever the rates of physics and frames.
+    """
+
+    def __init__(self, bodies: int, capacity: int = 64):
+        self.capacity = capacity
+        self.times = np.zeros(capacity)
+        self.walls = np.zeros(capacity)
+        self.positions = np.zeros((capacity, bodies, 3))
+        self.velocities = np.zeros((capacity, bodies, 3))
+        self.written = 0  # snapshots written so far, the newest one in slot (written - 1) % capacity
+
+    def write(self, snapshot: dict, wall: float = None):
+        """Writes a snapshot into the next slot and publishes it (writer only)"""
+        slot = self.written % self.capacity
+        self.times[slot] = snapshot['t']
+        self.walls[slot] = wall if wall is not None else time.perf_counter()
+        self.positions[slot] = snapshot['positions']
+        self.velocities[slot] = snapshot['velocities']
+        self.written += 1
+
+    def latest(self):
+        """Gets a copy of the newest snapshot, None if nothing was written yet"""
+        while True:
+            written = self.written
+
+            if written == 0:
+                return None
+
+            snapshot = self.__read__(written - 1)[0]
+
+            if self.__still_there__(written - 1):
+                return snapshot
+
+    def at(self, wall: float):
+        """
+        Gets the snapshot at a wall time, interpolated between the two written around it: the oldest one held if wall
+        is before it, the newest one if wall is after it and None if nothing was written yet
+        """
+        while True:
+            written = self.written
+
+            if written == 0:
+                return None
+
+            # newest first, find the first snapshot written at or before wall
+            oldest = max(0, written - self.capacity + 1)
+            sequence = written - 1
+
+            while sequence > oldest and self.walls[sequence % self.capacity] > wall:
+                sequence -= 1
+
+            after = min(sequence + 1, written - 1)
+            before_snapshot, before_wall = self.__read__(sequence)
+            after_snapshot, after_wall = self.__read__(after)
+
+            if not self.__still_there__(sequence):
+                continue
+
+            if after == sequence or wall <= before_wall:
+                return before_snapshot
+
+            alpha = min(1.0, (wall - before_wall) / (after_wall - before_wall))
+
+            return {name: before_snapshot[name] + (after_snapshot[name] - before_snapshot[name]) * alpha
+                    for name in before_snapshot}
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    def __read__(self, sequence):
+        """Copies the snapshot with the given sequence number out of its slot, and gets it with its wall time"""
+        slot = sequence % self.capacity
+
+        return {'t': float(self.times[slot]), 'positions': self.positions[slot].copy(),
+                'velocities': self.velocities[slot].copy()}, float(self.walls[slot])
+
+    def __still_there__(self, sequence):
+        """Whether the slot of a sequence number has not been taken by a later write, finished or in progress"""
+        return self.written - sequence < self.capacity
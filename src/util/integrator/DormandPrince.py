@@ -0,0 +1,189 @@
+import numpy as np
+
+
+class DormandPrince:
+    """
+    DormandPrince integrates dy/dt = derivative(t, y) with the embedded Runge-Kutta 5(4) pair of Dormand and Prince,
+    choosing every step from the difference between its 5th and 4th order solutions so that the local error stays
+    within atol + rtol |y| per component. Steps shrink where the dynamics are fast (a close approach, a mirror point)
+    and grow where nothing happens, instead of one fixed dt everywhere.
+
+    Events (util.integrator.Event) are checked after every accepted step. A zero crossing is located inside the step
+    by root finding on the method's 4th order continuous extension, so event times are accurate to far better than a
+    step, and a terminal event ends the integration right at the crossing.
+
+    The state y is a 1D array; particle systems pack their positions and velocities into it (see pack / unpack).
+    """
+    # Butcher tableau of the 5(4) pair, the 7th stage being the derivative at the new point (first same as last)
+    C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1])
+    A = [np.array([]),
+         np.array([1 / 5]),
+         np.array([3 / 40, 9 / 40]),
+         np.array([44 / 45, -56 / 15, 32 / 9]),
+         np.array([19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729]),
+         np.array([9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656])]
+    B = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84])
+    E = np.array([71 / 57600, 0, -71 / 16695, 71 / 1920, -17253 / 339200, 22 / 525, -1 / 40])  # 5th - 4th order
+
+    # continuous extension: y(t + theta h) = y + h K^T P [theta, theta^2, theta^3, theta^4]
+    P = np.array([
+        [1, -8048581381 / 2820520608, 8663915743 / 2820520608, -12715105075 / 11282082432],
+        [0, 0, 0, 0],
+        [0, 131558114200 / 32700410799, -68118460800 / 10900136933, 87487479700 / 32700410799],
+        [0, -1754552775 / 470086768, 14199869525 / 1410260304, -10690763975 / 1880347072],
+        [0, 127303824393 / 49829197408, -318862633887 / 49829197408, 701980252875 / 199316789632],
+        [0, -282668133 / 205662961, 2019193451 / 616988883, -1453857185 / 822651844],
+        [0, 40617522 / 29380423, -110615467 / 29380423, 69997945 / 29380423]])
+
+    SAFETY = 0.9
+    MIN_FACTOR = 0.2
+    MAX_FACTOR = 10.0
+    ROOT_ITERATIONS = 100
+
+    def __init__(self, rtol: float = 1e-6, atol: float = 1e-9, max_step: float = np.inf, first_step: float = None,
+                 max_steps: int = 1000000):
+        self.rtol = rtol
+        self.atol = atol
+        self.max_step = max_step
+        self.first_step = first_step
+        self.max_steps = max_steps
+
+    def solve(self, derivative, t0: float, y0, t_end: float, events=(), record: bool = True) -> dict:
+        """
+        Integrates from t0 to t_end (or the first terminal event) and gets a dict with the accepted times "t" and
+        states "y" (only the first and last if not record), the "events" found as (name, t, y) tuples in time order,
+        whether a terminal event ended it ("terminated"), whether it got to t_end or a terminal event ("completed",
+        False once max_steps steps, accepted or rejected, ran out before) and the counts of "steps", "rejected" steps
+        and derivative "evaluations"
+        """
+        t = float(t0)
+        y = np.array(y0, dtype=float)
+        f = np.asarray(derivative(t, y), dtype=float)
+        h = self.first_step if self.first_step is not None else self.__initial_step__(derivative, t, y, f, t_end)
+        values = [event(t, y) for event in events]
+
+        times, states, found = [t], [y], []
+        steps = rejected = 0
+        evaluations = 2 if self.first_step is None else 1
+        terminated = False
+
+        while t < t_end and steps + rejected < self.max_steps:
+            h = min(h, self.max_step, t_end - t)
+            y_new, stages, error = self.__step__(derivative, t, y, f, h)
+            evaluations += 6
+            scale = self.atol + self.rtol * np.maximum(np.abs(y), np.abs(y_new))
+            error_norm = np.sqrt(np.mean((error / scale) ** 2))
+
+            if error_norm > 1:
+                h *= max(self.MIN_FACTOR, self.SAFETY * error_norm ** -0.2)
+                rejected += 1
+                continue
+
+            steps += 1
+            new_values = [event(t + h, y_new) for event in events]
+            crossings = []
+
+            for (index, event) in enumerate(events):
+                if event.crossed(values[index], new_values[index]):
+                    crossings.append(self.__locate__(event, t, y, h, stages, values[index]) + (index,))
+
+            for (t_event, y_event, index) in sorted(crossings, key=lambda crossing: crossing[0]):
+                found.append((events[index].name, t_event, y_event))
+
+                if events[index].terminal:
+                    t, y, terminated = t_event, y_event, True
+                    break
+
+            if terminated:
+                break
+
+            t, y, f, values = t + h, y_new, stages[-1], new_values
+
+            if record:
+                times.append(t)
+                states.append(y)
+
+            h *= min(self.MAX_FACTOR, self.SAFETY * error_norm ** -0.2) if error_norm > 0 else self.MAX_FACTOR
+
+        if not record or terminated:
+            times.append(t)
+            states.append(y)
+
+        return {"t": np.array(times), "y": np.array(states), "events": found, "terminated": terminated,
+                "completed": terminated or t >= t_end, "steps": steps, "rejected": rejected,
+                "evaluations": evaluations}
+
+    @staticmethod
+    def pack(positions, velocities) -> np.ndarray:
+        """Packs (N, 3) positions and velocities into one state vector"""
+        return np.concatenate((np.ravel(positions), np.ravel(velocities))).astype(float)
+
+    @staticmethod
+    def unpack(y):
+        """Unpacks a state vector into (N, 3) positions and velocities (views into y)"""
+        half = np.size(y) // 2
+        return np.reshape(y[:half], (-1, 3)), np.reshape(y[half:], (-1, 3))
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    def __step__(self, derivative, t, y, f, h):
+        """Takes one step of h, getting the 5th order solution, the 7 stage derivatives and the error estimate"""
+        stages = [f]
+
+        for (c, a) in zip(self.C[1:], self.A[1:]):
+            stages.append(np.asarray(derivative(t + c * h, y + h * np.dot(a, stages)), dtype=float))
+
+        y_new = y + h * np.dot(self.B, stages)
+        stages.append(np.asarray(derivative(t + h, y_new), dtype=float))
+
+        return y_new, stages, h * np.dot(self.E, stages)
+
+    def __interpolate__(self, y, h, stages, theta):
+        """Gets the state at t + theta h inside a step from its continuous extension"""
+        return y + h * np.dot(self.P @ (theta ** np.arange(1, 5)), stages)
+
+    def __locate__(self, event, t, y, h, stages, before):
+        """Finds the (t, y) where event crosses zero inside the step from t to t + h (Illinois false position)"""
+        low, high = 0.0, 1.0
+        value_low, value_high = before, event(t + h, self.__interpolate__(y, h, stages, 1.0))
+        side = 0
+        theta = 1.0
+
+        for _ in range(self.ROOT_ITERATIONS):
+            if (high - low) * h <= 4 * np.finfo(float).eps * max(abs(t), abs(h)):
+                break
+
+            theta = (low * value_high - high * value_low) / (value_high - value_low)
+            theta = min(max(theta, low), high)
+            value = event(t + theta * h, self.__interpolate__(y, h, stages, theta))
+
+            if value == 0:
+                break
+
+            if (value < 0) == (value_low < 0):
+                low, value_low = theta, value
+                if side == -1:
+                    value_high /= 2
+                side = -1
+            else:
+                high, value_high = theta, value
+                if side == 1:
+                    value_low /= 2
+                side = 1
+
+        return t + theta * h, self.__interpolate__(y, h, stages, theta)
+
+    def __initial_step__(self, derivative, t, y, f, t_end):
+        """Guesses a first step from the sizes of y, its derivative and a trial Euler step (Hairer, Norsett, Wanner)"""
+        scale = self.atol + self.rtol * np.abs(y)
+        d0 = np.sqrt(np.mean((y / scale) ** 2))
+        d1 = np.sqrt(np.mean((f / scale) ** 2))
+        h0 = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01 * d0 / d1
+        h0 = min(h0, t_end - t)
+
+        f1 = np.asarray(derivative(t + h0, y + h0 * f), dtype=float)
+        d2 = np.sqrt(np.mean(((f1 - f) / scale) ** 2)) / h0
+        h1 = max(1e-6, h0 * 1e-3) if max(d1, d2) <= 1e-15 else (0.01 / max(d1, d2)) ** 0.2
+
+        return min(100 * h0, h1, self.max_step)
@@ -0,0 +1,16 @@
+from util.integrator.Integrator import Integrator
+
+
+class EulerCromer(Integrator):
+    """
+    EulerCromer is the update the chapter scripts write by hand: a = F / m, then v += a dt, then x += v dt with the new
+    v. Using the updated velocity for the drift is what makes it symplectic, unlike forward Euler, so orbits do not
+    spiral out, but it is only 1st order accurate.
+    """
+    ORDER = 1
+
+    def step(self, t: float, positions, velocities, dt: float, acceleration):
+        """Gets the (positions, velocities) one step of dt after time t"""
+        v = velocities + self.__accelerate__(acceleration, t, positions, velocities) * dt
+
+        return positions + v * dt, v
@@ -0,0 +1,25 @@
+class Event:
+    """
+    Event marks something worth stopping for during an integration: a particle leaving a bounding box, two charges
+    getting too close, a particle reaching a mirror point. function(t, y) is a continuous function of the time and
+    state that crosses zero where the event happens; the integrator locates the crossing by root finding.
+
+    direction restricts which crossings count: +1 only rising ones (negative to positive), -1 only falling ones and
+    0 both. A terminal event stops the integration at the crossing.
+    """
+
+    def __init__(self, function, terminal: bool = False, direction: int = 0, name: str = None):
+        self.function = function
+        self.terminal = terminal
+        self.direction = direction
+        self.name = name if name is not None else getattr(function, '__name__', 'event')
+
+    def __call__(self, t: float, y):
+        return self.function(t, y)
+
+    def crossed(self, before: float, after: float) -> bool:
+        """Whether going from the value before to the value after is a zero crossing this event counts"""
+        rising = before < 0 <= after
+        falling = before > 0 >= after
+
+        return (rising and self.direction >= 0) or (falling and self.direction <= 0)
@@ -0,0 +1,45 @@
+import numpy as np
+
+
+class Integrator:
+    """
+    Integrator is the base of the fixed step integrators used by util.Simulation. An integrator advances the positions
+    and velocities of N bodies, held as (N, 3) arrays, by steps of dt under an acceleration function
+    acceleration(t, positions, velocities) -> (N, 3). It never needs to know where the accelerations come from, so the
+    same scenario can be stepped with any of the subclasses:
+
+        EulerCromer     1st order, 1 acceleration per step, symplectic
+        VelocityVerlet  2nd order, 1 acceleration per step (the last one is reused), symplectic, same as leapfrog
+        RungeKutta4     4th order, 4 accelerations per step, not symplectic (energy drifts slowly)
+        Yoshida4        4th order, 3 accelerations per step, symplectic
+
+    The symplectic ones keep the energy of a conservative system bounded however long they run, and their kick-drift
+    splitting assumes the accelerations only depend on the positions; a velocity dependent term is evaluated with the
+    velocity at hand. Steps never modify the arrays passed in. evaluations counts the calls to acceleration.
+    """
+    ORDER = 1
+
+    def __init__(self):
+        self.evaluations = 0
+
+    def step(self, t: float, positions, velocities, dt: float, acceleration):
+        """Gets the (positions, velocities) one step of dt after time t"""
+        raise NotImplementedError("The step method is not implemented.")
+
+    def run(self, t: float, positions, velocities, dt: float, steps: int, acceleration):
+        """Gets the (positions, velocities) steps steps of dt after time t"""
+        x = np.array(positions, dtype=float).reshape(-1, 3)
+        v = np.array(velocities, dtype=float).reshape(-1, 3)
+
+        for n in range(steps):
+            x, v = self.step(t + n * dt, x, v, dt, acceleration)
+
+        return x, v
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    def __accelerate__(self, acceleration, t, positions, velocities):
+        """Gets the accelerations from the acceleration function, counting the evaluation"""
+        self.evaluations += 1
+        return np.asarray(acceleration(t, positions, velocities), dtype=float).reshape(-1, 3)
@@ -0,0 +1,85 @@
+import numpy as np
+
+from util.integrator.Integrator import Integrator
+
+
+class MultiRate(Integrator):
+    """
+    MultiRate is a velocity Verlet integrator in which every body takes its own step, for systems such as ExtraPain
+    whose bodies differ in mass by many orders of magnitude. Given an outer step dt, body i is put on level l_i and
+    steps by dt / 2^l_i, the smallest power of two division of dt within
+
+        eta * min(sqrt(length / |a_i|), length / |v_i|)
+
+    so a light (fast accelerating) or fast moving body sub-cycles inside one outer step of the heavy ones. Levels are
+    chosen again at the start of every outer step, at most max_level.
+
+    All bodies drift together by the finest sub-step (cheap), but a body is only kicked, and its acceleration only
+    computed, at the start and end of its own steps: the accelerations computed per outer step grow with the number
+    of fast bodies times their sub-steps, not with the total number of bodies times the finest sub-steps.
+
+    The acceleration function has to take the indices of the bodies it is asked about:
+    acceleration(t, positions, velocities, targets) -> (len(targets), 3), positions and velocities being those of
+    every body. The accelerations at the end of a step are kept and reused by the next one, like VelocityVerlet.
+    Besides the calls counted in evaluations, body_evaluations counts the body accelerations computed.
+    """
+    ORDER = 2
+
+    def __init__(self, length: float, eta: float = 0.05, max_level: int = 20):
+        super().__init__()
+        self.length = length
+        self.eta = eta
+        self.max_level = max_level
+        self.last = None  # (positions, velocities, accelerations) at the end of the last step
+        self.last_levels = None  # levels used by the last step
+        self.body_evaluations = 0
+
+    def levels(self, velocities, accelerations, dt: float) -> np.ndarray:
+        """Gets the level of every body: how many times dt has to be halved to resolve its motion"""
+        speed = np.linalg.norm(velocities, axis=1)
+        accel = np.linalg.norm(accelerations, axis=1)
+
+        with np.errstate(divide='ignore'):
+            wanted = self.eta * np.minimum(np.sqrt(self.length / accel), self.length / speed)
+
+        return np.clip(np.ceil(np.log2(dt / wanted)), 0, self.max_level).astype(int)
+
+    def step(self, t: float, positions, velocities, dt: float, acceleration):
+        """Gets the (positions, velocities) one step of dt after time t"""
+        x = np.array(positions, dtype=float).reshape(-1, 3)
+        v = np.array(velocities, dtype=float).reshape(-1, 3)
+        everyone = np.arange(x.shape[0])
+
+        if self.last is not None and self.last[0] is positions and self.last[1] is velocities:
+            a = self.last[2].copy()
+        else:
+            a = self.__accelerate__(acceleration, t, x, v, everyone)
+
+        levels = self.levels(v, a, dt)
+        finest = int(levels.max())
+        h = dt / 2 ** finest
+        period = 2 ** (finest - levels)  # finest sub-steps per step of each body
+
+        for n in range(2 ** finest):
+            starting = everyone[n % period == 0]
+            v[starting] += a[starting] * (period[starting, None] * (h / 2))
+
+            x += v * h
+
+            ending = everyone[(n + 1) % period == 0]
+            a[ending] = self.__accelerate__(acceleration, t + (n + 1) * h, x, v, ending)
+            v[ending] += a[ending] * (period[ending, None] * (h / 2))
+
+        self.last = (x, v, a)
+        self.last_levels = levels
+
+        return x, v
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    def __accelerate__(self, acceleration, t, positions, velocities, targets=None):
+        """Gets the accelerations of the target bodies from the acceleration function, counting the evaluation"""
+        self.evaluations += 1
+        self.body_evaluations += len(targets)
+        return np.asarray(acceleration(t, positions, velocities, targets), dtype=float).reshape(-1, 3)
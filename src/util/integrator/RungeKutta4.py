@@ -0,0 +1,24 @@
+from util.integrator.Integrator import Integrator
+
+
+class RungeKutta4(Integrator):
+    """
+    RungeKutta4 is the classic 4th order Runge-Kutta method applied to dx/dt = v, dv/dt = a(t, x, v). It takes four
+    accelerations per step and handles velocity dependent forces exactly, but it is not symplectic: over very many
+    steps the energy of a conservative system drifts instead of staying bounded.
+    """
+    ORDER = 4
+
+    def step(self, t: float, positions, velocities, dt: float, acceleration):
+        """Gets the (positions, velocities) one step of dt after time t"""
+        half = dt / 2
+        k1_x, k1_v = velocities, self.__accelerate__(acceleration, t, positions, velocities)
+        k2_x = velocities + k1_v * half
+        k2_v = self.__accelerate__(acceleration, t + half, positions + k1_x * half, k2_x)
+        k3_x = velocities + k2_v * half
+        k3_v = self.__accelerate__(acceleration, t + half, positions + k2_x * half, k3_x)
+        k4_x = velocities + k3_v * dt
+        k4_v = self.__accelerate__(acceleration, t + dt, positions + k3_x * dt, k4_x)
+
+        return (positions + (k1_x + 2 * k2_x + 2 * k3_x + k4_x) * (dt / 6),
+                velocities + (k1_v + 2 * k2_v + 2 * k3_v + k4_v) * (dt / 6))
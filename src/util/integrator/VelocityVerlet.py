@@ -0,0 +1,32 @@
+from util.integrator.Integrator import Integrator
+
+
+class VelocityVerlet(Integrator):
+    """
+    VelocityVerlet takes kick-drift-kick steps: half a kick with the accelerations at the start, a drift of a whole
+    step, and half a kick with the accelerations at the end. Written with the half step velocities this is the
+    leapfrog scheme. It is 2nd order and symplectic.
+
+    The accelerations at the end of a step are the ones at the start of the next, so they are kept and reused when the
+    next step starts from the arrays this one returned, leaving one acceleration per step.
+    """
+    ORDER = 2
+
+    def __init__(self):
+        super().__init__()
+        self.last = None  # (positions, velocities, accelerations) at the end of the last step
+
+    def step(self, t: float, positions, velocities, dt: float, acceleration):
+        """Gets the (positions, velocities) one step of dt after time t"""
+        if self.last is not None and self.last[0] is positions and self.last[1] is velocities:
+            a = self.last[2]
+        else:
+            a = self.__accelerate__(acceleration, t, positions, velocities)
+
+        v_half = velocities + a * (dt / 2)
+        x = positions + v_half * dt
+        a = self.__accelerate__(acceleration, t + dt, x, v_half)
+        v = v_half + a * (dt / 2)
+        self.last = (x, v, a)
+
+        return x, v
@@ -0,0 +1,29 @@
+from util.integrator.Integrator import Integrator
+
+
+class Yoshida4(Integrator):
+    """
+    Yoshida4 composes three leapfrog steps of dt w1, dt w0 and dt w1, w0 being negative, so that their 3rd order errors
+    cancel (Yoshida, 1990). The result is a 4th order symplectic integrator taking three accelerations per step: for the
+    same accuracy it allows much longer steps than VelocityVerlet, and unlike RungeKutta4 its energy error stays bounded.
+    """
+    ORDER = 4
+
+    W1 = 1 / (2 - 2 ** (1 / 3))
+    W0 = -(2 ** (1 / 3)) * W1
+
+    # drift (C) and kick (D) coefficients of the drift-kick-drift-kick-drift-kick-drift form
+    C = (W1 / 2, (W0 + W1) / 2, (W0 + W1) / 2, W1 / 2)
+    D = (W1, W0, W1)
+
+    def step(self, t: float, positions, velocities, dt: float, acceleration):
+        """Gets the (positions, velocities) one step of dt after time t"""
+        x, v = positions, velocities
+        elapsed = 0.0
+
+        for (c, d) in zip(self.C, self.D):
+            x = x + v * (c * dt)
+            elapsed += c
+            v = v + self.__accelerate__(acceleration, t + elapsed * dt, x, v) * (d * dt)
+
+        return x + v * (self.C[-1] * dt), v
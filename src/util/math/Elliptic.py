@@ -0,0 +1,32 @@
+import numpy as np
+
+
+class Elliptic:
+    """
+    Complete elliptic integrals of the first and second kind, K(m) and E(m) with parameter m = k^2, evaluated with the
+    arithmetic-geometric mean. Works element-wise on arrays and converges quadratically, so a handful of iterations
+    reaches double precision for any 0 <= m < 1.
+    """
+    MAX_ITERATIONS = 32
+
+    @staticmethod
+    def complete(m):
+        """Gets (K(m), E(m)) for m = k^2 in [0, 1); K diverges as m approaches 1 while E tends to 1"""
+        m = np.asarray(m, dtype=float)
+        a = np.ones_like(m)
+        b = np.sqrt(1 - m)
+        c_sum = m / 2  # sum of 2^(n - 1) c_n^2, starting with c_0^2 = m
+        power = 0.5
+
+        for _ in range(Elliptic.MAX_ITERATIONS):
+            c = (a - b) / 2
+            a, b = (a + b) / 2, np.sqrt(a * b)
+            power *= 2
+            c_sum = c_sum + power * c * c
+
+            if np.all(np.abs(c) <= 1e-16 * a):
+                break
+
+        k = np.pi / (2 * a)
+
+        return k, k * (1 - c_sum)
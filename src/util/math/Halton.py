@@ -0,0 +1,30 @@
+import numpy as np
+
+
+class Halton:
+    """
+    Halton low-discrepancy sequence: the n-th point has the base-p radical inverse of n as its coordinate along the
+    dimension using the p-th prime. Samples drawn from it cover the unit cube far more evenly than random ones, so
+    ensemble statistics converge faster in the number of particles.
+    """
+    PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41, 43, 47, 53)
+
+    @staticmethod
+    def points(count: int, dimensions: int, skip: int = 1) -> np.ndarray:
+        """Gets the (count, dimensions) points with indices skip up to skip + count in [0, 1)^dimensions"""
+        if dimensions > len(Halton.PRIMES):
+            raise ValueError(f"Halton points are only available in up to {len(Halton.PRIMES)} dimensions")
+
+        indices = np.arange(skip, skip + count)
+        out = np.zeros((count, dimensions))
+
+        for (dimension, base) in enumerate(Halton.PRIMES[:dimensions]):
+            n = indices.copy()
+            scale = 1.0
+
+            while np.any(n > 0):
+                scale /= base
+                out[:, dimension] += scale * (n % base)
+                n //= base
+
+        return out
@@ -1,13 +1,17 @@
 from math import sqrt
-
-from vpython import vec
+from numbers import Real
 
 
 class Vector:
     """
     Exists to make vector operations slightly easier than having to deal with VPython's way.
     To each their own but VPython annoys me a little bit. No hate to the VPython team.
+
+    The operators + - * / always return a new Vector, so expressions never need a defensive clone(). The in-place
+    operators += -= *= /= and the named methods (add, subtract, multiply, divide, cross, hat, ...) mutate this vector
+    and are the fast path for hot loops that own their accumulator.
     """
+    __slots__ = ('x', 'y', 'z')
 
     def __init__(self, x: float = 0, y: float = 0, z: float = 0):
         self.x = x
@@ -15,8 +19,18 @@ class Vector:
         self.z = z
 
     def __add__(self, other: 'Vector') -> 'Vector':
-        """Overloads the + operator for this vector"""
-        return self.add(other)
+        """Overloads the + operator for this vector, returning a new vector"""
+        if not isinstance(other, Vector):
+            return NotImplemented
+
+        return Vector(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __iadd__(self, other: 'Vector') -> 'Vector':
+        """Overloads the += operator for this vector, adding in place"""
+        self.x += other.x
+        self.y += other.y
+        self.z += other.z
+        return self
 
     def add(self, other: 'Vector') -> 'Vector':
         """Adds the given vector to this vector"""
@@ -26,8 +40,18 @@ class Vector:
         return self
 
     def __sub__(self, other: 'Vector') -> 'Vector':
-        """Overloads the - operator for this vector"""
-        return self.subtract(other)
+        """Overloads the - operator for this vector, returning a new vector"""
+        if not isinstance(other, Vector):
+            return NotImplemented
+
+        return Vector(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def __isub__(self, other: 'Vector') -> 'Vector':
+        """Overloads the -= operator for this vector, subtracting in place"""
+        self.x -= other.x
+        self.y -= other.y
+        self.z -= other.z
+        return self
 
     def subtract(self, other: 'Vector') -> 'Vector':
         """Subtracts the given vector from this vector"""
@@ -36,9 +60,28 @@ class Vector:
         self.z -= other.z
         return self
 
+    def __neg__(self) -> 'Vector':
+        """Overloads the unary - operator for this vector, returning a new vector"""
+        return Vector(-self.x, -self.y, -self.z)
+
     def __mul__(self, other: float) -> 'Vector':
-        """Overloads the * operator for this vector"""
-        return self.multiply(other)
+        """Overloads the * operator for this vector, returning a new vector"""
+        # exact type first, the Real check (numpy scalars...) is several times slower
+        if type(other) is not float and type(other) is not int and not isinstance(other, Real):
+            return NotImplemented
+
+        return Vector(self.x * other, self.y * other, self.z * other)
+
+    def __rmul__(self, other: float) -> 'Vector':
+        """Overloads the * operator when the scalar is on the left hand side"""
+        return self.__mul__(other)
+
+    def __imul__(self, other: float) -> 'Vector':
+        """Overloads the *= operator for this vector, multiplying in place"""
+        self.x *= other
+        self.y *= other
+        self.z *= other
+        return self
 
     def multiply(self, factor: float) -> 'Vector':
         """Multiplies each vector component by the given factor"""
@@ -47,9 +90,19 @@ class Vector:
         self.z *= factor
         return self
 
-    def __div__(self, other: float) -> 'Vector':
-        """Overloads the / operator for this vector"""
-        return self.divide(other)
+    def __truediv__(self, other: float) -> 'Vector':
+        """Overloads the / operator for this vector, returning a new vector"""
+        if type(other) is not float and type(other) is not int and not isinstance(other, Real):
+            return NotImplemented
+
+        return Vector(self.x / other, self.y / other, self.z / other)
+
+    def __itruediv__(self, other: float) -> 'Vector':
+        """Overloads the /= operator for this vector, dividing in place"""
+        self.x /= other
+        self.y /= other
+        self.z /= other
+        return self
 
     def divide(self, divisor: float) -> 'Vector':
         """Divides each vector component by the given scalar divisor"""
@@ -64,36 +117,42 @@ class Vector:
 
     def cross(self, other: 'Vector') -> 'Vector':
         """Crosses this vector with the given other vector"""
-        self.x = (self.y * other.z) - (other.y - self.z)
-        self.y = (self.z * other.x) - (other.z - self.x)
-        self.z = (self.x * other.y) - (other.x - self.y)
+        x = (self.y * other.z) - (self.z * other.y)
+        y = (self.z * other.x) - (self.x * other.z)
+        z = (self.x * other.y) - (self.y * other.x)
+        self.x = x
+        self.y = y
+        self.z = z
         return self
 
     def mag(self) -> float:
         """Gets the magnitude of this vector"""
-        return sqrt((self.x ** 2) + (self.y ** 2) + (self.z ** 2))
+        return sqrt((self.x * self.x) + (self.y * self.y) + (self.z * self.z))
 
     def magSquared(self) -> float:
         """Gets the squared magnitude of this vector"""
-        return self.mag() ** 2
+        return (self.x * self.x) + (self.y * self.y) + (self.z * self.z)
 
     def scalarDist(self, other: 'Vector') -> float:
         """Gets the scalar distance of this vector from the other"""
-        return sqrt(((self.x - other.x) ** 2) + ((self.y - other.y) ** 2) + ((self.z - other.z) ** 2))
+        return sqrt(self.scalarDistSquared(other))
 
     def scalarDistSquared(self, other: 'Vector') -> float:
         """Gets the squared scalar distance of this vector from the other"""
-        return self.scalarDist(other) ** 2
+        dx = self.x - other.x
+        dy = self.y - other.y
+        dz = self.z - other.z
+        return (dx * dx) + (dy * dy) + (dz * dz)
 
     def dist(self, other: 'Vector') -> 'Vector':
         """Gets the vector distance of this vector from the other"""
-        return self.clone().subtract(other)
+        return self - other
 
     def hat(self) -> 'Vector':
         """Normalizes this vector and turns it into a unit/hat vector"""
         mag = self.mag()
 
-        if mag is 0:
+        if mag == 0:
             raise ArithmeticError("This vector has a magnitude of 0. It cannot be normalized.")
         else:
             self.x /= mag
@@ -128,14 +187,19 @@ class Vector:
         """Creates a copy of this vector and returns that copy"""
         return Vector(self.x, self.y, self.z)
 
-    def as_vec(self) -> vec:
+    def as_vec(self):
         """Converts this Vector to a VPython vec object"""
+        from vpython import vec  # imported here so that headless code never loads VPython
+
         return vec(self.x, self.y, self.z)
 
     def __str__(self) -> str:
         return "<{0}, {1}, {2}>".format(self.x, self.y, self.z)
 
+    def __repr__(self) -> str:
+        return "Vector({0!r}, {1!r}, {2!r})".format(self.x, self.y, self.z)
+
     @staticmethod
-    def from_vec(given: vec) -> 'Vector':
+    def from_vec(given) -> 'Vector':
         """Converts a VPython vec object into a Vector"""
         return Vector(given.x, given.y, given.z)
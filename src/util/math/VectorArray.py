@@ -0,0 +1,195 @@
+import numpy as np
+
+from util.math.Vector import Vector
+
+
+class VectorArray:
+    """
+    Holds N three-dimensional vectors in one contiguous (N, 3) NumPy array so that hot loops can work on every vector
+    at once instead of allocating a Vector (or VPython vec) per point. Every operation broadcasts against another
+    VectorArray of the same length, a single Vector, or a plain (3,) / (N, 3) array.
+    """
+
+    def __init__(self, data=None, copy: bool = True):
+        if data is None:
+            data = np.zeros((0, 3))
+
+        data = np.array(data, dtype=float, copy=copy) if copy else np.asarray(data, dtype=float)
+
+        if data.ndim == 1 and data.shape[0] == 3:
+            data = data.reshape(1, 3)
+
+        if data.ndim != 2 or data.shape[1] != 3:
+            raise ValueError("VectorArray data must have shape (N, 3), got {0}".format(data.shape))
+
+        self.data = np.ascontiguousarray(data)
+
+    ##############################
+    # Construction and conversion
+    ##############################
+    @staticmethod
+    def zeros(n: int) -> 'VectorArray':
+        """Creates an array of n zero vectors"""
+        return VectorArray(np.zeros((n, 3)), copy=False)
+
+    @staticmethod
+    def from_components(x, y, z) -> 'VectorArray':
+        """Creates an array from separate (broadcastable) x, y and z component arrays"""
+        x, y, z = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float),
+                                      np.asarray(z, dtype=float))
+        return VectorArray(np.stack((x.ravel(), y.ravel(), z.ravel()), axis=-1), copy=False)
+
+    @staticmethod
+    def from_vectors(vectors) -> 'VectorArray':
+        """Converts a list of Vector (or anything with x, y and z attributes, such as a VPython vec) to an array"""
+        return VectorArray(np.array([(v.x, v.y, v.z) for v in vectors], dtype=float).reshape(-1, 3), copy=False)
+
+    def to_vectors(self) -> list:
+        """Converts this array back into a list of Vector"""
+        return [Vector(x, y, z) for (x, y, z) in self.data.tolist()]
+
+    def clone(self) -> 'VectorArray':
+        """Creates a copy of this array and returns that copy"""
+        return VectorArray(self.data, copy=True)
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.data[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.data[:, 1]
+
+    @property
+    def z(self) -> np.ndarray:
+        return self.data[:, 2]
+
+    ##############################
+    # Arithmetic
+    ##############################
+    def __add__(self, other) -> 'VectorArray':
+        """Overloads the + operator, returning a new array"""
+        return VectorArray(self.data + VectorArray.__operand__(other), copy=False)
+
+    __radd__ = __add__
+
+    def __iadd__(self, other) -> 'VectorArray':
+        """Overloads the += operator, adding in place"""
+        self.data += VectorArray.__operand__(other)
+        return self
+
+    def __sub__(self, other) -> 'VectorArray':
+        """Overloads the - operator, returning a new array"""
+        return VectorArray(self.data - VectorArray.__operand__(other), copy=False)
+
+    def __rsub__(self, other) -> 'VectorArray':
+        """Overloads the - operator when this array is on the right hand side"""
+        return VectorArray(VectorArray.__operand__(other) - self.data, copy=False)
+
+    def __isub__(self, other) -> 'VectorArray':
+        """Overloads the -= operator, subtracting in place"""
+        self.data -= VectorArray.__operand__(other)
+        return self
+
+    def __neg__(self) -> 'VectorArray':
+        return VectorArray(-self.data, copy=False)
+
+    def __mul__(self, factor) -> 'VectorArray':
+        """Overloads the * operator; factor may be a scalar or a length N array of per-vector scalars"""
+        return VectorArray(self.data * VectorArray.__scalar_operand__(factor), copy=False)
+
+    __rmul__ = __mul__
+
+    def __imul__(self, factor) -> 'VectorArray':
+        """Overloads the *= operator, scaling in place"""
+        self.data *= VectorArray.__scalar_operand__(factor)
+        return self
+
+    def __truediv__(self, divisor) -> 'VectorArray':
+        """Overloads the / operator; divisor may be a scalar or a length N array of per-vector scalars"""
+        return VectorArray(self.data / VectorArray.__scalar_operand__(divisor), copy=False)
+
+    def __itruediv__(self, divisor) -> 'VectorArray':
+        """Overloads the /= operator, dividing in place"""
+        self.data /= VectorArray.__scalar_operand__(divisor)
+        return self
+
+    def scale(self, factor) -> 'VectorArray':
+        """Scales every vector by the given scalar or per-vector scalars, returning a new array"""
+        return self * factor
+
+    def dot(self, other) -> np.ndarray:
+        """Dots every vector with the other vector(s), returning a length N array"""
+        return np.einsum('ij,ij->i', self.data, np.broadcast_to(VectorArray.__operand__(other), self.data.shape))
+
+    def cross(self, other) -> 'VectorArray':
+        """Crosses every vector with the other vector(s), returning a new array"""
+        return VectorArray(np.cross(self.data, VectorArray.__operand__(other)), copy=False)
+
+    def mag_squared(self) -> np.ndarray:
+        """Gets the squared magnitude of every vector"""
+        return np.einsum('ij,ij->i', self.data, self.data)
+
+    def mag(self) -> np.ndarray:
+        """Gets the magnitude of every vector"""
+        return np.sqrt(self.mag_squared())
+
+    def hat(self) -> 'VectorArray':
+        """
+        Normalizes every vector, returning a new array. Zero length vectors cannot be normalized so they are left as
+        zero vectors instead of raising, since one degenerate point should not sink a whole batch.
+        """
+        mag = self.mag()
+        out = np.zeros_like(self.data)
+        np.divide(self.data, mag[:, None], out=out, where=mag[:, None] != 0)
+        return VectorArray(out, copy=False)
+
+    def sum(self) -> Vector:
+        """Sums every vector in the array into a single Vector"""
+        return Vector(*self.data.sum(axis=0).tolist())
+
+    ##############################
+    # Container behavior
+    ##############################
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    def __getitem__(self, item):
+        """Indexing with an int returns a Vector; slicing or masking returns a new VectorArray"""
+        if isinstance(item, (int, np.integer)):
+            return Vector(*self.data[item].tolist())
+
+        return VectorArray(self.data[item], copy=False)
+
+    def __setitem__(self, item, value) -> None:
+        self.data[item] = VectorArray.__operand__(value)
+
+    def __iter__(self):
+        for (x, y, z) in self.data.tolist():
+            yield Vector(x, y, z)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.data if dtype is None else self.data.astype(dtype)
+
+    def __str__(self) -> str:
+        return "VectorArray(n={0})".format(len(self))
+
+    ##############################
+    # Helpers and private methods
+    ##############################
+    @staticmethod
+    def __operand__(other) -> np.ndarray:
+        """Turns the other side of an operation into something that broadcasts against an (N, 3) array"""
+        if isinstance(other, VectorArray):
+            return other.data
+
+        if hasattr(other, 'x') and hasattr(other, 'y') and hasattr(other, 'z'):
+            return np.array((other.x, other.y, other.z), dtype=float)
+
+        return np.asarray(other, dtype=float)
+
+    @staticmethod
+    def __scalar_operand__(factor):
+        """Turns a scalar or per-vector scalar array into something that broadcasts against an (N, 3) array"""
+        factor = np.asarray(factor, dtype=float)
+        return factor[:, None] if factor.ndim == 1 else factor
@@ -72,7 +72,7 @@ class PhysicalObject(ABC):
         position = self.position
 
         if self.label_relative_position is not None:
-            position += self.label_relative_position
+            position = self.position + self.label_relative_position
 
         self.__label_backend__ = label(pos=position.as_vec(), text=self.label_text, **kwargs)
 
@@ -84,7 +84,7 @@ class PhysicalObject(ABC):
         position = self.position
 
         if self.label_relative_position is not None:
-            position += self.label_relative_position
+            position = self.position + self.label_relative_position
 
         self.__label_backend__['pos'] = position.as_vec()
 